@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+# ---------------------------------------------------------------------------
+__author__ = "Volker Petersen <volker.petersen01@gmail.com>"
+__app__ = "GPX_Repair.py"
+__version__ = "version 1.0.0, Python >3.7"
+__date__ = "Date: 2024/08/01"
+__copyright__ = "Copyright (c) 2024 Volker Petersen"
+__license__ = "GNU General Public License, published by the Free Software Foundation"
+__doc__ = """
+-----------------------------------------------------------------------------
+ Repairs truncated GPX log files, e.g. of a NMEA logger which was killed or
+ lost power before it wrote the GPX footer. The file is cut after its last
+ complete route/track point and the open <rte>, <trk>, <trkseg> and <gpx>
+ elements are closed. The original file is kept as '<name>.gpx.bak'.
+
+    usage: python GPX_Repair.py file.gpx [file2.gpx ...] [-check] [-nobackup]
+-----------------------------------------------------------------------------
+"""
+
+try:
+    import sys
+    import glob
+    import shutil
+    import argparse
+    from GPX_Writer import GPXLogWriter
+
+except ImportError as e:
+    print(
+        f"Import error: {str(e)} \nAborting the program {__app__} {__version__}")
+    sys.exit()
+
+
+def isWellFormed(data):
+    """
+    Check the repaired document with lxml (if installed)
+
+    Input:
+        data (bytes) GPX document
+
+    Return:
+        (string) error message, empty if the document is well-formed
+    """
+    try:
+        from lxml import etree
+    except ImportError:
+        return ""
+    try:
+        etree.fromstring(data)
+        return ""
+    except etree.XMLSyntaxError as e:
+        return str(e)
+
+
+def repairFile(path, check=False, backup=True):
+    """
+    Repair one GPX file in place
+
+    Input:
+        path (string) GPX file name
+        check (bool) only report, don't change the file
+        backup (bool) keep the original file as 'path.bak'
+
+    Return:
+        (string) status message
+    """
+    try:
+        with open(path, "rb") as fp:
+            data = fp.read()
+        (repaired, changed, lost) = GPXLogWriter.repair(data)
+    except (OSError, ValueError) as e:
+        return f"error: {e}"
+
+    error = isWellFormed(repaired)
+    if error:
+        return f"not repairable: {error}"
+    if not changed:
+        return "ok"
+    points = repaired.count(b"<rtept ") + repaired.count(b"<trkpt ")
+    msg = f"truncated, {points} points kept"
+    if check:
+        return msg
+    if backup:
+        shutil.copy2(path, path + ".bak")
+    with open(path, "wb") as fp:
+        fp.write(repaired)
+    return f"{msg}, repaired ({lost} bytes dropped)"
+
+
+if __name__ == "__main__":
+    """-------------------------------------------------------------------------
+        Script starting point
+    """
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="GPX files or glob patterns")
+    parser.add_argument("-check", action="store_true", help="only report the truncated files")
+    parser.add_argument("-nobackup", action="store_true", help="don't keep a .bak copy of the originals")
+    args = parser.parse_args()
+
+    print(f"\nStarting {__app__} {__version__}\n")
+    files = []
+    for pattern in args.files:
+        files.extend(sorted(glob.glob(pattern)) or [pattern])
+    for path in files:
+        print(f"{path}: {repairFile(path, args.check, not args.nobackup)}")
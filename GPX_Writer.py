@@ -0,0 +1,450 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+# ---------------------------------------------------------------------------
+__author__ = "Volker Petersen <volker.petersen01@gmail.com>"
+__app__ = "GPX_Writer.py"
+__version__ = "version 1.0.0, Python >3.7"
+__date__ = "Date: 2024/08/01"
+__copyright__ = "Copyright (c) 2024 Volker Petersen"
+__license__ = "GNU General Public License, published by the Free Software Foundation"
+__doc__ = """
+-----------------------------------------------------------------------------
+ Streaming writers of OpenCPN compatible GPX files: 'GPXWriter' for route
+ and track exports and 'GPXLogWriter' for the log files of the live
+ loggers, which are valid GPX documents after every flush. Both are also
+ available from NavToolsLib.
+
+    with GPXWriter(stream, "Route") as gpx:
+        gpx.waypoint(lat, lon, time, name)
+-----------------------------------------------------------------------------
+"""
+
+try:
+    import sys
+    import os
+    import random
+    from datetime import datetime
+    from time import monotonic
+    import numpy as np
+
+except ImportError as e:
+    print(
+        f"Import error: {str(e)} \nAborting the program {__app__} {__version__}")
+    sys.exit()
+
+
+class GPXWriter:
+    """--------------------------------------------------------------------------
+    Streaming writer of OpenCPN compatible GPX files. The header is written
+    when the writer is created, every waypoint is formatted in one go and
+    written straight to the file object, and close() appends the footer.
+    The file object itself is left open for the caller to close.
+
+    In 'route' mode the waypoints are written as <rtept> of a <rte> with the
+    OpenCPN extensions, in 'track' mode as <trkpt> of a <trk><trkseg>. The
+    route / track and every route point get a random OpenCPN guid.
+
+    Args:
+        stream (file):   text file object to write to
+        name (string):   name of the route or track
+        mode (string):   'route' or 'track'
+        precision (int): number of decimals of the lat/lon values, None
+                         writes the shortest repr() of the floats
+    """
+    ROUTE_GUID = "715affff-de7d-4094-9e87-"
+    TRACK_GUID = "715cffff-a4f2-4d3b-8c11-"
+    WAYPOINT_GUID = "715bffff-e783-458a-87cf-"
+
+    def __init__(self, stream, name="", mode="route", precision=None):
+        if mode not in ("route", "track"):
+            raise ValueError(f"Unknown GPX writer mode '{mode}', use 'route' or 'track'")
+        self.stream = stream
+        self.mode = mode
+        self.count = 0
+        self.closed = False
+        if precision is None:
+            self.formatCoord = float.__repr__
+        else:
+            self.formatCoord = ("{:.%df}" % int(precision)).format
+        stream.write(self.header(name))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
+
+    @staticmethod
+    def escape(text):
+        """--------------------------------------------------------------------------
+        Method to escape the xml special characters of a text element
+
+        Args:
+            text (string): text to be written into an xml element
+
+        Return:
+            (string) escaped text
+        """
+        text = str(text)
+        if '&' in text or '<' in text or '>' in text:
+            text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+        return text
+
+    @staticmethod
+    def timeText(time):
+        """--------------------------------------------------------------------------
+        Method to format a waypoint time for the GPX <time> element
+
+        Args:
+            time: datetime (UTC), datetime64, or an already formatted string
+
+        Return:
+            (string) time as 'YYYY-mm-ddTHH:MM:SSZ', None if missing
+        """
+        if time is None or isinstance(time, str):
+            return time or None
+        if isinstance(time, datetime):
+            return time.strftime("%Y-%m-%dT%H:%M:%SZ")
+        # str() of a datetime64 scalar is much cheaper than datetime_as_string()
+        text = str(np.datetime64(time, 's'))
+        if text == "NaT":
+            return None
+        return f"{text}Z"
+
+    @staticmethod
+    def guid(prefix):
+        """--------------------------------------------------------------------------
+        Method to create a random OpenCPN guid
+
+        Args:
+            prefix (string): first 24 characters of the guid
+
+        Return:
+            (string) guid
+        """
+        return f"{prefix}{random.getrandbits(48):012x}"
+
+    def header(self, name):
+        """--------------------------------------------------------------------------
+        Method to build the GPX header up to the first waypoint
+
+        Args:
+            name (string): name of the route or track
+
+        Return:
+            (string) GPX header
+        """
+        gpx = ('<?xml version="1.0" encoding="utf-8"?>\n'
+               '<gpx creator="OpenCPN" version="1.1" xmlns="http://www.topografix.com/GPX/1/1"'
+               ' xmlns:gpxx="http://www.garmin.com/xmlschemas/GpxExtensions/v3"'
+               ' xmlns:opencpn="http://www.opencpn.org"'
+               ' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"'
+               ' xsi:schemaLocation="http://www.topografix.com/GPX/1/1'
+               ' http://www.topografix.com/GPX/1/1/gpx.xsd">\n')
+        if self.mode == "track":
+            return gpx + (
+                f'<trk>\n  <name>{self.escape(name)}</name>\n'
+                f'  <extensions>\n'
+                f'    <opencpn:guid>{self.guid(self.TRACK_GUID)}</opencpn:guid>\n'
+                f'    <opencpn:viz>1</opencpn:viz>\n'
+                f'  </extensions>\n  <trkseg>\n')
+        return gpx + (
+            f'<rte>\n  <name>{self.escape(name)}</name>\n'
+            f'  <extensions>\n'
+            f'    <opencpn:guid>{self.guid(self.ROUTE_GUID)}</opencpn:guid>\n'
+            f'    <opencpn:viz>1</opencpn:viz>\n'
+            f'    <opencpn:sharedWPviz>0</opencpn:sharedWPviz>\n'
+            f'    <opencpn:start>Start</opencpn:start>\n'
+            f'    <opencpn:end>End</opencpn:end>\n'
+            f'    <opencpn:planned_speed>5.00</opencpn:planned_speed>\n'
+            f'    <opencpn:time_display>PC</opencpn:time_display>\n'
+            f'    <gpxx:RouteExtension>\n'
+            f'      <gpxx:IsAutoNamed>false</gpxx:IsAutoNamed>\n'
+            f'    </gpxx:RouteExtension>\n'
+            f'  </extensions>\n')
+
+    def footer(self):
+        """--------------------------------------------------------------------------
+        Method to return the GPX footer closing the route or track
+
+        Return:
+            (string) GPX footer
+        """
+        if self.mode == "track":
+            return "  </trkseg>\n</trk>\n</gpx>\n"
+        return "</rte>\n</gpx>\n"
+
+    def waypoint(self, lat, lon, time=None, name=None, sym="empty", desc=None,
+                 showName=False, wpType="WPT"):
+        """--------------------------------------------------------------------------
+        Method to write one route point (route mode) or track point (track
+        mode) to the file
+
+        Args:
+            lat (float):     latitude in degrees
+            lon (float):     longitude in degrees
+            time:            UTC time as datetime, datetime64 or GPX string
+            name (string):   waypoint name
+            sym (string):    waypoint symbol
+            desc (string):   waypoint description, e.g. 'departure 2019-09-26 09:37'
+            showName (bool): show the waypoint name in OpenCPN (route mode)
+            wpType (string): waypoint type (route mode)
+        """
+        self.stream.write(self.formatWaypoint(
+            float(lat), float(lon), self.timeText(time), name, sym, desc,
+            showName, wpType))
+        self.count += 1
+
+    def waypoints(self, lats, lons, times=None, names=None, syms=None, descs=None):
+        """--------------------------------------------------------------------------
+        Method to write a sequence of waypoints. The coordinate and time
+        arrays are converted in bulk, which is considerably faster than
+        calling waypoint() for each of them.
+
+        Args:
+            lats (array):  latitudes in degrees
+            lons (array):  longitudes in degrees
+            times (array): UTC times (datetime64, NaT when missing)
+            names (list):  waypoint names
+            syms (list):   waypoint symbols ('empty' when missing)
+            descs (list):  waypoint descriptions (None when missing)
+        """
+        lats = np.asarray(lats, dtype=np.float64).tolist()
+        lons = np.asarray(lons, dtype=np.float64).tolist()
+        n = len(lats)
+        if times is None:
+            times = [None] * n
+        else:
+            times = [None if t == "NaT" else t + "Z" for t in
+                     np.datetime_as_string(np.asarray(times, dtype='datetime64[s]'), unit='s').tolist()]
+        if names is None:
+            names = [None] * n
+        if syms is None:
+            syms = ["empty"] * n
+        if descs is None:
+            descs = [None] * n
+
+        formatWaypoint = self.formatWaypoint
+        write = self.stream.write
+        for i in range(n):
+            write(formatWaypoint(lats[i], lons[i], times[i], names[i], syms[i], descs[i]))
+        self.count += n
+
+    def formatWaypoint(self, lat, lon, time, name, sym, desc, showName=False, wpType="WPT"):
+        """--------------------------------------------------------------------------
+        Method to format one waypoint, see waypoint() for the arguments. The
+        lat/lon are floats and the time is already GPX formatted (or None).
+
+        Return:
+            (string) xml code of the waypoint
+        """
+        coord = self.formatCoord
+        parts = [f'<{"trkpt" if self.mode == "track" else "rtept"} '
+                 f'lat="{coord(lat)}" lon="{coord(lon)}">\n']
+        if time is not None:
+            parts.append(f'  <time>{time}</time>\n')
+        if name is not None:
+            parts.append(f'  <name>{self.escape(name)}</name>\n')
+        if desc is not None:
+            parts.append(f'  <desc>{self.escape(desc)}</desc>\n')
+
+        if self.mode == "track":
+            if sym is not None and sym != "empty":
+                parts.append(f'  <sym>{self.escape(sym)}</sym>\n')
+            parts.append('</trkpt>\n')
+        else:
+            parts.append(
+                f'  <sym>{self.escape(sym or "empty")}</sym>\n'
+                f'  <type>{wpType}</type>\n'
+                f'  <extensions>\n'
+                f'    <opencpn:guid>{self.guid(self.WAYPOINT_GUID)}</opencpn:guid>\n'
+                f'    <opencpn:viz_name>{1 if showName else 0}</opencpn:viz_name>\n'
+                f'    <opencpn:auto_name>1</opencpn:auto_name>\n'
+                f'    <opencpn:arrival_radius>0.050</opencpn:arrival_radius>\n'
+                f'    <opencpn:waypoint_range_rings colour="#FF0000" number="0" step="-1" units="0" visible="false"/>\n'
+                f'  </extensions>\n'
+                f'</rtept>\n')
+        return "".join(parts)
+
+    def close(self):
+        """--------------------------------------------------------------------------
+        Method to write the GPX footer. The file object is not closed.
+        """
+        if not self.closed:
+            self.stream.write(self.footer())
+            self.closed = True
+
+
+class GPXLogWriter(GPXWriter):
+    """--------------------------------------------------------------------------
+    GPX writer of the live loggers. It keeps the file open for the whole log
+    session and the file is a valid GPX document after every flush: the
+    waypoints are collected in memory and each flush writes them over the
+    footer of the previous flush, followed by the footer again. A crash or
+    power loss therefore loses at most the waypoints since the last flush.
+
+    A flush happens after 'flushEvery' waypoints or when 'flushInterval'
+    seconds have passed since the last flush (checked when a waypoint is
+    written). With 'fsync' the data is also forced to the disk.
+
+    Args:
+        path (string):         GPX file name
+        name (string):         name of the route or track
+        mode (string):         'route' or 'track'
+        precision (int):       number of decimals of the lat/lon values
+        flushEvery (int):      waypoints per flush, 1 flushes every waypoint
+        flushInterval (float): max. seconds between flushes, None for no limit
+        fsync (bool):          os.fsync() the file after each flush
+        resume (bool):         continue an existing log file (repaired if
+                               needed) instead of overwriting it
+    """
+
+    def __init__(self, path, name="", mode="route", precision=None, flushEvery=1,
+                 flushInterval=None, fsync=True, resume=False):
+        self.path = path
+        self.pending = []
+        self.unflushed = 0
+        self.flushEvery = max(1, int(flushEvery))
+        self.flushInterval = flushInterval
+        self.fsync = fsync
+        self.flushes = 0
+        if resume and os.path.isfile(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as fp:
+                (data, _, _) = self.repair(fp.read())
+            if self.documentMode(data) != mode:
+                raise ValueError(f"'{path}' is not a GPX {mode} log")
+            # continue the repaired document in front of its footer
+            self.file = open(path, "r+b")
+            GPXWriter.__init__(self, self, name, mode, precision)
+            self.pending.clear()
+            self.footerBytes = self.footer().encode("utf-8")
+            if data.endswith(self.footerBytes):
+                self.bodyEnd = len(data) - len(self.footerBytes)
+            else:
+                # footer of another writer: cut at the line of its first closing tag
+                end = data.rfind(b"</trkseg>" if mode == "track" else b"</rte>")
+                self.bodyEnd = data.rfind(b"\n", 0, end) + 1
+            self.file.seek(0)
+            self.file.write(data[:self.bodyEnd])
+            self.file.truncate()
+            self.count = data.count(b"<trkpt " if mode == "track" else b"<rtept ")
+        else:
+            self.file = open(path, "wb")
+            self.bodyEnd = 0
+            GPXWriter.__init__(self, self, name, mode, precision)
+            self.footerBytes = self.footer().encode("utf-8")
+        self.lastFlush = monotonic()
+        self.flush()
+
+    def write(self, text):
+        """ file object interface of the GPXWriter stream, collects the text """
+        self.pending.append(text)
+
+    def waypoint(self, *args, **kwargs):
+        GPXWriter.waypoint(self, *args, **kwargs)
+        self.unflushed += 1
+        self.flushDue()
+
+    def waypoints(self, lats, *args, **kwargs):
+        GPXWriter.waypoints(self, lats, *args, **kwargs)
+        self.unflushed += len(lats)
+        self.flushDue()
+
+    def flushDue(self):
+        if self.unflushed >= self.flushEvery or (
+                self.flushInterval is not None
+                and monotonic() - self.lastFlush >= self.flushInterval):
+            self.flush()
+
+    def flush(self):
+        """--------------------------------------------------------------------------
+        Method to write the collected waypoints and the footer to the file
+        """
+        if self.closed:
+            return
+        data = "".join(self.pending).encode("utf-8")
+        self.pending.clear()
+        self.file.seek(self.bodyEnd)
+        self.file.write(data + self.footerBytes)
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.bodyEnd += len(data)
+        self.unflushed = 0
+        self.flushes += 1
+        self.lastFlush = monotonic()
+
+    def close(self):
+        """--------------------------------------------------------------------------
+        Method to flush the remaining waypoints and close the file
+        """
+        if not self.closed:
+            self.flush()
+            self.closed = True
+            self.file.close()
+
+    @staticmethod
+    def documentMode(data):
+        """ 'track', 'route' or None for the GPX document 'data' (bytes) """
+        if b"<trk>" in data or b"<trk " in data:
+            return "track"
+        if b"<rte>" in data or b"<rte " in data:
+            return "route"
+        return None
+
+    @staticmethod
+    def repair(data):
+        """--------------------------------------------------------------------------
+        Method to repair a truncated GPX log, e.g. of a logger without a
+        GPXLogWriter or after a crash during a flush. The document is cut
+        after its last complete point (or after its header) and the open
+        elements are closed again.
+
+        Args:
+            data (bytes): content of the GPX file
+
+        Return:
+            (tuple) repaired content (bytes), True if it was changed and the
+                    number of bytes cut from the end of the body
+        Raises:
+            ValueError: 'data' is not a GPX document
+        """
+        # a power loss can leave zero filled blocks at the end of the file
+        text = data.rstrip(b"\x00 \t\r\n")
+        if b"<gpx" not in text:
+            raise ValueError("no <gpx> element found")
+        if text.endswith(b"</gpx>"):
+            text += b"\n"
+            return (text, text != data, 0)
+
+        cut = text.find(b">", text.find(b"<gpx")) + 1
+        for tag in (b"<rte>", b"<trkseg>", b"<trk>"):
+            start = text.find(tag)
+            if start >= 0:
+                cut = max(cut, start + len(tag))
+        # the route/track header ends with its <extensions>
+        for tag in (b"<rte>", b"<trk>"):
+            start = text.find(tag)
+            if start >= 0:
+                end = text.find(b"</extensions>", start)
+                first = min((i for i in (text.find(b"<rtept", start), text.find(b"<trkseg", start))
+                             if i >= 0), default=len(text))
+                if 0 <= end < first:
+                    cut = max(cut, end + len(b"</extensions>"))
+        for tag in (b"</rtept>", b"</trkpt>", b"</wpt>", b"</trkseg>", b"</trk>", b"</rte>"):
+            end = text.rfind(tag)
+            if end >= 0:
+                cut = max(cut, end + len(tag))
+        body = text[:cut]
+        if not body.endswith(b"\n"):
+            body += b"\n"
+
+        footer = b""
+        if body.count(b"<trkseg>") > body.count(b"</trkseg>"):
+            footer += b"  </trkseg>\n"
+        if body.count(b"<trk>") + body.count(b"<trk ") > body.count(b"</trk>"):
+            footer += b"</trk>\n"
+        if body.count(b"<rte>") + body.count(b"<rte ") > body.count(b"</rte>"):
+            footer += b"</rte>\n"
+        return (body + footer + b"</gpx>\n", True, len(text) - cut)
@@ -0,0 +1,562 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+# ---------------------------------------------------------------------------
+__author__ = "Volker Petersen <volker.petersen01@gmail.com>"
+__app__ = "NMEA_Ingest.py"
+__version__ = "version 1.0.0, Python >3.11.0"
+__date__ = "Date: 2024/08/01"
+__copyright__ = "Copyright (c) 2024 Volker Petersen"
+__license__ = "GNU General Public License, published by the Free Software Foundation"
+__doc__ = """
+-----------------------------------------------------------------------------
+ Reads NMEA 0183 data from several sources at once (GPS multiplexer, AIS
+ receiver, instruments) and merges them into one stream of timestamped
+ sentences. Each source runs as an asyncio task:
+
+    TCP     client of a NMEA server, reconnects after a connection loss
+    WS      WebSocket client of a NMEA gateway, with keepalive and reconnects
+    UDP     NMEA broadcast datagrams
+    Serial  serial port (pyserial) or pty, read in a worker thread
+    File    replay of a NMEA log file
+
+ All sources are framed with NMEA_Stream.NMEAFramer and counted per source.
+
+    usage: python NMEA_Ingest.py -tcp 169.254.230.248:2053 -udp 10110
+                                 -serial /dev/ttyUSB0:38400 -o nmea.log
+                                 -ws ws://192.168.1.10:3000/nmea
+
+    requirements (only for serial ports / WebSockets):
+        pip install pyserial
+        pip install websockets
+-----------------------------------------------------------------------------
+"""
+
+try:
+    import sys
+    import os
+    import time
+    import asyncio
+    import argparse
+    import socket
+    from collections import namedtuple
+    from NMEA_Stream import NMEAFramer, BUFSIZE
+
+except ImportError as e:
+    print(
+        f"Import error: {str(e)} \nAborting the program {__app__}")
+    sys.exit()
+
+
+QUEUE_SIZE = 10000      # sentences buffered between the sources and the consumer
+RECONNECT = 5.0         # seconds between TCP reconnect attempts
+
+Sentence = namedtuple("Sentence", ["received", "source", "raw"])
+Sentence.__doc__ = """ NMEA sentence (bytes incl. '\\r\\n') received from 'source' at time.time() 'received' """
+
+
+class SourceStats:
+    """ counters of one source """
+
+    def __init__(self):
+        self.bytes = 0
+        self.sentences = 0
+        self.dropped = 0        # sentences lost because the queue was full
+        self.connects = 0
+        self.errors = 0
+        self.lastError = ""
+        self.lastReceived = None
+        self.connected = False
+        self.started = time.time()
+
+    def rate(self):
+        """ sentences per second since the start """
+        elapsed = time.time() - self.started
+        return self.sentences / elapsed if elapsed > 0 else 0.0
+
+
+class Source:
+    """
+    Base class of the NMEA sources. A source reads bytes and hands them to
+    'receive()', which frames the sentences and queues them in the engine.
+
+    Input:
+        name (string) source name in the merged stream and in the stats
+        validate (bool) drop sentences with a wrong checksum when True
+    """
+    kind = "source"
+
+    def __init__(self, name, validate=False):
+        self.name = name
+        self.framer = NMEAFramer(validate=validate)
+        self.stats = SourceStats()
+        self.ingest = None
+
+    def __str__(self):
+        return f"{self.kind} '{self.name}'"
+
+    def frame(self, data):
+        """ frame the received bytes into timestamped sentences """
+        self.stats.bytes += len(data)
+        now = time.time()
+        sentences = [Sentence(now, self.name, raw) for raw in self.framer.feed(data)]
+        if sentences:
+            self.stats.lastReceived = now
+        return sentences
+
+    async def receive(self, data):
+        """ queue the sentences of the received bytes, waits while the queue is full """
+        for sentence in self.frame(data):
+            await self.ingest.queue.put(sentence)
+            self.stats.sentences += 1
+
+    def receiveNowait(self, data):
+        """ queue the sentences of the received bytes from a callback, drops them if the queue is full """
+        for sentence in self.frame(data):
+            try:
+                self.ingest.queue.put_nowait(sentence)
+                self.stats.sentences += 1
+            except asyncio.QueueFull:
+                self.stats.dropped += 1
+
+    def failed(self, error):
+        self.stats.errors += 1
+        self.stats.lastError = f"{type(error).__name__}: {error}"
+        self.stats.connected = False
+
+    async def run(self):
+        raise NotImplementedError
+
+
+class TCPSource(Source):
+    """
+    TCP client of a NMEA server (e.g. the multiplexer on port 2053)
+
+    Input:
+        host (string), port (int) of the NMEA server
+        reconnect (float) seconds before a reconnect, None to stop after a connection loss
+    """
+    kind = "tcp"
+
+    def __init__(self, name, host, port, reconnect=RECONNECT, validate=False):
+        super().__init__(name, validate)
+        self.host = host
+        self.port = port
+        self.reconnect = reconnect
+
+    async def run(self):
+        while True:
+            writer = None
+            try:
+                (reader, writer) = await asyncio.open_connection(self.host, self.port)
+                self.stats.connects += 1
+                self.stats.connected = True
+                while True:
+                    data = await reader.read(BUFSIZE)
+                    if not data:
+                        break
+                    await self.receive(data)
+            except OSError as e:
+                self.failed(e)
+            finally:
+                self.stats.connected = False
+                if writer is not None:
+                    writer.close()
+            # a partial sentence of the old connection never completes
+            self.framer.flush()
+            if self.reconnect is None:
+                return
+            await asyncio.sleep(self.reconnect)
+
+
+class WebSocketSource(Source):
+    """
+    WebSocket client of a NMEA gateway, e.g. an instrument gateway or the
+    SignalK server's NMEA 0183 stream. The messages are text or binary, one
+    sentence per message without line end or a chunk of the NMEA stream.
+
+    The connection is kept alive with pings and is opened again after a
+    connection loss. While the ingest queue is full no more messages are
+    read, the client buffers at most 'maxQueue' messages and then the TCP
+    flow control slows down the server.
+
+    Input:
+        url (string) e.g. 'ws://192.168.1.10:3000/signalk/v1/stream'
+        reconnect (float) seconds before a reconnect, None to stop after a connection loss
+        pingInterval (float) seconds between pings, None to disable the keepalive
+        pingTimeout (float) seconds to wait for the pong before the connection is dropped
+        maxQueue (int) messages buffered by the client
+
+    requirements:
+        pip install websockets
+    """
+    kind = "websocket"
+
+    def __init__(self, name, url, reconnect=RECONNECT, pingInterval=20.0, pingTimeout=20.0,
+                 maxQueue=16, validate=False):
+        super().__init__(name, validate)
+        self.url = url
+        self.reconnect = reconnect
+        self.pingInterval = pingInterval
+        self.pingTimeout = pingTimeout
+        self.maxQueue = maxQueue
+        self.connection = None
+
+    @staticmethod
+    def client():
+        """ websockets' asyncio connect() and its base exception """
+        try:
+            from websockets.asyncio.client import connect
+        except ImportError:
+            # websockets < 13
+            from websockets import connect
+        from websockets.exceptions import WebSocketException
+        return (connect, WebSocketException)
+
+    async def run(self):
+        (connect, WebSocketException) = self.client()
+        while True:
+            try:
+                async with connect(self.url, ping_interval=self.pingInterval,
+                                   ping_timeout=self.pingTimeout, max_queue=self.maxQueue,
+                                   open_timeout=RECONNECT * 2) as self.connection:
+                    self.stats.connects += 1
+                    self.stats.connected = True
+                    async for message in self.connection:
+                        if isinstance(message, str):
+                            message = message.encode("ascii", "replace")
+                        if message[-3:-2] == b"*":
+                            # a sentence without line end
+                            message += b"\r\n"
+                        await self.receive(message)
+            except (OSError, WebSocketException) as e:
+                self.failed(e)
+            finally:
+                self.stats.connected = False
+            self.framer.flush()
+            if self.reconnect is None:
+                return
+            await asyncio.sleep(self.reconnect)
+
+
+class UDPSource(Source):
+    """
+    NMEA datagrams, e.g. the broadcasts of an AIS receiver or instrument gateway
+
+    Input:
+        port (int) UDP port, e.g. 10110
+        host (string) local address to bind, all interfaces by default
+    """
+    kind = "udp"
+
+    def __init__(self, name, port, host="0.0.0.0", validate=False):
+        super().__init__(name, validate)
+        self.host = host
+        self.port = port
+        self.transport = None
+
+    class Protocol(asyncio.DatagramProtocol):
+        def __init__(self, source):
+            self.source = source
+
+        def datagram_received(self, data, addr):
+            if not data.endswith(b"\n"):
+                # a sentence without line end
+                data += b"\r\n"
+            self.source.receiveNowait(data)
+
+        def error_received(self, exc):
+            self.source.failed(exc)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        try:
+            sock.bind((self.host, self.port))
+            self.port = sock.getsockname()[1]
+        except OSError as e:
+            sock.close()
+            self.failed(e)
+            return
+        (self.transport, _) = await loop.create_datagram_endpoint(
+            lambda: UDPSource.Protocol(self), sock=sock)
+        self.stats.connects += 1
+        self.stats.connected = True
+        try:
+            await asyncio.Future()      # runs until cancelled
+        finally:
+            self.stats.connected = False
+            self.transport.close()
+
+
+class SerialSource(Source):
+    """
+    Serial port or pty. The blocking reads run in a worker thread; pyserial
+    is used if it is installed, otherwise the device is read as a file
+    (works for ptys and configured tty devices).
+
+    Input:
+        device (string) e.g. '/dev/ttyUSB0' or 'COM3'
+        baudrate (int) 4800 for NMEA 0183, 38400 for AIS
+        reconnect (float) seconds before the port is opened again, None to stop
+    """
+    kind = "serial"
+
+    def __init__(self, name, device, baudrate=4800, reconnect=RECONNECT, validate=False):
+        super().__init__(name, validate)
+        self.device = device
+        self.baudrate = baudrate
+        self.reconnect = reconnect
+
+    def open(self):
+        try:
+            import serial
+        except ImportError:
+            return FileReader(self.device)
+        return serial.Serial(self.device, self.baudrate, timeout=1.0)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            port = None
+            try:
+                port = await loop.run_in_executor(None, self.open)
+                self.stats.connects += 1
+                self.stats.connected = True
+                while True:
+                    data = await loop.run_in_executor(None, port.read, BUFSIZE)
+                    if data is None:
+                        break
+                    if data:
+                        await self.receive(data)
+            except Exception as e:
+                # OSError or pyserial's SerialException
+                self.failed(e)
+            finally:
+                self.stats.connected = False
+                if port is not None:
+                    port.close()
+            self.framer.flush()
+            if self.reconnect is None:
+                return
+            await asyncio.sleep(self.reconnect)
+
+
+class FileReader:
+    """ pyserial like reader of a tty/pty device without pyserial: read() returns b'' after 1 s idle, None at the end """
+
+    def __init__(self, device):
+        import select
+        self.select = select.select
+        self.fd = os.open(device, os.O_RDONLY | getattr(os, "O_NOCTTY", 0))
+
+    def read(self, size):
+        (ready, _, _) = self.select([self.fd], [], [], 1.0)
+        if not ready:
+            return b""
+        data = os.read(self.fd, size)
+        return data if data else None
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FileSource(Source):
+    """
+    Replay of a NMEA log file
+
+    Input:
+        path (string) NMEA log file
+        rate (float) sentences per second, None to replay as fast as possible
+        repeat (bool) start again at the end of the file
+    """
+    kind = "file"
+
+    def __init__(self, name, path, rate=None, repeat=False, validate=False):
+        super().__init__(name, validate)
+        self.path = path
+        self.rate = rate
+        self.repeat = repeat
+
+    async def run(self):
+        delay = 1.0 / self.rate if self.rate else 0.0
+        try:
+            while True:
+                with open(self.path, "rb") as fp:
+                    self.stats.connects += 1
+                    self.stats.connected = True
+                    line = b"\n"
+                    for (ctr, line) in enumerate(fp):
+                        await self.receive(line)
+                        if delay:
+                            await asyncio.sleep(delay)
+                        elif ctr % 1000 == 999:
+                            await asyncio.sleep(0)      # let the other sources run
+                if not line.endswith(b"\n"):
+                    await self.receive(b"\n")            # last line without line end
+                if not self.repeat:
+                    break
+        except OSError as e:
+            self.failed(e)
+        finally:
+            self.stats.connected = False
+
+
+class NMEAIngest:
+    """
+    Merges the sentences of all sources into one stream
+
+        ingest = NMEAIngest([TCPSource("gps", host, 2053), UDPSource("ais", 10110)])
+        async for sentence in ingest.sentences():
+            ...
+
+    The stream ends when all sources have stopped (file sources at the end
+    of the file, network sources only with reconnect=None) or on stop().
+
+    Input:
+        sources (list of Source)
+        queueSize (int) sentences buffered for a slow consumer
+    """
+
+    def __init__(self, sources=(), queueSize=QUEUE_SIZE):
+        self.sources = []
+        self.queueSize = queueSize
+        self.queue = None
+        self.tasks = []
+        for source in sources:
+            self.add(source)
+
+    def add(self, source):
+        if any(s.name == source.name for s in self.sources):
+            raise ValueError(f"duplicate source name '{source.name}'")
+        source.ingest = self
+        self.sources.append(source)
+        if self.queue is not None:
+            self.startSource(source)
+        return source
+
+    def startSource(self, source):
+        task = asyncio.create_task(source.run(), name=str(source))
+        task.add_done_callback(lambda task: self.sourceDone(source, task))
+        self.tasks.append(task)
+
+    def sourceDone(self, source, task):
+        if not task.cancelled() and task.exception() is not None:
+            source.failed(task.exception())
+        if all(t.done() for t in self.tasks):
+            # end of the stream, queued after the pending sentences
+            if self.queue.full():
+                asyncio.get_running_loop().create_task(self.queue.put(None))
+            else:
+                self.queue.put_nowait(None)
+
+    async def start(self):
+        if self.queue is None:
+            self.queue = asyncio.Queue(self.queueSize)
+            for source in self.sources:
+                self.startSource(source)
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def sentences(self):
+        """ (async generator) of the Sentence tuples of all sources in the order received """
+        await self.start()
+        if not self.tasks:
+            return
+        while True:
+            sentence = await self.queue.get()
+            if sentence is None:
+                return
+            yield sentence
+
+    def stats(self):
+        """ (dictionary) source name -> SourceStats """
+        return {source.name: source.stats for source in self.sources}
+
+    def report(self):
+        """ (string) table of the per source counters """
+        from tabulate import tabulate
+
+        rows = []
+        for source in self.sources:
+            s = source.stats
+            age = f"{time.time() - s.lastReceived:.1f}" if s.lastReceived else "-"
+            rows.append([source.name, source.kind, "up" if s.connected else "down", s.sentences,
+                         f"{s.rate():.1f}", s.bytes, source.framer.invalid, s.dropped,
+                         s.connects, s.errors, age, s.lastError[:40]])
+        return tabulate(rows, headers=["Source", "Type", "State", "Sentences", "per s", "Bytes",
+                                       "Invalid", "Dropped", "Connects", "Errors",
+                                       "Last [s]", "Last error"])
+
+
+def hostPort(spec, defaultHost="0.0.0.0"):
+    """ 'host:port' or 'port' -> (host, port) """
+    (host, _, port) = spec.rpartition(":")
+    return (host or defaultHost, int(port))
+
+
+async def main(args):
+    sources = []
+    for (i, spec) in enumerate(args.tcp or []):
+        (host, port) = hostPort(spec, "localhost")
+        sources.append(TCPSource(f"tcp{i}", host, port, validate=args.validate))
+    for (i, url) in enumerate(args.ws or []):
+        sources.append(WebSocketSource(f"ws{i}", url, validate=args.validate))
+    for (i, spec) in enumerate(args.udp or []):
+        (host, port) = hostPort(spec)
+        sources.append(UDPSource(f"udp{i}", port, host, validate=args.validate))
+    for (i, spec) in enumerate(args.serial or []):
+        (device, _, baud) = spec.partition(":")
+        sources.append(SerialSource(f"serial{i}", device, int(baud or 4800), validate=args.validate))
+    for (i, path) in enumerate(args.file or []):
+        sources.append(FileSource(f"file{i}", path, rate=args.rate, validate=args.validate))
+    if not sources:
+        print("no NMEA source given, see -h")
+        return
+
+    ingest = NMEAIngest(sources)
+    output = open(args.output, "ab") if args.output else None
+    nextReport = time.time() + args.stats
+    try:
+        async for sentence in ingest.sentences():
+            if output is not None:
+                output.write(sentence.raw)
+            elif args.verbose:
+                print(f"{sentence.received:.3f} {sentence.source:8s} {sentence.raw.decode(errors='replace').rstrip()}")
+            if args.stats and sentence.received >= nextReport:
+                nextReport = sentence.received + args.stats
+                print(f"\n{ingest.report()}\n")
+    finally:
+        await ingest.stop()
+        if output is not None:
+            output.close()
+        print(f"\n{ingest.report()}")
+
+
+if __name__ == "__main__":
+    """-------------------------------------------------------------------------
+        Script starting point
+    """
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-tcp", action="append", help="NMEA server 'host:port' (repeatable)")
+    parser.add_argument("-ws", action="append", help="WebSocket url 'ws://host:port/path' (repeatable)")
+    parser.add_argument("-udp", action="append", help="UDP '[address:]port' (repeatable)")
+    parser.add_argument("-serial", action="append", help="serial port 'device[:baudrate]' (repeatable)")
+    parser.add_argument("-file", action="append", help="NMEA log file to replay (repeatable)")
+    parser.add_argument("-rate", type=float, default=None, help="replay rate in sentences/s")
+    parser.add_argument("-o", "--output", help="append the merged sentences to this log file")
+    parser.add_argument("-stats", type=float, default=60.0, help="seconds between the stats reports, 0 for none")
+    parser.add_argument("-validate", action="store_true", help="drop sentences with a wrong checksum")
+    parser.add_argument("-verbose", action="store_true", help="print the sentences")
+    args = parser.parse_args()
+
+    print(f"\nStarting {__app__} {__version__}")
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        print("\nIngest session terminated by user")
@@ -0,0 +1,527 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+# ---------------------------------------------------------------------------
+__author__ = "Volker Petersen <volker.petersen01@gmail.com>"
+__app__ = "NMEA_Logger.py"
+__version__ = "version 1.0.0, Python >3.11.0"
+__date__ = "Date: 2024/08/01"
+__copyright__ = "Copyright (c) 2024 Volker Petersen"
+__license__ = "GNU General Public License, published by the Free Software Foundation"
+__doc__ = """
+-----------------------------------------------------------------------------
+ Logger engine of the NMEA logging scripts. The GPS fixes (RMC sentences)
+ of any transport (TCP socket, NMEA log file, NMEA_Ingest sources) are
+ checked against declarative event rules and every event is logged as a
+ waypoint of a GPX route; all fixes are also recorded at full rate to a
+ binary track file (see NMEA_TrackRecorder.py).
+
+ Rules:
+    PeriodicRule      every 'minutes' minutes, e.g. at 5, 15, 25, ... past the hour
+    WatchRule         each watch change of a watch schedule
+    DailyRule         daily position report at a local hour
+    DistanceRule      after 'nm' nautical miles since the last event of the rule
+    CourseChangeRule  after a course change of more than 'degrees'
+
+ The rules don't check every sentence: each rule tells the scheduler when
+ it is due next (the next local time of the schedule, the earliest time a
+ distance can be reached at 'maxSpeed', ...) and the scheduler keeps the
+ rules in a heap by that time. The due times are UTC, so the repeated hour
+ at the end of DST is logged like any other hour. Per fix the engine
+ compares the fix time with the earliest due time of all rules.
+
+    usage: python NMEA_Logger.py -tcp 169.254.230.248:2053 [-udp 10110]
+                                 [-ws ws://host:port/path] [-file nmea.log] -o trip.gpx
+
+    requirements:
+        https://pypi.org/project/pynmeagps/
+        -m pip install --upgrade pynmeagps
+-----------------------------------------------------------------------------
+"""
+
+try:
+    import sys
+    import os
+    import math
+    import socket
+    import asyncio
+    import argparse
+    import heapq
+    from collections import namedtuple
+    from datetime import datetime, timedelta
+    from pynmeagps.nmeareader import NMEAReader
+    from pynmeagps import latlon2dmm
+    from NavToolsLib import NavTools
+    from GPX_Writer import GPXLogWriter
+    from NMEA_Stream import NMEAStream, DECODERS
+    from NMEA_Time import localTime
+    from NMEA_TrackRecorder import TrackRecorder
+
+except ImportError as e:
+    print(
+        f"Import error: {str(e)} \nAborting the program {__app__}")
+    sys.exit()
+
+
+WATCHES = {0: ["Stbd", "Symbol-X-Large-Green"],
+           1: ["Port", "Symbol-X-Large-Red"],
+          }
+LOCAL_TIME = "US/Pacific"         # local time zone
+GPS_ID = "RMC"                    # NMEA GPS msgID to be processed
+MAX_TIMEOUTS = 70                 # stop after this many socket timeouts
+DST_SHIFT = timedelta(hours=1)    # largest change of the UTC offset at a DST transition
+
+Fix = namedtuple("Fix", ["utc", "local", "lat", "lon", "sog", "cog"])
+Fix.__doc__ = """ GPS fix of a RMC sentence, naive UTC and local datetimes, SOG in kn, COG in degrees (None if missing) """
+
+LogEvent = namedtuple("LogEvent", ["name", "sym", "showName", "priority"])
+LogEvent.__doc__ = """ waypoint of a fired rule, the event with the highest priority of a fix names the waypoint """
+
+
+class Rule:
+    """
+    Base class of the event rules. The scheduler calls start() with the
+    first fix, and fire() followed by next() with the first fix at or after
+    the due time returned by start()/next(). The due times are naive UTC,
+    'clock' (NMEA_Time.LocalTime) is set by the scheduler.
+
+    Input:
+        name (string) appended to the waypoint name
+        sym (string) waypoint symbol
+        showName (bool) show the waypoint name in OpenCPN
+        priority (int) the event of the highest priority of a fix names the waypoint
+    """
+
+    def __init__(self, name="", sym="empty", showName=False, priority=0):
+        self.event = LogEvent(name, sym, showName, priority)
+        self.fired = 0
+        self.clock = None
+
+    def start(self, fix):
+        """ (datetime) UTC time the rule is due first """
+        return self.next(fix)
+
+    def fire(self, fix):
+        """ (LogEvent) event of the due rule, None if its condition is not met """
+        self.fired += 1
+        return self.event
+
+    def next(self, fix):
+        """ (datetime) UTC time the rule is due next, None to retire it """
+        raise NotImplementedError
+
+
+class TimeRule(Rule):
+    """
+    Fires at the local times 'offset' + n * 'every' after midnight, twice
+    in the repeated hour at the end of DST
+
+    Input:
+        every (timedelta) period, should divide a day
+        offset (timedelta) first time after midnight
+    """
+
+    def __init__(self, every, offset=timedelta(0), **kwargs):
+        super().__init__(**kwargs)
+        if every <= timedelta(0):
+            raise ValueError("the period of a time rule must be positive")
+        self.every = every.total_seconds()
+        self.offset = offset
+
+    def boundary(self, fix, after):
+        """
+        First UTC time of the local schedule at (or 'after') the fix. The
+        local times from one DST shift before the fix are converted to UTC
+        until no later local time can give an earlier UTC time.
+        """
+        local = fix.local - DST_SHIFT
+        midnight = local.replace(hour=0, minute=0, second=0, microsecond=0) + self.offset
+        n = math.ceil((local - midnight).total_seconds() / self.every)
+        (best, bestLocal) = (None, None)
+        while True:
+            when = midnight + timedelta(seconds=n * self.every)
+            if bestLocal is not None and when > bestLocal + DST_SHIFT:
+                return best
+            for utc in self.clock.utcTimes(when):
+                if (utc > fix.utc if after else utc >= fix.utc) and (best is None or utc < best):
+                    (best, bestLocal) = (utc, when)
+            n += 1
+
+    def start(self, fix):
+        return self.boundary(fix, after=False)
+
+    def next(self, fix):
+        return self.boundary(fix, after=True)
+
+
+class PeriodicRule(TimeRule):
+    """ every 'minutes' minutes starting 'offset' minutes past the hour (the WP_FREQ waypoints) """
+
+    def __init__(self, minutes=10, offset=5, **kwargs):
+        super().__init__(timedelta(minutes=minutes), timedelta(minutes=offset % minutes), **kwargs)
+
+
+class WatchRule(TimeRule):
+    """
+    Watch changes every 'cycle' hours, with a watch starting at the local
+    hour 'start'; the waypoints alternate between the names/symbols of 'watches'
+    """
+
+    def __init__(self, cycle=3, start=19, watches=WATCHES, priority=1):
+        super().__init__(timedelta(hours=cycle), timedelta(hours=start % cycle),
+                         showName=True, priority=priority)
+        self.watches = watches
+
+    def fire(self, fix):
+        (name, sym) = self.watches[self.fired % len(self.watches)]
+        self.fired += 1
+        return self.event._replace(name=f"_{name}", sym=sym)
+
+
+class DailyRule(TimeRule):
+    """ daily position report at the local 'hour' """
+
+    def __init__(self, hour=8, priority=2):
+        super().__init__(timedelta(days=1), timedelta(hours=hour), name=f"_{hour}:00_Position",
+                         sym="diamond", showName=True, priority=priority)
+
+
+class DistanceRule(Rule):
+    """
+    Fires after 'nm' nautical miles (great circle) since its last event. The
+    distance is only computed again when it could have been reached at
+    'maxSpeed' knots.
+    """
+
+    def __init__(self, nm=5.0, maxSpeed=30.0, navtools=None, **kwargs):
+        super().__init__(**kwargs)
+        self.nm = nm
+        self.maxSpeed = maxSpeed
+        self.distance = (navtools or NavTools()).calc_distance
+        self.last = None
+
+    def start(self, fix):
+        self.last = (fix.lat, fix.lon)
+        return fix.utc + timedelta(hours=self.nm / self.maxSpeed)
+
+    def fire(self, fix):
+        self.remaining = self.nm - self.distance(self.last[0], self.last[1], fix.lat, fix.lon)
+        if self.remaining > 0:
+            return None
+        self.last = (fix.lat, fix.lon)
+        self.remaining = self.nm
+        self.fired += 1
+        return self.event
+
+    def next(self, fix):
+        return fix.utc + timedelta(hours=self.remaining / self.maxSpeed)
+
+
+class CourseChangeRule(Rule):
+    """
+    Fires when the COG differs by more than 'degrees' from the COG of its
+    last event, at speeds of at least 'minSpeed' knots. The COG is checked
+    every 'interval' seconds, not with every fix.
+    """
+
+    def __init__(self, degrees=30.0, minSpeed=2.0, interval=10.0, name="_Course", sym="triangle", **kwargs):
+        super().__init__(name=name, sym=sym, **kwargs)
+        self.degrees = degrees
+        self.minSpeed = minSpeed
+        self.interval = timedelta(seconds=interval)
+        self.course = None
+
+    def fire(self, fix):
+        if fix.cog is None or fix.sog is None or fix.sog < self.minSpeed:
+            return None
+        if self.course is None:
+            self.course = fix.cog
+            return None
+        if abs((fix.cog - self.course + 180.0) % 360.0 - 180.0) <= self.degrees:
+            return None
+        self.course = fix.cog
+        self.fired += 1
+        return self.event
+
+    def start(self, fix):
+        return fix.utc
+
+    def next(self, fix):
+        return fix.utc + self.interval
+
+
+class RuleScheduler:
+    """
+    Heap of the rules by their next due time (UTC). due() returns the
+    events of the rules due at the fix, every other fix costs one comparison.
+
+    Input:
+        rules (list of Rule)
+        clock (LocalTime) local time zone of the time rules, UTC if None
+    """
+
+    def __init__(self, rules, clock=None):
+        self.rules = list(rules)
+        self.clock = localTime("UTC") if clock is None else clock
+        for rule in self.rules:
+            rule.clock = self.clock
+        self.heap = None
+        self.nextDue = datetime.min
+
+    def schedule(self, when, idx):
+        if when is not None:
+            heapq.heappush(self.heap, (when, idx))
+
+    def due(self, fix):
+        """
+        Input:
+            fix (Fix) current GPS fix
+
+        Return:
+            (list of LogEvent) events of the fired rules, sorted by priority
+        """
+        if fix.utc < self.nextDue:
+            return ()
+        if self.heap is None:
+            self.heap = []
+            for (idx, rule) in enumerate(self.rules):
+                self.schedule(rule.start(fix), idx)
+        events = []
+        heap = self.heap
+        while heap and heap[0][0] <= fix.utc:
+            (_, idx) = heapq.heappop(heap)
+            rule = self.rules[idx]
+            event = rule.fire(fix)
+            if event is not None:
+                events.append(event)
+            self.schedule(rule.next(fix), idx)
+        self.nextDue = heap[0][0] if heap else datetime.max
+        if len(events) > 1:
+            events.sort(key=lambda event: event.priority)
+        return events
+
+    def reset(self):
+        """ schedule all rules again from the next fix, e.g. after a gap in the data or a jump back in time """
+        self.heap = None
+        self.nextDue = datetime.min
+
+
+def defaultRules(wpFreq=10, wpOffset=5, watchCycle=3, watchStart=19, dailyReport=8, watches=WATCHES):
+    """ the rules of the NMEA logging scripts: WP_FREQ waypoints, watch changes and the daily report """
+    return [PeriodicRule(wpFreq, wpOffset),
+            WatchRule(watchCycle, watchStart, watches),
+            DailyRule(dailyReport)]
+
+
+class NMEALogger:
+    """
+    Logs the GPS fixes of a NMEA message stream as GPX waypoints according
+    to the event rules. The GPX file is valid after every waypoint (see
+    GPXLogWriter) and all fixes go to the track file '<filename>.trk'.
+
+    Input:
+        filename (string) GPX log file
+        rules (list of Rule) event rules, defaultRules() if None
+        tz (string) local time zone of the rules
+        gpsID (string) msgID of the GPS fixes
+        track (bool) record all fixes in the track file
+        verbose (bool) print the events and a progress dot per second
+        maxTimeouts (int) stop after this many transport timeouts
+    """
+
+    def __init__(self, filename, rules=None, tz=LOCAL_TIME, gpsID=GPS_ID, track=True,
+                 verbose=True, maxTimeouts=MAX_TIMEOUTS):
+        self.filename = filename
+        self.routeName = os.path.basename(filename).split(".")[0]
+        self.clock = localTime(tz)
+        self.scheduler = RuleScheduler(defaultRules() if rules is None else rules, self.clock)
+        self.gpsID = gpsID
+        self.verbose = verbose
+        self.maxTimeouts = maxTimeouts
+        self.logCTR = 0           # count the number of log messages
+        self.fixes = 0
+        self.timeouts = 0
+        self.lastUtc = None
+        self.gpx = GPXLogWriter(filename, self.routeName, precision=6)
+        self.track = TrackRecorder(os.path.splitext(filename)[0] + ".trk", self.routeName) if track else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
+
+    def process(self, nmea):
+        """
+        Process one parsed NMEA message
+
+        Input:
+            nmea (NMEAMessage) pynmeagps message
+
+        Return:
+            (LogEvent) the logged event, None if no waypoint was written
+        """
+        if nmea.msgID != self.gpsID or nmea.lat == "" or nmea.lon == "":
+            return None
+        self.fixes += 1
+        utc = self.clock.utc(nmea.date, nmea.time)
+        if self.track is not None:
+            self.track.recordNMEA(nmea, utc)
+        fix = Fix(utc, self.clock.local(utc), nmea.lat, nmea.lon,
+                  nmea.spd if nmea.spd != "" else None, nmea.cog if nmea.cog != "" else None)
+        if self.lastUtc is not None and utc < self.lastUtc:
+            self.scheduler.reset()    # GPS time went backwards, the due times are in the future
+        events = self.scheduler.due(fix)
+        if not events:
+            if self.verbose and utc != self.lastUtc:
+                print(".", end='')   # one dot per second of valid NMEA reads without an Event
+            self.lastUtc = utc
+            return None
+        self.lastUtc = utc
+        return self.log(fix, events[-1])
+
+    def log(self, fix, event):
+        """ write the waypoint of the event """
+        self.logCTR += 1
+        if self.verbose:
+            pos = latlon2dmm(fix.lat, fix.lon)
+            print(f"\n{self.logCTR} - {fix.local.strftime('%H:%M:%S')} {event.name} Lat {pos[0]}   Lon {pos[1]}")
+        self.gpx.waypoint(fix.lat, fix.lon, fix.utc.isoformat() + "Z", f"NM{self.logCTR:04d}{event.name}",
+                          event.sym, showName=event.showName)
+        return event
+
+    def timeout(self):
+        """ count a transport timeout, True when the logger should stop """
+        self.timeouts += 1
+        if self.verbose:
+            print("?", end='')       # indicates TCP problems (timeout)
+        return self.timeouts >= self.maxTimeouts
+
+    def run(self, messages):
+        """
+        Log a stream of (raw, parsed) messages, e.g. NMEAStream.messages(),
+        a (None, None) item is a transport timeout
+
+        Return:
+            (int) number of logged waypoints
+        """
+        process = self.process
+        for (_, nmea) in messages:
+            if nmea is None:
+                if self.timeout():
+                    break
+                continue
+            process(nmea)
+        return self.logCTR
+
+    async def runAsync(self, sentences):
+        """
+        Log the merged stream of a NMEA_Ingest.NMEAIngest (async iterable of
+        Sentence tuples), only the GPS sentences are parsed
+
+        Return:
+            (int) number of logged waypoints
+        """
+        gpsID = self.gpsID.encode()
+        decode = DECODERS.get(gpsID)
+        if decode is None:
+            parse = NMEAReader.parse
+            decode = lambda raw: parse(raw, validate=0)
+        async for sentence in sentences:
+            raw = sentence.raw
+            if raw[3:6] != gpsID or raw[1:2] == b"P":
+                continue    # other types and proprietary sentences, e.g. '$PGRMC'
+            try:
+                nmea = decode(raw)
+            except Exception:
+                continue
+            if nmea is not None:
+                self.process(nmea)
+        return self.logCTR
+
+    def close(self):
+        self.gpx.close()
+        if self.track is not None:
+            self.track.close()
+
+
+def tcpMessages(host, port, timeout=60, bufsize=4096, msgIDs=(GPS_ID,)):
+    """
+    Transport: (raw, nmea) messages of a NMEA TCP server
+
+    Input:
+        host (string), port (int) of the server
+        timeout (float) seconds until a timeout is reported as (None, None)
+        msgIDs (list of string) sentence types to parse, all if None
+    """
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        yield from NMEAStream(sock, bufsize=bufsize, msgIDs=msgIDs).messages()
+
+
+def fileMessages(filename, msgIDs=(GPS_ID,)):
+    """ Transport: (raw, nmea) messages of the 'msgIDs' sentences (all if None) of a NMEA log file """
+    with open(filename, "rb") as stream:
+        yield from NMEAStream(stream, msgIDs=msgIDs).messages()
+
+
+async def main(args):
+    from NMEA_Ingest import NMEAIngest, TCPSource, WebSocketSource, UDPSource, SerialSource, FileSource, hostPort
+
+    sources = []
+    for (i, spec) in enumerate(args.tcp or []):
+        (host, port) = hostPort(spec, "localhost")
+        sources.append(TCPSource(f"tcp{i}", host, port))
+    for (i, url) in enumerate(args.ws or []):
+        sources.append(WebSocketSource(f"ws{i}", url))
+    for (i, spec) in enumerate(args.udp or []):
+        (host, port) = hostPort(spec)
+        sources.append(UDPSource(f"udp{i}", port, host))
+    for (i, spec) in enumerate(args.serial or []):
+        (device, _, baud) = spec.partition(":")
+        sources.append(SerialSource(f"serial{i}", device, int(baud or 4800)))
+    for (i, path) in enumerate(args.file or []):
+        sources.append(FileSource(f"file{i}", path))
+    if not sources:
+        print("no NMEA source given, see -h")
+        return
+
+    rules = defaultRules(args.wpfreq, 5, args.watchcycle, args.watchstart, args.daily)
+    if args.distance:
+        rules.append(DistanceRule(args.distance))
+    if args.course:
+        rules.append(CourseChangeRule(args.course))
+    ingest = NMEAIngest(sources)
+    with NMEALogger(args.output, rules, args.tz) as logger:
+        try:
+            await logger.runAsync(ingest.sentences())
+        finally:
+            await ingest.stop()
+    print(f"\n\n{logger.logCTR} waypoints of {logger.fixes:,d} fixes logged to '{args.output}'")
+
+
+if __name__ == "__main__":
+    """-------------------------------------------------------------------------
+        Script starting point
+    """
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-tcp", action="append", help="NMEA server 'host:port' (repeatable)")
+    parser.add_argument("-ws", action="append", help="WebSocket url 'ws://host:port/path' (repeatable)")
+    parser.add_argument("-udp", action="append", help="UDP '[address:]port' (repeatable)")
+    parser.add_argument("-serial", action="append", help="serial port 'device[:baudrate]' (repeatable)")
+    parser.add_argument("-file", action="append", help="NMEA log file (repeatable)")
+    parser.add_argument("-o", "--output", default=f"gpx_log_{datetime.now():%Y%m%d_%H%M}.gpx")
+    parser.add_argument("-tz", default=LOCAL_TIME, help="local time zone of the rules")
+    parser.add_argument("-wpfreq", type=int, default=10, help="minutes between the periodic waypoints")
+    parser.add_argument("-watchcycle", type=int, default=3, help="hours per watch")
+    parser.add_argument("-watchstart", type=int, default=19, help="hour of the first watch")
+    parser.add_argument("-daily", type=int, default=8, help="hour of the daily position report")
+    parser.add_argument("-distance", type=float, default=None, help="waypoint every n nm")
+    parser.add_argument("-course", type=float, default=None, help="waypoint at course changes > n degrees")
+    args = parser.parse_args()
+
+    print(f"\nStarting {__app__} {__version__}")
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        print("\nLog Session terminated by user")
@@ -22,13 +22,13 @@ try:
     import sys
     import os
     import socket
-    import pytz
-    import time
     import random
     from datetime import datetime
     from pynmeagps.nmeareader import NMEAReader
     from pynmeagps import latlon2dmm
-    from NavToolsLib import NavTools
+    from NMEA_Stream import NMEAStream
+    from NMEA_Time import LocalTime, localTime
+    from NMEA_Logger import NMEALogger, defaultRules
 
 except ImportError as e:
     print(
@@ -52,7 +52,7 @@ DATE_TIME = "%Y-%m-%d %H:%M:%S"   # date time format
 DATE = "%Y-%m-%d"                 # date format
 DST = True                        # Daylight Savings Time - True/False
 LOCAL_TIME = "US/Pacific"         # local time zone
-MSGLEN = 1024                     # TCP message length in bytes
+MSGLEN = 4096                     # TCP receive buffer size in bytes
 
 
 def logging(filename):
@@ -63,22 +63,8 @@ def logging(filename):
     Input:
         filename (string) log file name
     """
-    logCTR = 0
-    watchChange = True        # true while we're waiting for next watch change
-    dailyEvent = True         # true while we're waiting for next daily event
-    wpEvent = True            # true while we're waiting for next waypoint event
-    logEvent = False          # true when a matching log condition was found
-    watch = 0                 # ctr to alternate between the 2 watches
-    navtools = NavTools()
-    sym = "empty"
-    viz = "viz_name>0"
-    routeName = os.path.basename(filename)
-    routeName = routeName.split(".")[0]
-
     try:
-        socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        socket.settimeout(10)
-        conn, addr = socket.connect((HOST, PORT))
+        conn = socket.create_connection((HOST, PORT), timeout=10)
         if conn:
             print(f"TCP connection via IP {HOST}:{PORT}")
         else:
@@ -88,84 +74,17 @@ def logging(filename):
         print(f"\n{time.strftime(DATE_TIME)}: TCP connection at IP {HOST}:{PORT} failed.\n")
         return
 
+    # watches change at midnight and every WATCH_CYCLE hours, the logger
+    # keeps running through TCP timeouts
+    rules = defaultRules(WP_FREQ, 5, WATCH_CYCLE, 0, DAILY_REPORT, WATCHES)
+    logger = NMEALogger(filename, rules, LOCAL_TIME, "RMC", maxTimeouts=sys.maxsize)
     try:
-        gpx = navtools.strRANDOMreplace(navtools.gpxHeader)
-        gpx = gpx.replace("nameX", routeName)
-        with open(filename, 'w') as writer:
-            writer.write(gpx)
-
-        # infinate loop terminated by Ctrl-C. Runs every 20 seconds
-        while True:
-            nmea = None
-            data = conn.recv(MSGLEN)
-            if data:
-                nmea = NMEAReader.parse(data)
-            if (nmea is not None and nmea.msgID == 'RMC'):
-                utc = merge_date_time(nmea.date, nmea.time)
-                utcStr = utc.strftime(DATE_TIME)+"Z"
-                utcStr = utcStr.replace(" ", "T")
-                local = utc_to_local(utc, LOCAL_TIME)
-                hour = int(local.strftime("%H"))
-                minute = int(local.strftime("%M"))
-                #print(f"\n{logCTR} - {utc} position: Lat {pos[0]}   Lon {pos[1]}")
-                if ((hour%WATCH_CYCLE)==0 and watchChange):
-                    watchChange = False
-                    logEvent = True
-                    name = WATCHES[watch%2][0]
-                    viz = "viz_name>1"  # wp is visible
-                    sym = WATCHES[watch%2][1]
-                    watch = watch + 1
-                    
-                if ((hour%DAILY_REPORT)==0 and dailyEvent):
-                    dailyEvent = False
-                    logEvent = True
-                    name = F"{DAILY_REPORT}:00_Position"
-                    viz = "viz_name>1"  # wp is visible
-                    sym = "diamond"
-
-                # log with WP_FREQ during each hour starting a 5 past the hour
-                if ((minute-5)%WP_FREQ==0 and wpEvent):
-                    wpEvent = False
-                    logEvent = True
-                    name = ""
-                    viz = "viz_name>0"  # wp is not visible
-                    sym = "empty"
-
-                # save log Events to file
-                if logEvent:
-                    logEvent = False
-                    logCTR = logCTR + 1
-                    pos = latlon2dmm(nmea.lat, nmea.lon)
-                    print(f"\n{logCTR} - {utc} position: Lat {pos[0]}   Lon {pos[1]}")
-
-                    with open(filename, 'a') as writer:
-                        wp = navtools.strRANDOMreplace(navtools.gpxWaypoint)
-                        wp = wp.replace("latX", f"{nmea.lat:.6f}")
-                        wp = wp.replace("lonX", f"{nmea.lon:.6f}")
-                        wp = wp.replace("wpX", f"NM{(logCTR):04d}_{name}")
-                        wp = wp.replace("timeX", utcStr)
-                        wp = wp.replace("viz_name>0", viz)
-                        wp = wp.replace("empty", sym)
-                        writer.write(wp)
-                    # end writing to file
-                else:
-                    # enable waiting for next Event whent current Event 
-                    # condition is not any longer true
-                    if(hour%DAILY_REPORT)>0:
-                        dailyEvent = True
-                    if(hour%WATCH_CYCLE)>0:
-                        watchChange = True
-                    if((minute-5)%WP_FREQ)>0:
-                        wpEvent = True
-                    print(".",)   # indicate valid read but no Event condition found
-            else:
-                print("?",)       # indicate TCP problems or no RMC sentence
-            time.sleep(2)
-        # end of while loop
+        logger.run(NMEAStream(conn, bufsize=MSGLEN, msgIDs=("RMC",)).messages())
     except KeyboardInterrupt:
         print("\nLog Session terminated by user")
-        with open(filename, 'a') as writer:
-            writer.write(navtools.gpxFooter)
+    finally:
+        conn.close()
+        logger.close()
     
 
 def tcpNMEAread(stream: socket.socket):
@@ -202,9 +121,10 @@ def fileNMEAread(filename):
     """
     msgcount = 0
     with open(filename, 'rb') as stream:
-        nmr = NMEAReader(stream, nmeaonly=True)
+        # only the RMC sentences are parsed
+        nmr = NMEAStream(stream, msgIDs=('RMC',))
         try:
-            for (raw_data, parsed_data) in nmr:
+            for (raw_data, parsed_data) in nmr.messages():
                 #print(f"\nraw:  {raw_data}")
                 if (parsed_data.msgID == 'RMC'):
                     pos = latlon2dmm(parsed_data.lat, parsed_data.lon)
@@ -215,7 +135,7 @@ def fileNMEAread(filename):
                     print(utc, local, utcxx)
 
                 msgcount += 1
-            print(f"\nRead and parsed {msgcount} NMEA sentences")
+            print(f"\nRead {nmr.framer.sentences} and parsed {msgcount} NMEA sentences")
         except Exception as e:
             print(f"Error reading NMEA from file\n{str(e)}")
 
@@ -243,9 +163,7 @@ def merge_date_time(date, time):
     Return:
         utc dt object
     """
-    dateStr = date.strftime("%Y-%m-%d")
-    utc = datetime.strptime(dateStr+" "+time.strftime("%H:%M:%S"), DATE_TIME)
-    return utc
+    return LocalTime.utc(date, time)
 
 def utc_to_local(utc_dt, tz=LOCAL_TIME):
     """
@@ -258,9 +176,7 @@ def utc_to_local(utc_dt, tz=LOCAL_TIME):
     Return:
         dt object with local time
     """
-    local_tz = pytz.timezone(tz)
-    local_dt = utc_dt.replace(tzinfo=pytz.utc).astimezone(local_tz)
-    return local_dt.astimezone(local_tz)
+    return localTime(tz).aware(utc_dt)
 
 def local_to_utc(local_dt, tz=LOCAL_TIME):
     """
@@ -273,12 +189,7 @@ def local_to_utc(local_dt, tz=LOCAL_TIME):
     Return:
         dt object with UTC time
     """
-    if(local_dt.tzinfo is None or local_dt.tzinfo.utcoffset(local_dt) is None):
-        local_tz = pytz.timezone(tz)
-        local_dt = local_tz.localize(local_dt, is_dst=DST)  # Localize the datetime
-    
-    utc_dt = local_dt.astimezone(pytz.utc)
-    return utc_dt
+    return localTime(tz).toUTC(local_dt, DST)
 
 if __name__ == "__main__":
     print(f"\nStarting {__app__} {__version__}\n{__doc__}")
@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+# ---------------------------------------------------------------------------
+__author__ = "Volker Petersen <volker.petersen01@gmail.com>"
+__app__ = "NMEA_Stream.py"
+__version__ = "version 1.0.0, Python >3.11.0"
+__date__ = "Date: 2024/08/01"
+__copyright__ = "Copyright (c) 2024 Volker Petersen"
+__license__ = "GNU General Public License, published by the Free Software Foundation"
+__doc__ = """
+-----------------------------------------------------------------------------
+ Line framing of NMEA 0183 byte streams (TCP, UDP, serial or log files).
+
+ A TCP packet carries neither exactly one nor only complete sentences: a
+ multiplexer batches several sentences into one packet and splits others
+ across packets. 'NMEAFramer' accumulates the received bytes and returns
+ every complete '$...*hh<CR><LF>' (or '!...' AIS) sentence, 'NMEAStream'
+ reads a socket or file and yields the sentences as they arrive, without
+ any polling delay.
+
+    stream = NMEAStream(sock)
+    for (raw, nmea) in stream.messages():
+        if nmea is not None and nmea.msgID == "RMC":
+            ...
+
+ With 'msgIDs' the stream only parses the wanted sentence types: the ID
+ (and the checksum, with validate=True) is checked on the raw bytes and
+ all other sentences are skipped before any parsing. RMC and GGA are
+ decoded by 'decodeRMC()' / 'decodeGGA()' into named tuples with the
+ pynmeagps attribute names the loggers use, the other types by pynmeagps.
+
+    stream = NMEAStream(fp, msgIDs=("RMC",))
+    for (raw, rmc) in stream.messages():
+        ...
+
+    requirements (only for NMEAStream.messages()):
+        https://pypi.org/project/pynmeagps/
+        -m pip install --upgrade pynmeagps
+-----------------------------------------------------------------------------
+"""
+
+try:
+    import sys
+    import os
+    from functools import reduce
+    from operator import xor
+    from collections import namedtuple
+    from datetime import date, time
+
+except ImportError as e:
+    print(
+        f"Import error: {str(e)} \nAborting the program {__app__}")
+    sys.exit()
+
+
+BUFSIZE = 4096          # bytes per recv()/read() call
+MAXLEN = 1024           # longest accepted sentence incl. garbage, NMEA allows 82 chars
+START = (0x24, 0x21)    # '$' and '!'
+HEX = b"0123456789ABCDEFabcdef"
+
+
+def checksum(body):
+    """
+    NMEA checksum, the XOR of all bytes between '$' and '*'
+
+    Input:
+        body (bytes) sentence without the '$' and the '*hh' checksum
+
+    Return:
+        (string) two hex digits
+    """
+    return f"{reduce(xor, body, 0):02X}"
+
+
+def checksumOK(raw):
+    """ (bool) True if the checksum of the framed sentence 'raw' ('...*hh\\r\\n') is correct """
+    try:
+        return reduce(xor, raw[1:-5], 0) == int(raw[-4:-2], 16)
+    except ValueError:
+        return False
+
+
+RMCMessage = namedtuple("RMCMessage", ["msgID", "talker", "time", "status", "lat", "lon",
+                                       "spd", "cog", "date", "posMode"])
+GGAMessage = namedtuple("GGAMessage", ["msgID", "talker", "time", "lat", "lon", "quality",
+                                       "numSV", "HDOP", "alt"])
+
+
+def toFloat(field):
+    return float(field) if field else ""
+
+
+def toInt(field):
+    return int(field) if field else ""
+
+
+def toTime(field):
+    """ NMEA 'hhmmss.ss' -> time, '' if empty """
+    if not field:
+        return ""
+    fraction = field[7:13]
+    micro = int(fraction + b"0" * (6 - len(fraction))) if fraction else 0
+    return time(int(field[0:2]), int(field[2:4]), int(field[4:6]), micro)
+
+
+def toDate(field):
+    """ NMEA 'ddmmyy' -> date, '' if empty (years 69-99 are 19xx like strptime) """
+    if not field:
+        return ""
+    year = int(field[4:6])
+    return date(year + (1900 if year >= 69 else 2000), int(field[2:4]), int(field[0:2]))
+
+
+def toDegrees(field, hemisphere):
+    """ NMEA '(d)ddmm.mmmmm' and 'N'/'S'/'E'/'W' -> signed decimal degrees, '' if empty """
+    dp = field.find(b".")
+    if dp < 0:
+        dp = len(field)
+    if dp < 4:
+        return ""
+    degrees = round(int(field[:dp - 2]) + float(field[dp - 2:]) / 60.0, 10)
+    return -degrees if hemisphere in (b"S", b"W") else degrees
+
+
+def decodeRMC(raw):
+    """
+    Fast decoder of the RMC fields the loggers use, the same values as
+    pynmeagps ('' for empty fields)
+
+    Input:
+        raw (bytes) framed sentence '$--RMC,...*hh\\r\\n'
+
+    Return:
+        (RMCMessage) or None if a field is invalid
+    """
+    f = raw[1:-5].split(b",")
+    if len(f) < 10:
+        return None
+    try:
+        return RMCMessage("RMC", raw[1:3].decode(), toTime(f[1]), f[2].decode(),
+                          toDegrees(f[3], f[4]), toDegrees(f[5], f[6]), toFloat(f[7]),
+                          toFloat(f[8]), toDate(f[9]), f[12].decode() if len(f) > 12 else "")
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def decodeGGA(raw):
+    """
+    Fast decoder of the GGA position fields, the same values as pynmeagps
+
+    Input:
+        raw (bytes) framed sentence '$--GGA,...*hh\\r\\n'
+
+    Return:
+        (GGAMessage) or None if a field is invalid
+    """
+    f = raw[1:-5].split(b",")
+    if len(f) < 10:
+        return None
+    try:
+        return GGAMessage("GGA", raw[1:3].decode(), toTime(f[1]), toDegrees(f[2], f[3]),
+                          toDegrees(f[4], f[5]), toInt(f[6]), toInt(f[7]), toFloat(f[8]),
+                          toFloat(f[9]))
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+DECODERS = {b"RMC": decodeRMC, b"GGA": decodeGGA}
+
+
+class NMEAFramer:
+    """
+    Splits a byte stream into NMEA sentences. Bytes are appended with feed(),
+    which returns all sentences completed by them. A sentence starts at the
+    last '$' or '!' before the line end, so the garbage of a partly received
+    or interrupted sentence is skipped. Each sentence is returned with a
+    '\\r\\n' line end, even if the source only sends '\\n'.
+
+    Input:
+        validate (bool) drop sentences with a wrong checksum when True
+        maxLength (int) longest line kept in the buffer while waiting for its end
+    """
+
+    def __init__(self, validate=False, maxLength=MAXLEN):
+        self.validate = validate
+        self.maxLength = maxLength
+        self.buffer = bytearray()
+        self.sentences = 0      # complete sentences returned
+        self.invalid = 0        # lines without a '$...*hh' sentence or with a bad checksum
+        self.discarded = 0      # bytes dropped (garbage, invalid and overlong lines)
+
+    def feed(self, data):
+        """
+        Append received bytes and return the completed sentences
+
+        Input:
+            data (bytes) next chunk of the stream
+
+        Return:
+            (list of bytes) complete sentences
+        """
+        buf = self.buffer
+        buf += data
+        sentences = []
+        start = 0
+        while True:
+            end = buf.find(b"\n", start)
+            if end < 0:
+                break
+            sentence = self.frame(buf, start, end)
+            if sentence is not None:
+                sentences.append(sentence)
+            start = end + 1
+        if start:
+            del buf[:start]
+        if len(buf) > self.maxLength:
+            # no line end in sight, keep only a possible sentence start
+            keep = max(buf.rfind(b"$"), buf.rfind(b"!"))
+            if keep < 0 or len(buf) - keep > self.maxLength:
+                keep = len(buf)
+            self.discarded += keep
+            del buf[:keep]
+        self.sentences += len(sentences)
+        return sentences
+
+    def frame(self, buf, start, end):
+        """ the sentence in buf[start:end] ('\\n' at end) or None """
+        first = max(buf.rfind(b"$", start, end), buf.rfind(b"!", start, end))
+        stop = end
+        if stop > start and buf[stop - 1] == 0x0D:
+            stop -= 1
+        if first < 0 or stop - first < 7 or buf[stop - 3] != 0x2A \
+                or buf[stop - 2] not in HEX or buf[stop - 1] not in HEX:
+            self.invalid += 1
+            self.discarded += end + 1 - start
+            return None
+        self.discarded += first - start
+        if self.validate and checksum(buf[first + 1:stop - 3]) != buf[stop - 2:stop].decode().upper():
+            self.invalid += 1
+            self.discarded += stop - first
+            return None
+        return bytes(buf[first:stop]) + b"\r\n"
+
+    def flush(self):
+        """ drop a pending incomplete sentence, e.g. after a reconnect """
+        self.discarded += len(self.buffer)
+        self.buffer.clear()
+
+
+class NMEAStream:
+    """
+    Iterates over the NMEA sentences of a socket or a binary file object.
+    The iteration blocks in recv()/read() until data arrives and ends at the
+    end of the stream. A socket timeout is reported by yielding None, so the
+    caller can count connection problems and decide whether to stop.
+
+    Input:
+        source (socket.socket or binary file object)
+        validate (bool) drop sentences with a wrong checksum when True
+        bufsize (int) bytes per recv()/read() call
+        msgIDs (list of string) sentence types parsed by messages(), e.g.
+            ('RMC', 'GGA'), all types if None
+        fast (bool) decode RMC and GGA with the fast decoders instead of pynmeagps
+    """
+
+    def __init__(self, source, validate=False, bufsize=BUFSIZE, msgIDs=None, fast=True):
+        self.source = source
+        self.msgIDs = None if msgIDs is None else frozenset(m.encode() for m in msgIDs)
+        # with msgIDs only the checksums of the wanted sentences are checked
+        self.validate = validate
+        self.framer = NMEAFramer(validate=validate and self.msgIDs is None)
+        self.bufsize = bufsize
+        self.read = source.recv if hasattr(source, "recv") else source.read
+        self.decoders = DECODERS if fast else {}
+        self.timeouts = 0
+        self.errors = 0         # sentences pynmeagps could not parse
+        self.skipped = 0        # sentences of other types than msgIDs
+
+    def __iter__(self):
+        framer = self.framer
+        while True:
+            try:
+                data = self.read(self.bufsize)
+            except TimeoutError:
+                self.timeouts += 1
+                yield None
+                continue
+            if not data:
+                return
+            yield from framer.feed(data)
+
+    def messages(self):
+        """
+        Parse the sentences of the stream with pynmeagps, or only the
+        sentences of 'msgIDs' with the fast decoders (RMC, GGA) or pynmeagps
+
+        Return:
+            (generator) of (raw bytes, NMEAMessage) tuples, (None, None) on a timeout
+        """
+        from pynmeagps.nmeareader import NMEAReader
+
+        parse = NMEAReader.parse
+        msgIDs = self.msgIDs
+        decoders = self.decoders
+        validate = self.validate and msgIDs is not None
+        for raw in self:
+            if raw is None:
+                yield (None, None)
+                continue
+            if msgIDs is not None:
+                msgID = raw[3:6]
+                # proprietary sentences ('$P' + maker + type) have no talker ID
+                if msgID not in msgIDs or raw[1:2] == b"P":
+                    self.skipped += 1
+                    continue
+                if validate and not checksumOK(raw):
+                    self.framer.invalid += 1
+                    continue
+                decode = decoders.get(msgID)
+                if decode is not None:
+                    nmea = decode(raw)
+                    if nmea is None:
+                        self.errors += 1
+                    else:
+                        yield (raw, nmea)
+                    continue
+            try:
+                nmea = parse(raw, validate=0)
+            except Exception:
+                self.errors += 1
+                continue
+            if nmea is not None:
+                yield (raw, nmea)
+
+    def stats(self):
+        """ (dictionary) with the stream counters """
+        return {"sentences": self.framer.sentences, "invalid": self.framer.invalid,
+                "discarded": self.framer.discarded, "errors": self.errors,
+                "skipped": self.skipped, "timeouts": self.timeouts}
+
+
+if __name__ == "__main__":
+    """-------------------------------------------------------------------------
+        Script starting point: frame and count the sentences of a log file
+    """
+    filename = sys.argv[1] if len(sys.argv) > 1 else \
+        os.path.join(os.path.dirname(os.path.realpath(__file__)), "nmea_sample.log")
+    counts = {}
+    with open(filename, "rb") as fp:
+        stream = NMEAStream(fp)
+        for (raw, nmea) in stream.messages():
+            counts[nmea.msgID] = counts.get(nmea.msgID, 0) + 1
+    print(f"{filename}: {counts}\n{stream.stats()}")
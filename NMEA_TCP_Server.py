@@ -3,7 +3,7 @@
 # ---------------------------------------------------------------------------
 __author__ = "Volker Petersen <volker.petersen01@gmail.com>"
 __app__ = "NMEA_TCP_Server.py"
-__version__ = "version 1.0.0, Python >3.11.0"
+__version__ = "version 2.0.0, Python >3.11.0"
 __date__ = "Date: 2024/03/25"
 __copyright__ = "Copyright (c) 2024 Volker Petersen"
 __license__ = "GNU General Public License, published by the Free Software Foundation"
@@ -11,9 +11,16 @@ __doc__ = """
 -----------------------------------------------------------------------------
  test server to generate TCP NMEA messenges
 
-    requirements:
-        https://pypi.org/project/pynmeagps/
-        -m pip install --upgrade pynmeagps
+ Replays one or more NMEA log files to all connected TCP clients, like the
+ NMEA multiplexer on board. The sentences are sent with the time steps of
+ the log (taken from the RMC/GGA/... time field) divided by the speed
+ factor, i.e. '-speed 60' replays an hour of data in a minute and
+ '-speed max' sends as fast as the clients read. The replay starts when
+ '-clients' clients are connected and the connections are closed at the
+ end of the replay, unless '-loop' is given.
+
+    usage: python NMEA_TCP_Server.py [files ...] [-speed 1|60|max] [-loop]
+                                     [-clients n] [-only RMC,GGA]
 -----------------------------------------------------------------------------
 """
 
@@ -21,12 +28,10 @@ try:
     import sys
     import os
     import socket
-    import pytz
-    from time import sleep
-    from datetime import datetime
-    from pynmeagps.nmeareader import NMEAReader
-    from pynmeagps import latlon2dmm, haversine, bearing
-    from NavToolsLib import NavTools
+    import asyncio
+    import argparse
+    import time
+    from NMEA_Stream import NMEAFramer
 
 except ImportError as e:
     print(
@@ -35,111 +40,268 @@ except ImportError as e:
 
 HOST = "10.11.13.110"             # TCP IP address
 PORT = 2053                       # TCP Port
-DATE_TIME = "%Y-%m-%d %H:%M:%S"   # date time format
-DATE = "%Y-%m-%d"                 # date format
-MSGLEN = 1024                     # TCP message length in bytes
-GPS_ID = "RMC"                    # NMEA GPS msgID to be processed
-LOCAL_TIME = "US/Pacific"         # local time zone
+MSGLEN = 65536                    # file read size and max. bytes per send at '-speed max'
+HIGH_WATER = 262144               # bytes buffered per client before the replay waits for it
+DRAIN_TIMEOUT = 10.0              # seconds a client may stay above HIGH_WATER before it is dropped
+
+# sentences with a UTC time field and the index of the field
+TIME_FIELDS = {b"RMC": 1, b"GGA": 1, b"GNS": 1, b"ZDA": 1, b"GLL": 5}
 
 
-def fileNMEAread(filename, conn):
+class NMEAClock:
     """
-    Read NMEA data from file.
+    Replay clock of a NMEA log. The clock follows the time field of the first
+    sentence type with a time it sees (normally RMC), so the out of order
+    times of the other sentences don't move it back and forth.
 
-    Input:
-        filename: name of the NMEA log file to parse
+    advance(raw) returns the seconds since the previous time step. A time
+    jump backwards or of more than 12 hours is a new start (0 seconds), a
+    step past midnight is handled, and 'maxGap' caps long gaps in the log.
     """
-    msgcount = 0
-    with open(filename, 'rb') as stream:
-        nmr = NMEAReader(stream, nmeaonly=True, validate=0)
+
+    def __init__(self, maxGap=None):
+        self.maxGap = maxGap
+        self.msgID = None
+        self.last = None
+
+    @staticmethod
+    def seconds(raw, index):
+        """ seconds of the day of the 'hhmmss.ss' time field or None """
+        fields = raw.split(b",", index + 1)
+        if len(fields) <= index:
+            return None
+        field = fields[index]
+        if len(field) < 6:
+            return None
         try:
-            for (raw_data, parsed_data) in nmr:
-                #print(f"Msg {msgcount:3d} - parsed_data.msgID")
-                if (parsed_data.msgID == GPS_ID):
-                    pos = latlon2dmm(parsed_data.lat, parsed_data.lon)
-                    utc = merge_date_time(parsed_data.date, parsed_data.time)
-                    local = utc_to_local(utc, LOCAL_TIME)
-                    utcxx = local_to_utc(local, LOCAL_TIME)
-                    print(f"SERVER: {parsed_data.msgID}: {utc}  Lat {pos[0]}   Lon {pos[1]}")
-                    #print(utc, local, utcxx)
-                    conn.send(raw_data)
-                msgcount += 1
-                sleep(1)
-            print(f"\nRead and parsed {msgcount} NMEA sentences")
-        except Exception as e:
-            print(f"SERVER shutdown.\nError:'{str(e)}'")
-
-def merge_date_time(date, time):
-    """
-    Combine the NMEA GPS time and date into one dt object
+            return int(field[0:2]) * 3600 + int(field[2:4]) * 60 + float(field[4:].split(b"*")[0])
+        except ValueError:
+            return None
 
-    Input:
-        dt object with NMEA gps time 
-        dt object with NMEA gps date
+    def advance(self, raw):
+        msgID = raw[3:6]
+        if self.msgID is None:
+            if msgID not in TIME_FIELDS:
+                return 0.0
+        elif msgID != self.msgID:
+            return 0.0
+        now = self.seconds(raw, TIME_FIELDS[msgID])
+        if now is None:
+            return 0.0
+        self.msgID = msgID
+        last = self.last
+        self.last = now
+        if last is None:
+            return 0.0
+        step = (now - last) % 86400.0
+        if step > 43200.0:
+            return 0.0
+        if self.maxGap is not None and step > self.maxGap:
+            return self.maxGap
+        return step
 
-    Return:
-        utc dt object
-    """
-    dateStr = date.strftime("%Y-%m-%d")
-    utc = datetime.strptime(dateStr+" "+time.strftime("%H:%M:%S"), DATE_TIME)
-    return utc
 
-def utc_to_local(utc_dt, tz=LOCAL_TIME):
+class ReplayServer:
     """
-    Convert UTC dt to local timezone
+    asyncio TCP server replaying NMEA log files to all connected clients
 
     Input:
-        utc dt object
-        tz timezone designator
-
-    Return:
-        dt object with local time
+        files (list of strings) NMEA log files, replayed one after the other
+        host (string), port (int) of the server, port 0 picks a free port
+        speed (float) time scale of the replay, 0 or None: as fast as possible
+        loop (bool) repeat the files until the server is stopped
+        clients (int) number of clients to wait for before the replay starts
+        only (list of strings) msgIDs to send (e.g. ['RMC', 'GGA']), all by default
+        maxGap (float) longest replayed pause in log seconds
+        drainTimeout (float) seconds a client may stay above HIGH_WATER before it is dropped
     """
-    local_tz = pytz.timezone(tz)
-    local_dt = utc_dt.replace(tzinfo=pytz.utc).astimezone(local_tz)
-    return local_dt.astimezone(local_tz)
 
-def local_to_utc(local_dt, tz=LOCAL_TIME):
-    """
-    Convert local timezone to UTC dt
+    def __init__(self, files, host="localhost", port=PORT, speed=1.0, loop=False,
+                 clients=1, only=None, maxGap=None, verbose=False, drainTimeout=DRAIN_TIMEOUT):
+        self.files = list(files)
+        self.host = host
+        self.port = port
+        self.speed = speed or None
+        self.loop = loop
+        self.minClients = clients
+        self.only = {msgID.encode() for msgID in only} if only else None
+        self.maxGap = maxGap
+        self.verbose = verbose
+        self.drainTimeout = drainTimeout
+        self.clients = set()
+        self.handlers = set()
+        self.connected = None
+        self.server = None
+        self.sent = 0           # sentences
+        self.bytes = 0          # bytes per client
+        self.logTime = 0.0      # replayed seconds of log time
+        self.passes = 0
+        self.dropped = 0        # clients dropped for not reading
 
-    Input:
-        local dt object
-        tz timezone designator
+    async def start(self):
+        self.connected = asyncio.Event()
+        self.server = await asyncio.start_server(self.client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def client(self, reader, writer):
+        """ connection handler, the client stays registered until it disconnects """
+        self.clients.add(writer)
+        self.handlers.add(asyncio.current_task())
+        if self.verbose:
+            print(f"SERVER: Received connection at: {writer.get_extra_info('peername')}")
+        if len(self.clients) >= self.minClients:
+            self.connected.set()
+        try:
+            while await reader.read(1024):
+                pass                # clients don't send anything, wait for EOF
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(writer)
+            self.handlers.discard(asyncio.current_task())
+            writer.close()
+
+    async def send(self, batch):
+        """
+        send the sentences to all clients, waits for the clients with a full
+        buffer at the same time and drops those still full after 'drainTimeout'
+        """
+        if not batch:
+            return
+        data = b"".join(batch)
+        self.sent += len(batch)
+        self.bytes += len(data)
+        slow = []
+        for writer in list(self.clients):
+            if writer.is_closing():
+                self.clients.discard(writer)
+                continue
+            writer.write(data)
+            if writer.transport.get_write_buffer_size() > HIGH_WATER:
+                slow.append(writer)
+        if slow:
+            results = await asyncio.gather(
+                *[asyncio.wait_for(writer.drain(), self.drainTimeout) for writer in slow],
+                return_exceptions=True)
+            for (writer, result) in zip(slow, results):
+                if isinstance(result, (ConnectionError, asyncio.TimeoutError)):
+                    self.drop(writer)
+        batch.clear()
+
+    def drop(self, writer):
+        """ disconnect a client without waiting for its buffered data """
+        self.clients.discard(writer)
+        self.dropped += 1
+        if self.verbose:
+            print(f"SERVER: Dropped the client at: {writer.get_extra_info('peername')}")
+        writer.transport.abort()
+
+    async def replay(self):
+        """ replay the files, returns at the end unless 'loop' is set """
+        await self.connected.wait()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        while True:
+            for filename in self.files:
+                clock = NMEAClock(self.maxGap)
+                framer = NMEAFramer()
+                batch = []
+                size = 0
+                with open(filename, "rb") as fp:
+                    while True:
+                        data = fp.read(MSGLEN)
+                        if not data:
+                            data = b"\n"        # last line without line end
+                        for raw in framer.feed(data):
+                            step = clock.advance(raw)
+                            if step:
+                                self.logTime += step
+                                if self.speed:
+                                    await self.send(batch)
+                                    size = 0
+                                    delay = start + self.logTime / self.speed - loop.time()
+                                    if delay > 0:
+                                        await asyncio.sleep(delay)
+                            if self.only is not None and raw[3:6] not in self.only:
+                                continue
+                            batch.append(raw)
+                            size += len(raw)
+                            if size >= MSGLEN:
+                                await self.send(batch)
+                                size = 0
+                        if data == b"\n":
+                            break
+                await self.send(batch)
+            self.passes += 1
+            if self.verbose:
+                print(f"SERVER: {self.passes}. time thru the NMEA file(s), {self.sent:,d} sentences sent")
+            if not self.loop:
+                return
+            # no pause between the end and the start of the next pass
+            await asyncio.sleep(0)
+
+    async def close(self):
+        for writer in list(self.clients):
+            writer.close()
+        # the handlers end with the EOF of the closed connections
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def run(self):
+        """ start, replay and close """
+        if self.server is None:
+            await self.start()
+        try:
+            await self.replay()
+        finally:
+            await self.close()
+
+
+def speedFactor(value):
+    """ argparse type of '-speed': a number or 'max' """
+    if value.lower() in ("max", "0"):
+        return 0.0
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("the speed must be > 0 or 'max'")
+    return speed
+
+
+async def main(args):
+    server = ReplayServer(args.files, args.host, args.port, args.speed, args.loop,
+                          args.clients, args.only.split(",") if args.only else None,
+                          args.maxgap, verbose=True)
+    await server.start()
+    print(f"Server is listening on {args.host} {server.port}, waiting for {args.clients} client(s)")
+    started = time.perf_counter()
+    await server.run()
+    elapsed = time.perf_counter() - started
+    print(f"\nReplayed {server.sent:,d} NMEA sentences ({server.bytes/1e6:.1f} MB per client) "
+          f"and {server.logTime/3600.0:.2f} hrs of log time in {elapsed:.1f} seconds")
 
-    Return:
-        dt object with UTC time
-    """
-    if(local_dt.tzinfo is None or local_dt.tzinfo.utcoffset(local_dt) is None):
-        local_tz = pytz.timezone(tz)
-        local_dt = local_tz.localize(local_dt, is_dst=DST)  # Localize the datetime
-    
-    utc_dt = local_dt.astimezone(pytz.utc)
-    return utc_dt
 
 if __name__ == "__main__":
     print(f"\nStarting {__app__} {__version__}\n{__doc__}")
     scriptPath = os.path.dirname(os.path.realpath(__file__))
-    
-    filename = os.path.join(scriptPath, "nmea_sample.log")
-
-    host = socket.gethostname()
-    port = 2053  # initiate port no above 1024
-    print(f"Server is connecting to {host} {port}")
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # get instance
-    # look closely. The bind() function takes tuple as argument
-    server_socket.bind((host, port))  # bind host address and port together
-
-    # configure how many client the server can listen simultaneously
-    server_socket.listen(2)
-    conn, address = server_socket.accept()  # accept new connection
-    print("SERVER: Received connection at: " + str(address))
 
-    for i in range(1):
-        print(f"\n{i+1}. time thru the gpx file....")
-        fileNMEAread(filename, conn)
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", default=[os.path.join(scriptPath, "nmea_sample.log")],
+                        help="NMEA log files, nmea_sample.log by default")
+    parser.add_argument("-host", default=socket.gethostname())
+    parser.add_argument("-port", type=int, default=PORT)
+    parser.add_argument("-speed", type=speedFactor, default=1.0, help="time scale factor or 'max'")
+    parser.add_argument("-loop", action="store_true", help="repeat the files until Ctrl-C")
+    parser.add_argument("-clients", type=int, default=1, help="clients to wait for before the replay starts")
+    parser.add_argument("-only", help="comma separated msgIDs to send, e.g. 'RMC,GGA'")
+    parser.add_argument("-maxgap", type=float, default=None, help="longest replayed pause in log seconds")
+    args = parser.parse_args()
 
-    conn.close()
-    server_socket.close()
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        print("\nSERVER shutdown by user")
 
-    print("\n\nDone!\n")
\ No newline at end of file
+    print("\n\nDone!\n")
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+# ---------------------------------------------------------------------------
+__author__ = "Volker Petersen <volker.petersen01@gmail.com>"
+__app__ = "NMEA_Time.py"
+__version__ = "version 1.0.0, Python >3.11.0"
+__date__ = "Date: 2024/08/01"
+__copyright__ = "Copyright (c) 2024 Volker Petersen"
+__license__ = "GNU General Public License, published by the Free Software Foundation"
+__doc__ = """
+-----------------------------------------------------------------------------
+ UTC / local time conversions of the NMEA loggers, cheap enough for every
+ RMC sentence of a 10 Hz GPS. 'LocalTime' builds the UTC datetime directly
+ from the NMEA date and time fields and keeps the UTC offset of the time
+ zone until the next daylight saving time transition, so a conversion is a
+ comparison and an addition instead of a pytz lookup and two astimezone()
+ calls.
+
+    clock = localTime("US/Pacific")
+    utc = clock.utc(nmea.date, nmea.time)
+    (hour, minute) = clock.hourMinute(utc)
+
+    requirements:
+        https://pypi.org/project/pytz/
+-----------------------------------------------------------------------------
+"""
+
+try:
+    import sys
+    from bisect import bisect_right
+    from datetime import datetime, timedelta
+    import pytz
+
+except ImportError as e:
+    print(
+        f"Import error: {str(e)} \nAborting the program {__app__}")
+    sys.exit()
+
+
+RECHECK = timedelta(minutes=15)     # offset lifetime of zones without a transition table
+_clocks = {}                        # LocalTime instances by time zone name
+
+
+class LocalTime:
+    """
+    Cached UTC -> local time conversion of one time zone. All datetimes are
+    naive, UTC or local wall clock time, like the loggers use them.
+
+    Input:
+        tz (string) pytz time zone name, e.g. 'US/Pacific'
+    """
+
+    def __init__(self, tz):
+        self.tz = tz
+        self.zone = pytz.timezone(tz)
+        # UTC times of the DST transitions of pytz' DstTzInfo zones
+        self.transitions = getattr(self.zone, "_utc_transition_times", None)
+        self.validFrom = datetime.max
+        self.validUntil = datetime.min
+        self.offset = timedelta(0)
+        self.lookups = 0
+
+    def offsetAt(self, utc):
+        """
+        UTC offset of the zone at 'utc', looked up only when 'utc' is outside
+        of the period of the cached offset
+
+        Input:
+            utc (datetime) naive UTC time
+
+        Return:
+            (timedelta) local time - UTC
+        """
+        if self.validFrom <= utc < self.validUntil:
+            return self.offset
+        self.lookups += 1
+        aware = pytz.utc.localize(utc).astimezone(self.zone)
+        self.offset = aware.utcoffset()
+        if self.transitions:
+            i = bisect_right(self.transitions, utc)
+            self.validFrom = self.transitions[i - 1] if i > 0 else datetime.min
+            self.validUntil = self.transitions[i] if i < len(self.transitions) else datetime.max
+        elif hasattr(self.zone, "_utcoffset"):
+            # fixed offset zone (UTC, StaticTzInfo)
+            self.validFrom = datetime.min
+            self.validUntil = datetime.max
+        else:
+            # no transition table: check the offset again after a while
+            self.validFrom = utc
+            self.validUntil = utc + RECHECK
+        return self.offset
+
+    @staticmethod
+    def utc(date, time):
+        """
+        Combine the NMEA GPS date and time into one naive UTC datetime
+
+        Input:
+            date (date) NMEA gps date, e.g. pynmeagps 'nmea.date'
+            time (time) NMEA gps time, e.g. pynmeagps 'nmea.time'
+
+        Return:
+            (datetime) UTC time, whole seconds
+        """
+        return datetime(date.year, date.month, date.day, time.hour, time.minute, time.second)
+
+    def local(self, utc):
+        """ naive local time of the naive UTC time 'utc' """
+        return utc + self.offsetAt(utc)
+
+    def aware(self, utc):
+        """ timezone aware local time of the naive UTC time 'utc' (same as the old utc_to_local()) """
+        return self.zone.fromutc(utc.replace(tzinfo=self.zone))
+
+    def hourMinute(self, utc):
+        """ (tuple) local hour and minute (ints) of the naive UTC time 'utc' """
+        local = utc + self.offsetAt(utc)
+        return (local.hour, local.minute)
+
+    def toUTC(self, local, isDST=True):
+        """
+        Convert a naive or aware local time to an aware UTC time
+
+        Input:
+            local (datetime) local time
+            isDST (bool) DST flag of ambiguous/missing local times
+        """
+        if local.tzinfo is None or local.tzinfo.utcoffset(local) is None:
+            local = self.zone.localize(local, is_dst=isDST)
+        return local.astimezone(pytz.utc)
+
+    def utcTimes(self, local):
+        """
+        Naive UTC times of a naive local wall clock time: two in the repeated
+        hour at the end of DST, one otherwise (the time after the gap if
+        'local' falls into the skipped hour at the start of DST)
+
+        Input:
+            local (datetime) naive local time
+
+        Return:
+            (list of datetime) naive UTC times, in ascending order
+        """
+        times = []
+        for isDST in (True, False):
+            utc = self.toUTC(local, isDST).replace(tzinfo=None)
+            if utc + self.offsetAt(utc) == local and utc not in times:
+                times.append(utc)
+        return times or [self.toUTC(local, False).replace(tzinfo=None)]
+
+
+def localTime(tz):
+    """ shared LocalTime instance of the time zone 'tz' """
+    clock = _clocks.get(tz)
+    if clock is None:
+        clock = _clocks[tz] = LocalTime(tz)
+    return clock
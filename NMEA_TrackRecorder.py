@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+# ---------------------------------------------------------------------------
+__author__ = "Volker Petersen <volker.petersen01@gmail.com>"
+__app__ = "NMEA_TrackRecorder.py"
+__version__ = "version 1.0.0, Python >3.11.0"
+__date__ = "Date: 2024/08/01"
+__copyright__ = "Copyright (c) 2024 Volker Petersen"
+__license__ = "GNU General Public License, published by the Free Software Foundation"
+__doc__ = """
+-----------------------------------------------------------------------------
+ Full rate track recorder. Every GPS fix is appended to a binary track file
+ ('.trk') as a fixed width record:
+
+    time     float64  UTC seconds since 1970-01-01
+    lat/lon  float64  degrees
+    sog      float32  speed over ground in knots (NaN if missing)
+    cog      float32  course over ground in degrees (NaN if missing)
+    quality  uint8    fix quality, same codes as the GGA quality field
+
+ 36 bytes per fix (incl. padding), i.e. about 220 MB for a week at 10 Hz.
+ A partly written last record (crash, power loss) is ignored by the reader
+ and cut off when the recorder opens the file again. Every 'indexEvery'
+ records the time is also appended to a small index file ('.trk.idx').
+
+ TrackReader maps the file with numpy.memmap, the columns are arrays, a
+ time range is found with the index without reading the file, and
+ toGPX() exports any time range at any decimation as GPX track or route.
+
+    usage: python NMEA_TrackRecorder.py file.trk [-start 2024-07-20T16:00]
+                  [-end ...] [-interval 60] [-gpx out.gpx] [-route]
+-----------------------------------------------------------------------------
+"""
+
+try:
+    import sys
+    import os
+    import struct
+    import argparse
+    from datetime import datetime, timezone
+    import numpy as np
+
+except ImportError as e:
+    print(
+        f"Import error: {str(e)} \nAborting the program {__app__}")
+    sys.exit()
+
+
+MAGIC = b"NMEATRK1"
+HEADER = struct.Struct("<8sHH4xd40s")       # magic, version, record size, created, name
+HEADER_SIZE = 64
+RECORD = struct.Struct("<dddffB3x")
+RECORD_DTYPE = np.dtype({"names": ["time", "lat", "lon", "sog", "cog", "quality"],
+                         "formats": ["<f8", "<f8", "<f8", "<f4", "<f4", "u1"],
+                         "offsets": [0, 8, 16, 24, 28, 32],
+                         "itemsize": RECORD.size})
+INDEX = struct.Struct("<dQ")                # time, record number
+INDEX_EVERY = 600                           # one index entry per minute at 10 Hz
+EPOCH = datetime(1970, 1, 1)
+NAN = float("nan")
+
+# RMC posMode / GGA quality codes
+FIX_QUALITY = {"N": 0, "A": 1, "D": 2, "P": 3, "R": 4, "F": 5, "E": 6, "M": 7, "S": 8}
+
+
+def epochSeconds(time):
+    """
+    UTC seconds since 1970 of a naive UTC or an aware datetime, a datetime64
+    or a number
+
+    Input:
+        time (datetime, datetime64, float)
+
+    Return:
+        (float) seconds
+    """
+    if isinstance(time, datetime):
+        if time.tzinfo is not None:
+            time = time.astimezone(timezone.utc).replace(tzinfo=None)
+        return (time - EPOCH).total_seconds()
+    if isinstance(time, (np.datetime64, str)):
+        return float(np.datetime64(time, "us").astype(np.int64)) / 1e6
+    return float(time)
+
+
+class TrackRecorder:
+    """
+    Appends GPS fixes to a binary track file. The records are buffered and
+    written every 'flushEvery' fixes (and by flush()/close()). Fixes which
+    are not later than the previous fix are skipped, so the times of the
+    file are increasing.
+
+    Input:
+        path (string) track file, appended to if it exists
+        name (string) track name stored in the header of a new file
+        flushEvery (int) fixes buffered before a write
+        indexEvery (int) records per time index entry
+    """
+
+    def __init__(self, path, name="", flushEvery=10, indexEvery=INDEX_EVERY):
+        self.path = path
+        self.flushEvery = max(1, int(flushEvery))
+        self.indexEvery = max(1, int(indexEvery))
+        self.buffer = bytearray()
+        self.indexBuffer = bytearray()
+        self.buffered = 0
+        self.skipped = 0
+        self.lastTime = -np.inf
+        self.closed = False
+
+        if os.path.isfile(path) and os.path.getsize(path) >= HEADER_SIZE:
+            reader = TrackReader(path)
+            self.count = len(reader)
+            if self.count:
+                self.lastTime = float(reader.time[-1])
+            entries = (self.count + self.indexEvery - 1) // self.indexEvery
+            index = reader.index
+            valid = index is not None and len(index) == entries and (
+                entries < 2 or int(index["row"][1]) == self.indexEvery)
+            times = reader.time[::self.indexEvery].tolist() if not valid else []
+            del reader, index
+            self.file = open(path, "r+b")
+            # drop a partly written last record
+            self.file.truncate(HEADER_SIZE + self.count * RECORD.size)
+            self.file.seek(0, os.SEEK_END)
+            if valid:
+                self.index = open(path + ".idx", "r+b")
+                self.index.truncate(entries * INDEX.size)
+                self.index.seek(0, os.SEEK_END)
+            else:
+                # missing, out of date or of another 'indexEvery'
+                self.index = open(path + ".idx", "wb")
+                for (row, t) in enumerate(times):
+                    self.index.write(INDEX.pack(t, row * self.indexEvery))
+        else:
+            self.count = 0
+            self.file = open(path, "wb")
+            header = HEADER.pack(MAGIC, 1, RECORD.size, epochSeconds(datetime.now(timezone.utc)),
+                                 name.encode("utf-8")[:40])
+            self.file.write(header.ljust(HEADER_SIZE, b"\0"))
+            self.file.flush()
+            self.index = open(path + ".idx", "wb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
+
+    def record(self, time, lat, lon, sog=NAN, cog=NAN, quality=1):
+        """
+        Append one fix
+
+        Input:
+            time (datetime, datetime64 or float) UTC time
+            lat, lon (float) position in degrees
+            sog (float) speed over ground in knots
+            cog (float) course over ground in degrees
+            quality (int) fix quality (0 invalid, 1 GPS, 2 DGPS, ...)
+
+        Return:
+            (bool) False if the fix was skipped (not later than the last one)
+        """
+        t = epochSeconds(time)
+        if not t > self.lastTime:
+            self.skipped += 1
+            return False
+        self.lastTime = t
+        if self.count % self.indexEvery == 0:
+            self.indexBuffer += INDEX.pack(t, self.count)
+        self.buffer += RECORD.pack(t, lat, lon, sog, cog, quality)
+        self.count += 1
+        self.buffered += 1
+        if self.buffered >= self.flushEvery:
+            self.flush()
+        return True
+
+    def recordNMEA(self, nmea, utc=None):
+        """
+        Append the fix of a pynmeagps RMC message, incl. the fraction of the
+        second of the RMC time
+
+        Input:
+            nmea (NMEAMessage) RMC message
+            utc (datetime) the UTC time of the message, if already known
+
+        Return:
+            (bool) False if the message has no valid fix or was skipped
+        """
+        if nmea.lat == "" or nmea.lon == "" or getattr(nmea, "status", "A") == "V":
+            return False
+        time = nmea.time
+        if utc is None:
+            utc = datetime.combine(nmea.date, time.replace(tzinfo=None))
+        elif time.microsecond:
+            utc = utc.replace(microsecond=time.microsecond)
+        sog = nmea.spd if nmea.spd != "" else NAN
+        cog = nmea.cog if nmea.cog != "" else NAN
+        return self.record(utc, nmea.lat, nmea.lon, sog, cog,
+                           FIX_QUALITY.get(getattr(nmea, "posMode", "A"), 1))
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.file.flush()
+            self.buffer.clear()
+        if self.indexBuffer:
+            self.index.write(self.indexBuffer)
+            self.index.flush()
+            self.indexBuffer.clear()
+        self.buffered = 0
+
+    def close(self):
+        if not self.closed:
+            self.flush()
+            self.file.close()
+            self.index.close()
+            self.closed = True
+
+
+class TrackReader:
+    """
+    Read access to a track file through numpy.memmap. The columns 'time',
+    'lat', 'lon', 'sog', 'cog' and 'quality' are arrays backed by the file,
+    nothing is read until the values are used.
+
+    Input:
+        path (string) track file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as fp:
+            header = fp.read(HEADER_SIZE)
+            size = os.fstat(fp.fileno()).st_size
+        if len(header) < HEADER_SIZE:
+            raise ValueError(f"'{path}' is not a track file (too short)")
+        (magic, version, recordSize, created, name) = HEADER.unpack_from(header)
+        if magic != MAGIC or recordSize != RECORD.size:
+            raise ValueError(f"'{path}' is not a track file of version 1")
+        self.name = name.rstrip(b"\0").decode("utf-8", errors="replace")
+        self.created = created
+        n = (size - HEADER_SIZE) // RECORD.size
+        if n > 0:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(n,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        self.index = self.readIndex(path + ".idx", n)
+
+    @staticmethod
+    def readIndex(path, n):
+        """ (times, rows) of the index file, None if it is missing or out of date """
+        try:
+            entries = np.fromfile(path, dtype=[("time", "<f8"), ("row", "<u8")])
+        except (OSError, ValueError):
+            return None
+        entries = entries[entries["row"] < n] if n else entries[:0]
+        if n and (len(entries) == 0 or entries["row"][0] != 0):
+            return None
+        return entries
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getattr__(self, column):
+        if column in RECORD_DTYPE.names:
+            return self.records[column]
+        raise AttributeError(column)
+
+    def datetimes(self, rows=slice(None)):
+        """ (array) datetime64[ms] of the times of 'rows' """
+        return (self.records["time"][rows] * 1000.0).astype("datetime64[ms]")
+
+    def find(self, time):
+        """
+        Row of the first fix at or after 'time', using the index to read only
+        one block of the file
+
+        Input:
+            time (datetime, datetime64 or float) UTC time
+
+        Return:
+            (int) row number, len(self) if all fixes are earlier
+        """
+        t = epochSeconds(time)
+        if self.index is None or len(self.index) == 0:
+            return int(np.searchsorted(self.records["time"], t))
+        block = int(np.searchsorted(self.index["time"], t, side="right")) - 1
+        if block < 0:
+            return 0
+        start = int(self.index["row"][block])
+        end = int(self.index["row"][block + 1]) if block + 1 < len(self.index) else len(self)
+        return start + int(np.searchsorted(self.records["time"][start:end], t))
+
+    def between(self, start=None, end=None):
+        """ (slice) of the rows with start <= time < end, None for the first/last fix """
+        first = 0 if start is None else self.find(start)
+        last = len(self) if end is None else self.find(end)
+        return slice(first, max(first, last))
+
+    def decimate(self, rows=slice(None), interval=None):
+        """
+        Rows of the first fix of every 'interval' seconds within 'rows'
+
+        Input:
+            rows (slice) e.g. of between()
+            interval (float) seconds, None or 0 for all fixes
+
+        Return:
+            (array) row numbers
+        """
+        (first, last, _) = rows.indices(len(self))
+        if not interval:
+            return np.arange(first, last)
+        t = self.records["time"][first:last]
+        (_, rowsFirst) = np.unique(np.floor(t / interval), return_index=True)
+        return rowsFirst + first
+
+    def toGPX(self, stream, start=None, end=None, interval=60.0, name=None, mode="track", precision=6):
+        """
+        Export a time range of the track as GPX
+
+        Input:
+            stream (file) text file object
+            start, end (datetime, datetime64 or float) UTC time range, None for all
+            interval (float) seconds between the exported fixes, None for all
+            name (string) track/route name, the name of the track file by default
+            mode (string) 'track' or 'route'
+
+        Return:
+            (int) number of exported fixes
+        """
+        from GPX_Writer import GPXWriter
+
+        rows = self.decimate(self.between(start, end), interval)
+        records = self.records[rows]
+        with GPXWriter(stream, self.name if name is None else name, mode=mode, precision=precision) as gpx:
+            gpx.waypoints(records["lat"], records["lon"], self.datetimes(rows).astype("datetime64[s]"))
+        return len(rows)
+
+
+if __name__ == "__main__":
+    """-------------------------------------------------------------------------
+        Script starting point: summary and GPX export of a track file
+    """
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", help="track file (.trk)")
+    parser.add_argument("-start", help="UTC start time, e.g. 2024-07-20T16:00")
+    parser.add_argument("-end", help="UTC end time")
+    parser.add_argument("-interval", type=float, default=60.0, help="seconds between GPX points, 0 for all")
+    parser.add_argument("-gpx", help="GPX export file")
+    parser.add_argument("-route", action="store_true", help="export as route instead of track")
+    args = parser.parse_args()
+
+    track = TrackReader(args.file)
+    print(f"\n{args.file}: '{track.name}', {len(track):,d} fixes")
+    if len(track):
+        times = track.datetimes([0, -1])
+        span = (track.time[-1] - track.time[0]) / 3600.0
+        print(f"from {times[0]} to {times[1]} UTC ({span:.2f} hrs), "
+              f"max. SOG {np.nanmax(track.sog):.1f} kn")
+    if args.gpx:
+        with open(args.gpx, "w") as fp:
+            n = track.toGPX(fp, args.start, args.end, args.interval,
+                            mode="route" if args.route else "track")
+        print(f"{n:,d} fixes exported to '{args.gpx}'")
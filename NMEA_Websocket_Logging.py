@@ -24,13 +24,16 @@ try:
     import sys
     import os
     import socket
-    import pytz
-    from time import sleep
+    import asyncio
     import random
     from datetime import datetime
     from pynmeagps.nmeareader import NMEAReader
     from pynmeagps import latlon2dmm, haversine, bearing
     from NavToolsLib import NavTools
+    from NMEA_Time import LocalTime, localTime
+    from NMEA_Stream import NMEAStream
+    from NMEA_Logger import NMEALogger, defaultRules
+    from NMEA_Ingest import NMEAIngest, WebSocketSource
 
 except ImportError as e:
     print(
@@ -43,6 +46,8 @@ WATCHES = {0: ["Stbd", "Symbol-X-Large-Green"],
           }
 HOST = "169.254.230.248"          # TCP IP address on s/v Andreas
 PORT = 2053                       # TCP Port
+WS_URL = f"ws://{HOST}:3000/nmea" # NMEA WebSocket stream of the instrument gateway
+RECONNECT = 5.0                   # seconds between WebSocket reconnect attempts
 SOURCE = "TCP"                    # can be TCP or FILE
 SOURCE = "File"
 MODE = "PRODUCTION"               # can be TEST or PRODUCTION
@@ -55,7 +60,6 @@ DATE_TIME = "%Y-%m-%d %H:%M:%S"   # date time format
 DATE = "%Y-%m-%d"                 # date format
 DST = True                        # Daylight Savings Time - True/False
 LOCAL_TIME = "US/Pacific"         # local time zone
-MSGLEN = 1024                     # TCP message length in bytes
 GPS_ID = "RMC"                    # NMEA GPS msgID to be processed
 
 def logging(filename):
@@ -66,126 +70,39 @@ def logging(filename):
     Input:
         filename (string) log file name
     """
-    logCTR = 0                # count the number of log messenges
-    watchChangeEvent = True   # true while we're waiting for next watch change event
-    dailyEvent = True         # true while we're waiting for next daily event
-    wpEvent = True            # true while we're waiting for next waypoint event
-    logEvent = False          # true when a matching log condition was found
-    watch = 0                 # ctr to alternate between the 2 watches
-    navtools = NavTools()     # create an instance of the Nav Tools Library
-    watchHour = WATCH_START%WATCH_CYCLE
-    sym = "empty"
-    viz = "viz_name>0"
-    routeName = os.path.basename(filename)
-    routeName = routeName.split(".")[0]
-
-    try:
-        HOST = socket.gethostname()
-        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        client_socket.settimeout(60)
-        client_socket.connect((HOST, PORT))
-        #conn, addr = client_socket.connect((HOST, PORT))
-        #if conn:
-        if client_socket:
-            print(f"TCP connection via IP {HOST}:{PORT}")
-        else:
-            raise Exception("TCP connection error", "unknown", 42)
-    except:
-        time = datetime.now()
-        print(f"\n{time.strftime(DATE_TIME)}: TCP connection at IP {HOST}:{PORT} failed.\n")
-        return
-
+    print(f"WebSocket connection to {WS_URL}")
     try:
-        gpx = navtools.strRANDOMreplace(navtools.gpxHeader)
-        gpx = gpx.replace("nameX", routeName)
-        with open(filename, 'w') as writer:
-            writer.write(gpx)
-
-        # infinate loop terminated by Ctrl-C. Runs every 20 seconds
-        tcpError = 0
-        while tcpError < 70:
-            nmea = None
-            #data = conn.recv(MSGLEN)
-            data = client_socket.recv(MSGLEN)
-            if data:
-                nmea = NMEAReader.parse(data, validate=0)
-            if (nmea is not None and nmea.msgID == GPS_ID):
-                utc = merge_date_time(nmea.date, nmea.time)
-                utcStr = utc.strftime(DATE_TIME)+"Z"
-                utcStr = utcStr.replace(" ", "T")
-                local = utc_to_local(utc, LOCAL_TIME)
-                hour = int(local.strftime("%H"))
-                minute = int(local.strftime("%M"))
-                #print(f"\n{logCTR} - {utc} position: Lat {pos[0]}   Lon {pos[1]}")
-
-                # log with WP_FREQ during each hour starting a 5 past the hour
-                if (minute>4 and (minute-5)%WP_FREQ==0 and wpEvent):
-                    wpEvent = False
-                    logEvent = True
-                    name = ""
-                    viz = "viz_name>0"  # wp is not visible
-                    sym = "empty"
-
-                # log every WATCH_CYCLE starting each day at watchHour
-                if (hour>(watchHour-1) and ((hour-watchHour)%WATCH_CYCLE)==0 and watchChangeEvent):
-                    watchChangeEvent = False
-                    logEvent = True
-                    name = F"_{WATCHES[watch%2][0]}"
-                    viz = "viz_name>1"  # wp is visible
-                    sym = WATCHES[watch%2][1]
-                    watch = watch + 1
-                    
-                # log daily at DAILY_REPORT hour
-                if (hour==DAILY_REPORT and dailyEvent):
-                    dailyEvent = False
-                    logEvent = True
-                    name = F"_{DAILY_REPORT}:00_Position"
-                    viz = "viz_name>1"  # wp is visible
-                    sym = "diamond"
-
-                # save log Events to file
-                if logEvent:
-                    logEvent = False
-                    logCTR = logCTR + 1
-                    pos = latlon2dmm(nmea.lat, nmea.lon)
-                    print(f"\n{logCTR} - {local.strftime('%H:%M:%S')} {name} Lat {pos[0]}   Lon {pos[1]}")
-
-                    with open(filename, 'a') as writer:
-                        wp = navtools.strRANDOMreplace(navtools.gpxWaypoint)
-                        wp = wp.replace("latX", f"{nmea.lat:.6f}")
-                        wp = wp.replace("lonX", f"{nmea.lon:.6f}")
-                        wp = wp.replace("wpX", f"NM{(logCTR):04d}{name}")
-                        wp = wp.replace("timeX", utcStr)
-                        wp = wp.replace("viz_name>0", viz)
-                        wp = wp.replace("empty", sym)
-                        writer.write(wp)
-                    # end writing to file
-                else:
-                    # enable waiting for next Event whent current Event 
-                    # condition is not any longer true
-                    if(hour>DAILY_REPORT):
-                        dailyEvent = True
-                    if(hour%WATCH_CYCLE)>0:
-                        watchChangeEvent = True
-                    if(minute>4 and ((minute-5)%WP_FREQ)>0):
-                        wpEvent = True
-                    print(".", end='')   # indicates valid NMEA read but no Event condition found
-            else:
-                if(nmea is None):
-                    print("?", end='')   # indicates TCP problems
-                    tcpError = tcpError + 1
-                else:
-                    print("!", end='')   # indicates no GPS_ID NMEA GPS sentence found
-            #sleep(1)                     # sleep for 1 second
-        # end of while loop
-        client_socket.close()
+        asyncio.run(wsLogging(filename, WS_URL))
     except KeyboardInterrupt:
         print("\nLog Session terminated by user")
-        client_socket.close()
-        if(os.path.isfile(filename)):
-            with open(filename, 'a') as writer:
-                writer.write(navtools.gpxFooter)
-    
+
+
+async def wsLogging(filename, url, reconnect=RECONNECT):
+    """
+    Logs the RMC fixes of a NMEA WebSocket stream. The connection is kept
+    alive with pings and reconnected after a connection loss.
+
+    Input:
+        filename (string) log file name
+        url (string) WebSocket url of the NMEA gateway
+        reconnect (float) seconds before a reconnect, None to stop after a connection loss
+
+    Return:
+        (NMEALogger) the closed logger
+    """
+    source = WebSocketSource("ws", url, reconnect=reconnect)
+    ingest = NMEAIngest([source])
+    rules = defaultRules(WP_FREQ, 5, WATCH_CYCLE, WATCH_START, DAILY_REPORT, WATCHES)
+    with NMEALogger(filename, rules, LOCAL_TIME, GPS_ID) as logger:
+        try:
+            await logger.runAsync(ingest.sentences())
+        finally:
+            await ingest.stop()
+    if source.stats.errors:
+        time = datetime.now()
+        print(f"\n{time.strftime(DATE_TIME)}: WebSocket {url}: {source.stats.lastError}")
+    return logger
+
 
 def tcpNMEAread(stream: socket.socket):
     """
@@ -221,9 +138,10 @@ def fileNMEAread(filename):
     """
     msgcount = 0
     with open(filename, 'rb') as stream:
-        nmr = NMEAReader(stream, nmeaonly=True, validate=0)
+        # only the GPS sentences are parsed
+        nmr = NMEAStream(stream, msgIDs=(GPS_ID,))
         try:
-            for (raw_data, parsed_data) in nmr:
+            for (raw_data, parsed_data) in nmr.messages():
                 #print(f"\nraw:  {raw_data}")
                 if (parsed_data.msgID == GPS_ID):
                     pos = latlon2dmm(parsed_data.lat, parsed_data.lon)
@@ -234,7 +152,7 @@ def fileNMEAread(filename):
                     #print(utc, local, utcxx)
 
                 msgcount += 1
-            print(f"\nRead and parsed {msgcount} NMEA sentences")
+            print(f"\nRead {nmr.framer.sentences} and parsed {msgcount} NMEA sentences")
         except Exception as e:
             print(f"Error reading NMEA from file\n{str(e)}")
 
@@ -262,9 +180,7 @@ def merge_date_time(date, time):
     Return:
         utc dt object
     """
-    dateStr = date.strftime("%Y-%m-%d")
-    utc = datetime.strptime(dateStr+" "+time.strftime("%H:%M:%S"), DATE_TIME)
-    return utc
+    return LocalTime.utc(date, time)
 
 def utc_to_local(utc_dt, tz=LOCAL_TIME):
     """
@@ -277,9 +193,7 @@ def utc_to_local(utc_dt, tz=LOCAL_TIME):
     Return:
         dt object with local time
     """
-    local_tz = pytz.timezone(tz)
-    local_dt = utc_dt.replace(tzinfo=pytz.utc).astimezone(local_tz)
-    return local_dt.astimezone(local_tz)
+    return localTime(tz).aware(utc_dt)
 
 def local_to_utc(local_dt, tz=LOCAL_TIME):
     """
@@ -292,12 +206,7 @@ def local_to_utc(local_dt, tz=LOCAL_TIME):
     Return:
         dt object with UTC time
     """
-    if(local_dt.tzinfo is None or local_dt.tzinfo.utcoffset(local_dt) is None):
-        local_tz = pytz.timezone(tz)
-        local_dt = local_tz.localize(local_dt, is_dst=DST)  # Localize the datetime
-    
-    utc_dt = local_dt.astimezone(pytz.utc)
-    return utc_dt
+    return localTime(tz).toUTC(local_dt, DST)
 
 if __name__ == "__main__":
     print(f"\nStarting {__app__} {__version__}\n{__doc__}")
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+# ---------------------------------------------------------------------------
+__author__ = "Volker Petersen <volker.petersen01@gmail.com>"
+__app__ = "NavConfig.py"
+__version__ = "version 1.0.0, Python >3.7"
+__date__ = "Date: 2024/08/01"
+__copyright__ = "Copyright (c) 2024 Volker Petersen"
+__license__ = "GNU General Public License, published by the Free Software Foundation"
+__doc__ = """
+-----------------------------------------------------------------------------
+ Process wide configuration service of the settings file 'NavConfig.ini'.
+
+ The settings file is parsed once and the device (the computer the scripts
+ run on) is resolved once by probing the root folders of the 'devices'
+ table. The result is an immutable, typed 'Settings' object which is cached
+ and returned to all callers until the modification time (or size) of the
+ settings file changes. 'NavTools.getConfig()' uses this service and still
+ returns its traditional settings dictionary.
+
+    from NavConfig import getSettings
+    settings = getSettings()
+    print(settings.device, settings.gpxPath, settings.minCourseChange)
+-----------------------------------------------------------------------------
+"""
+
+try:
+    import sys
+    import os
+    import json
+    import threading
+    from types import MappingProxyType
+    from typing import Mapping, NamedTuple
+
+except ImportError as e:
+    print(
+        f"Import error: {str(e)} \nAborting the program {__app__} {__version__}")
+    sys.exit()
+
+CONFIG_FILE = 'NavConfig.ini'
+
+# per device path settings of the settings file
+DEVICE_PATHS = ('gpxPath', 'csvPath', 'kmlPath', 'txtPath', 'spotPath',
+                'sqlitePath', 'sqliteDB', 'toernDirectory')
+
+
+class ConfigError(Exception):
+    """ settings file missing, malformed or no known device found """
+
+
+class Settings(NamedTuple):
+    """ immutable settings of the current device """
+    configFile: str
+    cwd: str
+    device: str
+    gpxPath: str
+    csvPath: str
+    kmlPath: str
+    txtPath: str
+    spotPath: str
+    sqlitePath: str
+    sqliteDB: str
+    toernDirectory: str
+    lastFile: str
+    fileType: str
+    skipWP: bool
+    noSpeed: bool
+    verbose: bool
+    timezoneDifference: float
+    minCourseChange: float
+    raw: Mapping      # read-only view of the settings file content
+
+    def asDict(self):
+        """--------------------------------------------------------------------------
+        The settings as the (mutable) dictionary returned by 'NavTools.getConfig()'
+        with the original string values of 'skipWP', 'noSpeed' and 'verbose'.
+
+        Return:
+            (dictionary) with the program settings
+        """
+        settings = {key: getattr(self, key) for key in
+                    ('cwd', 'csvPath', 'gpxPath', 'sqlitePath', 'kmlPath',
+                     'sqliteDB', 'toernDirectory', 'lastFile', 'fileType')}
+        # 'txtPath' and 'spotPath' were never resolved by getConfig()
+        settings['spotPath'] = ''
+        settings['txtPath'] = ''
+        for key in ('skipWP', 'noSpeed', 'verbose', 'TimeZoneDifference', 'minCourseChange'):
+            settings[key] = self.raw[key]
+        settings['error'] = True
+        return settings
+
+    def printSettings(self):
+        """ print the settings in the format of 'NavTools.getConfig(verbose=True)' """
+        print(f"Configuration file...: '{os.path.basename(self.configFile)}'")
+        print(f"Device...............: '{self.device}'")
+        print(f"GPX path.............: '{self.gpxPath}'")
+        print(f"CSV path.............: '{self.csvPath}'")
+        print(f"KML path.............: '{self.kmlPath}'")
+        print(f"SQLite path..........: '{self.sqlitePath}'")
+        print(f"SQLite DB............: '{self.sqliteDB}'")
+        print(f"Toern Directory Table: '{self.toernDirectory}'")
+        print(f"Working Dir..........: '{self.cwd}'")
+        print(f"Last Input file......: '{self.lastFile}'")
+        print(f"Skip WPs.............: '{self.raw['skipWP']}'")
+        print(f"No Speed.............: '{self.raw['noSpeed']}'")
+        print(f"Timezone Difference..:  {self.timezoneDifference:.1f} hrs between race course and UTC")
+        print(f"Minimum Course Change:  {self.minCourseChange:.2f} degrees")
+        print(f"Verbose..............: '{self.raw['verbose']}'")
+
+
+def isTrue(value):
+    """ settings flags are stored as strings like 'True' / 'False' """
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', '1', 'yes', 'on', 'verbose')
+    return bool(value)
+
+
+class ConfigService:
+    """--------------------------------------------------------------------------
+    Cache of the parsed settings files. An entry is keyed by the absolute path
+    of the settings file and is valid as long as the modification time and the
+    size of the file don't change; only then is the file parsed and the
+    device resolved again. A failed device lookup is not cached, so a drive
+    which is mounted later is found on the next call.
+
+    Args:
+        exists (function): device root probe, 'os.path.exists' by default
+    """
+
+    def __init__(self, exists=os.path.exists):
+        self.exists = exists
+        self.entries = {}       # path -> (stamp, Settings)
+        self.lock = threading.Lock()
+        self.loads = 0          # number of times a settings file was parsed
+
+    @staticmethod
+    def stamp(path):
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, path=None):
+        """--------------------------------------------------------------------------
+        Method returns the cached settings of the settings file 'path'
+
+        Args:
+            path (string): settings file, 'NavConfig.ini' next to this module by default
+        Return:
+            (Settings) immutable settings of the current device
+        Raises:
+            ConfigError: settings file missing, malformed or no known device found
+        """
+        if path is None:
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), CONFIG_FILE)
+        path = os.path.normpath(os.path.abspath(path))
+        try:
+            stamp = self.stamp(path)
+        except OSError as e:
+            raise ConfigError(f"settings file '{path}' not found ({e.strerror})")
+
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                return entry[1]
+            self.entries.pop(path, None)
+            settings = self.load(path)
+            self.entries[path] = (stamp, settings)
+            return settings
+
+    def load(self, path):
+        """ parse the settings file and resolve the current device """
+        self.loads += 1
+        try:
+            with open(path, 'r') as fp:
+                raw = json.load(fp)
+        except (OSError, ValueError) as e:
+            raise ConfigError(f"cannot read the settings file '{path}': {e}")
+
+        try:
+            devices = raw['devices']
+            device = ''
+            # the last matching device wins, same as the original lookup
+            for name in devices:
+                if self.exists(os.path.normpath(devices[name])):
+                    device = name
+            if device == '':
+                raise ConfigError(f"Unknown computer '{devices}'and root file system")
+
+            paths = {}
+            for key in DEVICE_PATHS:
+                value = raw.get(key, {}).get(device, '')
+                paths[key] = os.path.normpath(value) if value else ''
+
+            return Settings(configFile=path,
+                            cwd=os.path.dirname(path),
+                            device=device,
+                            lastFile=raw['lastFile'],
+                            fileType=raw['fileType'],
+                            skipWP=isTrue(raw['skipWP']),
+                            noSpeed=isTrue(raw['noSpeed']),
+                            verbose=isTrue(raw['verbose']),
+                            timezoneDifference=float(raw['TimeZoneDifference']),
+                            minCourseChange=float(raw['minCourseChange']),
+                            raw=MappingProxyType(raw),
+                            **paths)
+        except (KeyError, AttributeError, TypeError, ValueError) as e:
+            raise ConfigError(f"invalid settings file '{path}': {type(e).__name__} {e}")
+
+    def invalidate(self, path=None):
+        """ drop the cached settings of 'path' or of all settings files """
+        with self.lock:
+            if path is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(os.path.normpath(os.path.abspath(path)), None)
+
+
+# the process wide service used by NavTools.getConfig()
+service = ConfigService()
+
+
+def getSettings(path=None):
+    """ cached settings of 'path' ('NavConfig.ini' by default), see ConfigService.get() """
+    return service.get(path)
+
+
+def invalidate(path=None):
+    """ force a reload of the settings file(s) on the next getSettings() call """
+    service.invalidate(path)
+
+
+if __name__ == "__main__":
+    """-------------------------------------------------------------------------
+        Script starting point
+    """
+    try:
+        getSettings(sys.argv[1] if len(sys.argv) > 1 else None).printSettings()
+    except ConfigError as e:
+        print(f"{__app__}: {e}")
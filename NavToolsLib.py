@@ -25,18 +25,19 @@ __doc__ = """
 try:
     import sys
     import os
-    import inspect
     import json
     import re
-    from datetime import datetime, timedelta
-    from bs4 import BeautifulSoup
-    import lxml
     import random
-    from tabulate import tabulate
-    from collections import Counter
-    import math
     import sqlite3
-    from PIL import Image, ExifTags
+    from datetime import datetime, timedelta
+    import io
+    from collections import Counter, namedtuple
+    import math
+    import numpy as np
+    import NavConfig
+    # the GPX writers live in GPX_Writer, imported here also for the scripts
+    # using 'from NavToolsLib import GPXWriter, GPXLogWriter'
+    from GPX_Writer import GPXWriter, GPXLogWriter
 
 except ImportError as e:
     print(
@@ -44,6 +45,15 @@ except ImportError as e:
     sys.exit()
 
 
+def __getattr__(name):
+    """ the route file index and the metrics cache moved to RouteCache, which
+        imports NavToolsLib, so they are imported on their first use """
+    if name in ("GPXRouteIndex", "GPXRouteEntry", "RouteMetricsCache"):
+        import RouteCache
+        return getattr(RouteCache, name)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
 class NavTools:
     def __init__(self):
         # same values as used in the Toerns Website "plotroute.html"
@@ -54,6 +64,10 @@ class NavTools:
         self.configFile = 'NavConfig.ini'
         self.genericWPs = ['NM', 'WPT', 'WP', '0']
         self.WPtypes = ['harbor', 'circle', 'service-marina', 'anchorage']
+        # date formats of the <desc> tags of departure/arrival/timedleg waypoints
+        self.descDateFormats = ['%Y_%m_%d_%H%M', '%b-%d-%Y %H:%M', '%Y%m%d_%H%M',
+                                '%Y-%m-%d %H:%M', '%Y-%m-%d | %H:%M']
+        self.dateParsers = {}
         self.sql_header = """CREATE TABLE IF NOT EXISTS "Table_Name" (
         "id" INTEGER UNIQUE,
         "name" TEXT,
@@ -129,6 +143,8 @@ class NavTools:
                 rawSettings['fileType'] = extension
                 txt = json.dumps(rawSettings, indent=2)
                 fw.write(txt)
+            # don't depend on the mtime resolution of the file system
+            NavConfig.invalidate(settingsFile)
             return True
         except Exception as e:
             self.error(e, "saveConfig")
@@ -162,73 +178,16 @@ class NavTools:
                     'verbose': 'verbose',
                     'error': True}
 
-        # fetch the content from the default settings file
-        cwd = os.path.dirname(os.path.abspath(
-            inspect.getfile(inspect.currentframe())))
+        # the settings file is parsed and the device resolved only once and
+        # again when the file changes, see NavConfig.py
+        cwd = os.path.dirname(os.path.abspath(__file__))
         cwd = os.path.normpath(cwd)
 
-        default_settings = os.path.join(cwd, self.configFile)
-
         try:
-            with open(default_settings, 'r') as fp:
-                rawSettings = json.load(fp)
-
-            supported_devices = rawSettings['devices']
-            current_device = ''
-            for device in supported_devices:
-                if (os.path.exists(os.path.normpath(supported_devices[device]))):
-                    current_device = device
-
-            if (current_device == ''):
-                msg = f"Unknown computer '{rawSettings['devices']}'and root file system"
-                raise Exception(msg)
-
-            toernDirectory = os.path.normpath(
-                rawSettings['toernDirectory'][current_device])
-            gpxPath = os.path.normpath(rawSettings['gpxPath'][current_device])
-            sqliteDB = os.path.normpath(
-                rawSettings['sqliteDB'][current_device])
-            sqlitePath = os.path.normpath(
-                rawSettings['sqlitePath'][current_device])
-            csvPath = os.path.normpath(
-                rawSettings['csvPath'][current_device])
-            kmlPath = os.path.normpath(
-                rawSettings['kmlPath'][current_device])
-            lastFile = rawSettings['lastFile']
-            fileType = rawSettings['fileType']
-
+            config = NavConfig.getSettings(os.path.join(cwd, self.configFile))
             if verbose:
-                print(f"Configuration file...: '{self.configFile}'")
-                print(f"Device...............: '{current_device}'")
-                print(f"GPX path.............: '{gpxPath}'")
-                print(f"CSV path.............: '{csvPath}'")
-                print(f"KML path.............: '{kmlPath}'")
-                print(f"SQLite path..........: '{sqlitePath}'")
-                print(f"SQLite DB............: '{sqliteDB}'")
-                print(f"Toern Directory Table: '{toernDirectory}'")
-                print(f"Working Dir..........: '{cwd}'")
-                print(f"Last Input file......: '{lastFile}'")
-                print(f"Skip WPs.............: '{rawSettings['skipWP']}'")
-                print(f"No Speed.............: '{rawSettings['noSpeed']}'")
-                print(f"Timezone Difference..:  {rawSettings['TimeZoneDifference']:.1f} hrs between race course and UTC")
-                print(f"Minimum Course Change:  {rawSettings['minCourseChange']:.2f} degrees")
-                print(f"Verbose..............: '{rawSettings['verbose']}'")
-
-            settings['cwd'] = cwd
-            settings['csvPath'] = csvPath
-            settings['gpxPath'] = gpxPath
-            settings['kmlPath'] = kmlPath
-            settings['sqlitePath'] = sqlitePath
-            settings['sqliteDB'] = sqliteDB
-            settings['lastFile'] = lastFile
-            settings['fileType'] = fileType
-            settings['toernDirectory'] = toernDirectory
-            settings['skipWP'] = rawSettings['skipWP']
-            settings['noSpeed'] = rawSettings['noSpeed']
-            settings['verbose'] = rawSettings['verbose']
-            settings['error'] = True
-            settings['TimeZoneDifference'] = rawSettings['TimeZoneDifference']
-            settings['minCourseChange'] = rawSettings['minCourseChange']
+                config.printSettings()
+            settings = config.asDict()
 
         except Exception as e:
             self.error(e, "getConfig")
@@ -252,10 +211,103 @@ class NavTools:
             generic = (generic or wpt.startswith(genericWP))
         return generic
 
-    def ComputeRouteDistances(self, xml, verbose, skipWP, noSpeed):
+    @staticmethod
+    def isFilePath(source):
+        """--------------------------------------------------------------------------
+        Method to tell a file path from xml code and file objects
+
+        Args:
+            source: xml code, file path or file object
+
+        Return:
+            (bool) True if source is the path of a file
+        """
+        if isinstance(source, os.PathLike):
+            return True
+        return (isinstance(source, str) and
+                not source.lstrip('\ufeff \t\r\n').startswith('<'))
+
+    def openXMLSource(self, source):
+        """--------------------------------------------------------------------------
+        Method to turn a xml source into a binary stream for the lxml parser
+
+        Args:
+            source: xml code (string or bytes), a file path, or a binary or
+                    text file object
+
+        Return:
+            (tuple) binary stream and flag if the stream must be closed by the caller
+        """
+        if isinstance(source, (bytes, bytearray)):
+            return (io.BytesIO(source), False)
+        if isinstance(source, (str, os.PathLike)):
+            if not self.isFilePath(source):
+                return (io.BytesIO(source.encode('utf-8')), False)
+            return (open(source, 'rb'), True)
+        if isinstance(source.read(0), str):
+            return (_Utf8Reader(source), False)
+        return (source, False)
+
+    def iterGPXWaypoints(self, source, tag='rtept', info=None):
+        """--------------------------------------------------------------------------
+        Generator to stream the waypoints of a GPX file using lxml iterparse.
+        Each waypoint element is cleared after it has been read, so even
+        multi-megabyte tracks are parsed in bounded memory.
+
+        Args:
+            source:        xml code, file path or file object of the GPX file
+            tag (string):  waypoint element to read ('rtept', 'trkpt', or 'wpt')
+            info (dict):   optional dictionary that receives the 'name' of
+                           the first route/track in the file; a list under
+                           the key 'coords' receives the original lat/lon
+                           attribute strings of each waypoint
+
+        Yield:
+            (tuple) lat (float), lon (float), time, name, sym, and desc (strings
+                    or None when the tag is missing)
+        """
+        from lxml import etree
+        coords = None if info is None else info.get('coords')
+        stream, close = self.openXMLSource(source)
+        try:
+            context = etree.iterparse(stream, events=('end',), tag=(
+                '{*}' + tag, '{*}name'), recover=True, huge_tree=True)
+            for event, el in context:
+                local = el.tag.rpartition('}')[2]
+                if local == 'name':
+                    if info is not None and 'name' not in info:
+                        parent = el.getparent()
+                        if parent is not None and parent.tag.rpartition('}')[2] in ('rte', 'trk'):
+                            info['name'] = el.text or ""
+                    continue
+
+                fields = {}
+                for child in el:
+                    if isinstance(child.tag, str):
+                        key = child.tag.rpartition('}')[2]
+                        if key not in fields:
+                            fields[key] = child.text or ""
+                lat = el.get('lat')
+                lon = el.get('lon')
+                if coords is not None:
+                    coords.append((lat, lon))
+                yield (float(lat), float(lon),
+                       fields.get('time'), fields.get('name'),
+                       fields.get('sym'), fields.get('desc'))
+
+                # free the memory of the processed waypoint elements
+                el.clear()
+                while el.getprevious() is not None:
+                    del el.getparent()[0]
+        finally:
+            if close:
+                stream.close()
+
+    def routeMetrics(self, xml, noSpeed=False, cache=None):
         """--------------------------------------------------------------------------
         Method to compute the distance, speed, and Etmals between 
-        sequential route waypoints
+        sequential route waypoints without formatting them, so the numbers
+        can be reused (e.g. for fleet comparisons). The waypoints carry
         a <desc></desc> tag/field with these entry options:
             arrival 2019-09-25 19:30    (arrival date/time at this WP)
             departure 2019-09-26 09:37  (departure date/time from this WP)
@@ -267,30 +319,30 @@ class NavTools:
                                         all dates are in the in the format yyyy-mm-dd hh:mm
 
         Args:
-            xml (string):   xml code with all the route information from the OpenCPN gpx file
-            verbose (bool): run this function with (True) or w/o printout (False)
-            skipWP (bool):  skip output for all WPs that are marked with label 'empty'
-            noSpeed (bool): True/False - don't/do compute speed and time between waypoints
+            xml (string):   xml code with all the route information from the OpenCPN gpx file,
+                            the path or a file object of the gpx file, or an already
+                            parsed Route object
+            noSpeed (bool): True/False - don't/do list the time, speed and Etmal
+                            columns when the result is rendered as text
+            cache (RouteMetricsCache): persistent cache used when xml is a
+                            file path (optional)
 
         Return:
-            (string) function results
+            (RouteMetrics) the per waypoint legs and the route totals
         """
-        global genericWP
+        if cache is not None and self.isFilePath(xml):
+            return cache.metrics(xml, noSpeed)
 
-        dateFormats = []
-        dateFormats.append('%Y_%m_%d_%H%M')
-        dateFormats.append('%b-%d-%Y %H:%M')
-        dateFormats.append('%Y%m%d_%H%M')
-        dateFormats.append('%Y-%m-%d %H:%M')
-        dateFormats.append('%Y-%m-%d | %H:%M')
+        global genericWP
 
-        soup = BeautifulSoup(xml, features="html5lib")
+        dates = self.dateParser(self.descDateFormats)
 
-        wps = soup.find_all('rtept')
+        if isinstance(xml, Route):
+            route = xml
+        else:
+            route = Route.fromGPX(xml, self)
 
-        rows = []
-        last_lat = 0.0              # lat of previous WP
-        last_lon = 0.0              # lon of previous WP
+        legs = []
         leg_start_date = ""         # date/time at first "timed" WP
         total_trip_distance = 0.0   # total distance traveled on this trip
         leg_distance = 0.0          # distance between two adjacent "timed" WPs
@@ -303,18 +355,12 @@ class NavTools:
         leg_end_date = ""           # initialization
         # flag that indicates that end of leg is also start of next leg
         timed_flag = False
-        wpCTR = 0
-        for wp in wps:
-            lat = float(wp['lat'])
-            lon = float(wp['lon'])
-            name = wp.find('name').text
-            time = wp.find('time').text
-            symbol = wp.find('sym')
-            if symbol is None:
-                symbol = "empty"
-            else:
-                symbol = symbol.text.lower()
-            desc = wp.find('desc')
+        for wpCTR in range(len(route)):
+            lat = float(route.lat[wpCTR])
+            lon = float(route.lon[wpCTR])
+            name = route.names[wpCTR]
+            symbol = route.syms[wpCTR].lower()
+            desc = route.descs[wpCTR]
 
             if (symbol in self.WPtypes):
                 departure_flag = True
@@ -323,28 +369,28 @@ class NavTools:
 
             # handles the speed computations based on the <desc> tag info
             if (desc != None):
-                desc = desc.text.lower()
+                desc = desc.lower()
                 if (desc.startswith('homeport') and wpCTR == 0):
                     if ('departure' in desc):
                         desc_arr = desc.split('departure ')
                         desc = desc_arr[1]
-                        leg_start_date = self.StringToDateTime(desc, dateFormats)
+                        leg_start_date = dates.parse(desc, default=0)
 
                 if (desc.startswith('homeport') and wpCTR > 0):
                     if ('arrival' in desc):
                         desc_arr = desc.split('arrival ')
                         desc = desc_arr[1]
-                        leg_end_date = self.StringToDateTime(desc, dateFormats)
+                        leg_end_date = dates.parse(desc, default=0)
 
                 if (desc.startswith('departure')):
                     time = desc.replace('departure ', '')
-                    leg_start_date = self.StringToDateTime(time, dateFormats)
+                    leg_start_date = dates.parse(time, default=0)
                     # print(f"departure - Leg start: {leg_start_date} at: {name}")
                     departure_flag = True
 
                 if (desc.startswith('arrival')):
                     time = desc.replace('arrival ', '')
-                    leg_end_date = self.StringToDateTime(time, dateFormats)
+                    leg_end_date = dates.parse(time, default=0)
                     # print(f"arrival      - Leg start: {leg_start_date} end: {leg_end_date} at: {name}")
                     if (departure_flag):
                         leg_timed_flag = True
@@ -354,7 +400,7 @@ class NavTools:
 
                 if (desc.startswith('timedleg')):
                     time = desc.replace('timedleg ', '')
-                    leg_end_date = self.StringToDateTime(time, dateFormats)
+                    leg_end_date = dates.parse(time, default=0)
                     # print(f"timedleg  - Leg start: {leg_start_date} end: {leg_end_date} at: {name}")
                     leg_timed_flag = True
                     departure_flag = True
@@ -363,17 +409,11 @@ class NavTools:
                 if (desc.startswith('poi')):
                     generic = True
 
-            if (last_lat != 0.0 and last_lon != 0.0):
-                distance = self.calc_distance(last_lat, last_lon, lat, lon)
-            else:
-                distance = 0.0
+            distance = float(route.legDistances[wpCTR])
 
             leg_distance += distance
             total_trip_distance += distance
 
-            last_lat = lat
-            last_lon = lon
-
             if (leg_timed_flag or not generic):
                 # compute speed / etmal for the current leg from leg_start_date to leg_end_date
                 speed = 0
@@ -387,21 +427,8 @@ class NavTools:
                     sum_legs_distance += leg_distance
                     sum_legs_time += leg_elapsed
 
-                if (lat >= 0.0):
-                    lat_str = f"{lat:7.3f}N"
-                else:
-                    lat_str = f"{math.fabs(lat):7.3f}S"
-
-                if (lon >= 0.0):
-                    lon_str = f"{lon:7.3f}E"
-                else:
-                    lon_str = f"{math.fabs(lon):7.3f}W"
-
-                if noSpeed:
-                    rows.append([name, lat_str, lon_str, leg_distance])
-                else:
-                    rows.append([name, lat_str, lon_str, leg_distance,
-                                leg_elapsed, speed, etmal])
+                legs.append(RouteLeg(name, lat, lon, leg_distance,
+                                     leg_elapsed, speed, etmal))
                 leg_elapsed = 0
                 leg_distance = 0
                 leg_timed_flag = False
@@ -411,29 +438,80 @@ class NavTools:
                 leg_end_date = ""
 
             # end of if (leg_timed_flag or not generic):
-            wpCTR = wpCTR + 1
-        # end of the loop accross all WPs  "for wp in wps:"
+        # end of the loop accross all WPs  "for wpCTR in range(len(route)):"
 
-        msg = ""
-        if noSpeed:
-            msg += (tabulate(rows, headers=["WP Name", "Lat", "Lon",
-                                            "Distance"], floatfmt=',.2f', numalign="right"))
-        else:
-            msg += (tabulate(rows, headers=["WP Name", "Lat", "Lon", "Distance",
-                                            "Time", "Speed", "Etmal"], floatfmt=',.2f', numalign="right"))
+        return RouteMetrics(legs, total_trip_distance, sum_legs_distance,
+                            sum_legs_time, noSpeed)
 
-        msg += (f"\n\nTotal Trip Distance: {total_trip_distance:9,.2f}nm")
-        if (not noSpeed):
-            msg += (f"\nTimed Legs Distance: {sum_legs_distance:9,.2f}nm")
-            if (total_trip_distance > 0.0):
-                msg += (f"   ({sum_legs_distance/total_trip_distance:.2%})")
-        if (sum_legs_time > 0.0 and not noSpeed):
-            avg_speed = sum_legs_distance / sum_legs_time
-            msg += (f"\nAverage Speed:          {avg_speed:9,.2f}kts")
+    def ComputeRouteDistances(self, xml, verbose, skipWP, noSpeed, cache=None):
+        """--------------------------------------------------------------------------
+        Method to compute the distance, speed, and Etmals between 
+        sequential route waypoints
+        a <desc></desc> tag/field with these entry options:
+            arrival 2019-09-25 19:30    (arrival date/time at this WP)
+            departure 2019-09-26 09:37  (departure date/time from this WP)
+            timedleg 2019-09-26 09:37   (arrival and departure at/from this WP)
+            poi                         (Point of Interest on route not being listed)
+            homeport                    (designates the Waypoint from which a round-trip
+                                        toern originates. Add departure and arrival
+                                        times using the above keywords in add'l lines)
+                                        all dates are in the in the format yyyy-mm-dd hh:mm
 
+        Args:
+            xml (string):   xml code with all the route information from the OpenCPN gpx file,
+                            the path or a file object of the gpx file, or an already
+                            parsed Route object
+            verbose (bool): run this function with (True) or w/o printout (False)
+            skipWP (bool):  skip output for all WPs that are marked with label 'empty'
+            noSpeed (bool): True/False - don't/do compute speed and time between waypoints
+            cache (RouteMetricsCache): persistent cache used when xml is a
+                            file path (optional)
+
+        Return:
+            (RouteMetrics) results, str() renders the tabulated report
+        """
+        metrics = self.routeMetrics(xml, noSpeed, cache)
         if verbose:
-            print(msg)
-        return msg
+            print(metrics)
+        return metrics
+
+    def iterRouteMetrics(self, source, names=None, noSpeed=False, workers=None):
+        """--------------------------------------------------------------------------
+        Generator to compute the RouteMetrics of each <rte> of a multi-route
+        GPX file (e.g. an OpenCPN export). The routes are located with a
+        GPXRouteIndex and processed in a process pool, each worker parses
+        only the bytes of its own route. The results are yielded in the
+        order of the file (or of names) as soon as they are available.
+
+        Args:
+            source:        file path or xml code of the GPX file
+            names (list):  names or indexes of the routes to process (None: all)
+            noSpeed (bool): report without the time, speed and Etmal columns
+            workers (int): number of worker processes (None: number of
+                           CPUs, 1: process the routes in this process)
+
+        Return:
+            (RouteSummary) per route: index, name, number of waypoints and
+                           the RouteMetrics (None and an error message if
+                           the route couldn't be processed)
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        from RouteCache import GPXRouteIndex
+        index = source if isinstance(source, GPXRouteIndex) else GPXRouteIndex(source)
+        entries = list(index) if names is None else [index.find(name) for name in names]
+        jobs = [(index.job(entry), noSpeed) for entry in entries]
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers == 1 or len(jobs) < 2:
+            results = (_gpxRouteMetrics(job, self) for job in jobs)
+            for (entry, result) in zip(entries, results):
+                yield RouteSummary(entry.index, entry.name, entry.points, *result)
+        else:
+            chunksize = max(1, min(16, len(jobs) // (4 * workers)))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(_gpxRouteMetrics, jobs, chunksize=chunksize)
+                for (entry, result) in zip(entries, results):
+                    yield RouteSummary(entry.index, entry.name, entry.points, *result)
 
     def addImagesToRoute(self, path):
         """--------------------------------------------------------------------------
@@ -447,6 +525,7 @@ class NavTools:
         Return:
             none
         """
+        from PIL import Image, ExifTags
 
         points = []
         print(f"searching path: '{path}'")
@@ -495,7 +574,7 @@ class NavTools:
         except Exception as e:
             print(f"calc_heading(): error converting lat/lon strings to float")
             return 0.0
-        
+
         dLon = math.radians(lonTo - lonFrom)
         lat1 = math.radians(latFrom)
         lat2 = math.radians(latTo)
@@ -510,6 +589,56 @@ class NavTools:
         
         return ((360.0 + math.degrees(math.atan2(y, x)) ) % 360)
 
+    def calc_headings(self, latFrom, lonFrom, latTo, lonTo):
+        """--------------------------------------------------------------------------
+            Method to compute the headings between two arrays of lat/lon
+            positions in degrees between 0 and 359. The arrays are broadcast
+            against each other, i.e. a single 'From' position can be used
+            with an array of 'To' positions.
+
+        Args:
+            latFrom (array): starting point latitudes in degress
+            lonFrom (array): starting point longitudes in degress
+            latTo (array):   ending point latitudes in degress
+            lonTo (array):   ending point longitudes in degress
+
+        Return:
+            (ndarray) degrees (between 0 and 359)
+        """
+        precision = 0.0000001
+
+        latFrom = np.asarray(latFrom, dtype=np.float64)
+        lonFrom = np.asarray(lonFrom, dtype=np.float64)
+        latTo = np.asarray(latTo, dtype=np.float64)
+        lonTo = np.asarray(lonTo, dtype=np.float64)
+
+        dLon = np.radians(lonTo - lonFrom)
+        lat1 = np.radians(latFrom)
+        lat2 = np.radians(latTo)
+
+        x = (np.cos(lat1) * np.sin(lat2)
+             - np.sin(lat1)*np.cos(lat2)*np.cos(dLon))
+
+        y = np.sin(dLon) * np.cos(lat2)
+
+        hdg = (360.0 + np.degrees(np.arctan2(y, x))) % 360
+        return np.where((np.abs(x) < precision) & (np.abs(y) < precision), 0.0, hdg)
+
+    def calc_track_headings(self, lats, lons):
+        """--------------------------------------------------------------------------
+            Method to compute the heading of each leg along a track, i.e.
+            between all sequential pairs of lat/lon positions
+
+        Args:
+            lats (array): track latitudes in degress
+            lons (array): track longitudes in degress
+
+        Return:
+            (ndarray) with len(lats)-1 headings in degrees (between 0 and 359)
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        return self.calc_headings(lats[:-1], lons[:-1], lats[1:], lons[1:])
 
     def calc_distance(self, latFrom, lonFrom, latTo, lonTo):
         """--------------------------------------------------------------------------
@@ -540,27 +669,306 @@ class NavTools:
              )
         return (self.RADIUS * 2.0 * math.atan2(math.sqrt(a), math.sqrt(1-a)))
 
+    def calc_distances(self, latFrom, lonFrom, latTo, lonTo):
+        """--------------------------------------------------------------------------
+            Method to compute the great-circle distances between two arrays
+            of lat/lon positions in nautical miles (nm) using the same
+            'haversine' formula as calc_distance(). The arrays are broadcast
+            against each other, i.e. a single 'From' position can be used
+            with an array of 'To' positions.
+
+        Args:
+            latFrom (array): starting point latitudes in degress
+            lonFrom (array): starting point longitudes in degress
+            latTo (array):   ending point latitudes in degress
+            lonTo (array):   ending point longitudes in degress
+
+        Return:
+            (ndarray) distances in nm
+        """
+        latFrom = np.asarray(latFrom, dtype=np.float64)
+        lonFrom = np.asarray(lonFrom, dtype=np.float64)
+        latTo = np.asarray(latTo, dtype=np.float64)
+        lonTo = np.asarray(lonTo, dtype=np.float64)
+
+        dLat = np.radians(latTo - latFrom)
+        dLon = np.radians(lonTo - lonFrom)
+        lat1 = np.radians(latFrom)
+        lat2 = np.radians(latTo)
+
+        a = (np.sin(dLat / 2.0) * np.sin(dLat/2.0)
+             + np.sin(dLon / 2.0) * np.sin(dLon/2.0)
+             * np.cos(lat1) * np.cos(lat2)
+             )
+        return (self.RADIUS * 2.0 * np.arctan2(np.sqrt(a), np.sqrt(1-a)))
+
+    def calc_track_distances(self, lats, lons):
+        """--------------------------------------------------------------------------
+            Method to compute the great-circle distance of each leg along a
+            track, i.e. between all sequential pairs of lat/lon positions
+
+        Args:
+            lats (array): track latitudes in degress
+            lons (array): track longitudes in degress
+
+        Return:
+            (ndarray) with len(lats)-1 leg distances in nm
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        return self.calc_distances(lats[:-1], lons[:-1], lats[1:], lons[1:])
+
+    def calc_cross_track_distances(self, latFrom, lonFrom, latTo, lonTo, lats, lons):
+        """--------------------------------------------------------------------------
+            Method to compute the cross-track distances of an array of
+            lat/lon positions from the great-circle path between two
+            positions in nautical miles (nm)
+            https://www.movable-type.co.uk/scripts/latlong.html
+
+        Args:
+            latFrom (float): path starting point latitude in degress
+            lonFrom (float): path starting point longitude in degress
+            latTo (float):   path ending point latitude in degress
+            lonTo (float):   path ending point longitude in degress
+            lats (array):    latitudes in degress
+            lons (array):    longitudes in degress
+
+        Return:
+            (ndarray) absolute cross-track distances in nm
+        """
+        d13 = self.calc_distances(latFrom, lonFrom, lats, lons)
+        if latFrom == latTo and lonFrom == lonTo:
+            return d13
+        theta13 = np.radians(self.calc_headings(latFrom, lonFrom, lats, lons))
+        theta12 = np.radians(self.calc_headings(latFrom, lonFrom, latTo, lonTo))
+        xte = np.arcsin(np.clip(np.sin(d13 / self.RADIUS) *
+                        np.sin(theta13 - theta12), -1.0, 1.0))
+        return np.abs(xte) * self.RADIUS
+
+    def decimateTrack(self, times, lats, lons, raceStart, watchStart, watchRhythm,
+                      minCourseChange, mode="course", tolerance=0.05):
+        """--------------------------------------------------------------------------
+        Method to select the track positions that become waypoints of the
+        race route. The race start, every watch change, and the last position
+        are always selected. In between, the positions are selected by:
+            'course':          a course change of more than 'minCourseChange'
+                               degrees since the last waypoint
+            'douglas-peucker': the Douglas-Peucker simplification with a
+                               cross-track 'tolerance' in nm
+            'xte':             the longest legs with all skipped positions
+                               within a cross-track 'tolerance' in nm
+
+        Args:
+            times (array):  race course times of the positions (datetime64)
+            lats (array):   latitudes in degrees
+            lons (array):   longitudes in degrees
+            raceStart (datetime): start of the race
+            watchStart (datetime): race course time of watch schedule start
+            watchRhythm (float): number of watch hrs on/off
+            minCourseChange (float): minimum course change before a new WP is generated
+            mode (string):  'course', 'douglas-peucker', or 'xte'
+            tolerance (float): maximum cross-track error in nm
+
+        Return:
+            (tuple) index array of the selected positions and a boolean array
+                    flagging the watch changes
+        """
+        t = np.asarray(times, dtype='datetime64[us]').astype(np.int64)
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        n = len(t)
+        watchChange = np.zeros(n, dtype=bool)
+        raceT = np.datetime64(raceStart, 'us').astype(np.int64)
+        watchT = np.datetime64(watchStart, 'us').astype(np.int64)
+        rhythm = watchRhythm*60*60*1000000
+
+        started = np.flatnonzero(t >= raceT)
+        if len(started) == 0:
+            return (np.zeros(0, dtype=np.int64), watchChange)
+        startCtr = int(started[0])
+        watching = np.flatnonzero(t >= watchT)
+        watchCtr = int(watching[0]) if len(watching) else n
+
+        # watch changes only depend on the time since the last watch change
+        ts = t[startCtr:]
+        if rhythm > 0 and np.all(ts[1:] >= ts[:-1]):
+            equal = np.flatnonzero(ts == watchT) + startCtr
+            lastT = t[startCtr]
+            ctr = startCtr
+            while ctr < n:
+                nxt = max(int(np.searchsorted(t[startCtr:], lastT + rhythm)) + startCtr,
+                          watchCtr, ctr)
+                k = int(np.searchsorted(equal, ctr))
+                if k < len(equal):
+                    nxt = min(nxt, int(equal[k]))
+                if nxt >= n:
+                    break
+                watchChange[nxt] = True
+                lastT = t[nxt]
+                ctr = nxt + 1
+        else:
+            lastT = t[startCtr]
+            for ctr in range(startCtr, n):
+                elapsed = (t[ctr] - lastT) if ctr >= watchCtr else 0
+                if elapsed >= rhythm or t[ctr] == watchT:
+                    watchChange[ctr] = True
+                    lastT = t[ctr]
+
+        forced = watchChange.copy()
+        forced[startCtr] = True
+        forced[n-1] = True
+
+        if mode == "course":
+            hdg = np.zeros(n)
+            hdg[startCtr] = self.calc_headings(lats[startCtr], lons[startCtr],
+                                               lats[startCtr], lons[startCtr])
+            hdg[startCtr+1:] = self.calc_track_headings(lats[startCtr:], lons[startCtr:])
+            # the course change is measured against the heading of the last
+            # selected position, not the previous one, so each selection
+            # depends on the one before and can't be found with a cumulative
+            # sum and a mask. The loop over the Python lists takes ~25ms for
+            # 200k fixes, slicing the arrays per selection takes 0.2-1s when
+            # thousands of positions are selected.
+            hdgList = hdg.tolist()
+            forcedList = forced.tolist()
+            selected = []
+            lastHDG = 999
+            for ctr in range(startCtr, n):
+                if forcedList[ctr] or abs(hdgList[ctr]-lastHDG) > minCourseChange:
+                    selected.append(ctr)
+                    lastHDG = hdgList[ctr]
+            return (np.array(selected, dtype=np.int64), watchChange)
+
+        if mode == "douglas-peucker":
+            simplify = self.douglasPeucker
+        elif mode == "xte":
+            simplify = self.maxCrossTrackError
+        else:
+            raise ValueError(f"Unknown track decimation mode '{mode}'")
+
+        anchors = np.flatnonzero(forced[startCtr:]) + startCtr
+        selected = [anchors[:1]]
+        for a, b in zip(anchors[:-1], anchors[1:]):
+            selected.append(simplify(lats, lons, int(a), int(b), tolerance))
+            selected.append(np.array([b]))
+        return (np.concatenate(selected).astype(np.int64), watchChange)
+
+    def douglasPeucker(self, lats, lons, first, last, tolerance):
+        """--------------------------------------------------------------------------
+        Method to simplify the track between the positions 'first' and 'last'
+        with the Douglas-Peucker algorithm
+
+        Args:
+            lats (array):    latitudes in degrees
+            lons (array):    longitudes in degrees
+            first (int):     index of the first position
+            last (int):      index of the last position
+            tolerance (float): maximum cross-track error in nm
+
+        Return:
+            (ndarray) sorted indices of the selected positions between
+                      'first' and 'last' (exclusive)
+        """
+        keep = []
+        stack = [(first, last)]
+        while stack:
+            a, b = stack.pop()
+            if b - a < 2:
+                continue
+            xte = self.calc_cross_track_distances(lats[a], lons[a], lats[b], lons[b],
+                                                  lats[a+1:b], lons[a+1:b])
+            k = int(np.argmax(xte))
+            if xte[k] > tolerance:
+                k = a + 1 + k
+                keep.append(k)
+                stack.append((a, k))
+                stack.append((k, b))
+        return np.array(sorted(keep), dtype=np.int64)
+
+    def maxCrossTrackError(self, lats, lons, first, last, tolerance):
+        """--------------------------------------------------------------------------
+        Method to simplify the track between the positions 'first' and 'last'
+        by extending each leg as far as all skipped positions stay within
+        the cross-track tolerance (opening window)
+
+        Args:
+            lats (array):    latitudes in degrees
+            lons (array):    longitudes in degrees
+            first (int):     index of the first position
+            last (int):      index of the last position
+            tolerance (float): maximum cross-track error in nm
+
+        Return:
+            (ndarray) sorted indices of the selected positions between
+                      'first' and 'last' (exclusive)
+        """
+        def withinTolerance(a, b):
+            if b - a < 2:
+                return True
+            xte = self.calc_cross_track_distances(lats[a], lons[a], lats[b], lons[b],
+                                                  lats[a+1:b], lons[a+1:b])
+            return bool(np.max(xte) <= tolerance)
+
+        keep = []
+        a = first
+        while a < last:
+            # gallop forward, then bisect to the furthest valid leg end
+            good = a + 1
+            bad = None
+            step = 1
+            while good < last:
+                candidate = min(good + step, last)
+                if withinTolerance(a, candidate):
+                    good = candidate
+                    step *= 2
+                else:
+                    bad = candidate
+                    break
+            if bad is not None:
+                while bad - good > 1:
+                    mid = (good + bad) // 2
+                    if withinTolerance(a, mid):
+                        good = mid
+                    else:
+                        bad = mid
+            if good < last:
+                keep.append(good)
+            a = good
+        return np.array(keep, dtype=np.int64)
+
     def StringToDateTime(self, dateString, dateFormats):
         """--------------------------------------------------------------------------
             Method to convert a string to a datetime format. Return a 
-            zero if the conversion failed
+            zero if the conversion failed. The formats are compiled once
+            into a DateParser that is kept for the next calls.
 
         Args:
             dateString (string):  string with a date to be converted
-            dateFormats (string): date formatting string (e.g. 'YYYY-mm-dd')
+            dateFormats (list):   date formatting strings (e.g. '%Y-%m-%d')
 
         Return:
             (datetime object) converted date
         """
-        for dt_format in dateFormats:
-            try:
-                dateValue = datetime.strptime(dateString, dt_format)
-                return dateValue
-            except ValueError:
-                dateValue = 0
-        return dateValue
+        return self.dateParser(dateFormats).parse(dateString, default=0)
 
-    def parseSQLRouteFile(self, pathGPX, pathSQL, filename):
+    def dateParser(self, dateFormats):
+        """--------------------------------------------------------------------------
+        Method to get the DateParser of a list of date formats, it is
+        created on the first use and kept for the lifetime of the instance
+
+        Args:
+            dateFormats (list): date formatting strings (e.g. '%Y-%m-%d')
+
+        Return:
+            (DateParser) the parser of the formats
+        """
+        key = tuple(dateFormats)
+        parser = self.dateParsers.get(key)
+        if parser is None:
+            parser = self.dateParsers[key] = DateParser(key)
+        return parser
+
+    def parseSQLRouteFile(self, pathGPX, pathSQL, filename, route=None):
         """--------------------------------------------------------------------------
             Method to parse the GPX route data into a MySQL query file
 
@@ -568,6 +976,7 @@ class NavTools:
             pathGPX (string):  path to the gpx file location
             pathSQL (string):  path to the sql file location
             filename (string): name of the file
+            route (Route):     already parsed route of the gpx file (optional)
 
         Return:
             (string) with the log messages
@@ -585,17 +994,12 @@ class NavTools:
                 filename1 = filename + ".gpx"
 
             fn1 = os.path.join(pathGPX, filename1)
-            inputFile = open(fn1, "r")
-            xml = inputFile.read()
-            inputFile.close()
+            if route is None:
+                route = Route.fromFile(fn1, self)
         except:
             print(f"Error opening file: {fn1}")
             return False
 
-        soup = BeautifulSoup(xml)
-        ctr = 0
-        wps = soup.find_all('rtept')
-
         filename2 = filename+".sql"
         fn2 = os.path.join(pathSQL, filename2)
 
@@ -612,28 +1016,15 @@ class NavTools:
 
         ctr = 0
         wp_ctr = 1
-        old_lat = 0.0
-        old_lon = 0.0
         cum_dist = 0.0
         total = 0.0
         txt = ""
-        for wp in wps:
-            # print wp.contents      # converts BeautifulSoup content to list
-            # print wp.contents[3].string, "Type: "+wp.contents[5].string
-            # i = 0
-            # for s in wp.contents:
-            #      print i, ":", s,
-            #      i += 1
-            # print "|----end of wp content!"
-
-            name = wp.find('name').text
-            if wp.find('sym') is None:
-                symbol = "empty"
-            else:
-                symbol = (wp.find('sym').text).lower()
-            if (wp.find('desc')):
-                notes = '"'+(wp.find('desc').text)+'"'
-                desc = (wp.find('desc').text).lower()
+        for ctr in range(len(route)):
+            name = route.names[ctr]
+            symbol = route.syms[ctr].lower()
+            if (route.descs[ctr] is not None):
+                notes = '"'+route.descs[ctr]+'"'
+                desc = route.descs[ctr].lower()
             else:
                 notes = '" "'
                 desc = ""
@@ -641,13 +1032,17 @@ class NavTools:
             if name.startswith('NM') or name.startswith('WP') or name.startswith('0'):
                 name = 'WP' + str(wp_ctr).zfill(4)
                 wp_ctr += 1
-            lat = wp['lat']
-            lon = wp['lon']
+            if route.coords is not None:
+                # the coordinates as written in the GPX file
+                (lat, lon) = route.coords[ctr]
+            else:
+                lat = str(float(route.lat[ctr]))
+                lon = str(float(route.lon[ctr]))
             if (ctr == 0):
                 output += "(" + str(ctr)+", '" + name + "', " + \
                     "'" + str(lat) + "', '" + str(lon) + \
                     "', 'harbor', '', ''),\n"
-                route = 'harbor'
+                wpType = 'harbor'
                 first_lat = lat
                 first_lon = lon
                 #print(output)
@@ -661,48 +1056,45 @@ class NavTools:
                 "anchorage" for "Mooring / Anchorage"
                 ------------------------------------------------------------------
                 """
-                distance = self.calc_distance(
-                    old_lat, old_lon, float(lat), float(lon))
+                distance = float(route.legDistances[ctr])
                 cum_dist = cum_dist + distance
                 total = total + distance
                 if lat == first_lat and lon == first_lon:
-                    route = 'harbor'
+                    wpType = 'harbor'
                     txt = txt + \
                         "WP%d: arrived after final leg at '%s' %s after %0.2fnm.\n" % (
-                            ctr, route, name, cum_dist)
+                            ctr, wpType, name, cum_dist)
                 else:
                     if 'anchorage' in symbol:
-                        route = 'mooring'
-                        # print ("WP%d arrived after final leg at '%s' %s after %0.2fnm." %(ctr, route, name, cum_dist))
+                        wpType = 'mooring'
+                        # print ("WP%d arrived after final leg at '%s' %s after %0.2fnm." %(ctr, wpType, name, cum_dist))
                         txt = txt + \
                             ("WP%d: arrived after final leg at '%s' %s after %0.2fnm.\n" % (
-                                ctr, route, name, cum_dist))
+                                ctr, wpType, name, cum_dist))
                         cum_dist = 0.0
                     elif 'circle' in symbol or 'harbor' in symbol or 'service' in symbol:
-                        route = 'harbor'
-                        # print ("WP%d arrived after final leg at '%s' %s after %0.2fnm." %(ctr, route, name, cum_dist))
+                        wpType = 'harbor'
+                        # print ("WP%d arrived after final leg at '%s' %s after %0.2fnm." %(ctr, wpType, name, cum_dist))
                         txt = txt + \
                             ("WP%d: arrived after final leg at '%s' %s after %0.2fnm.\n" % (
-                                ctr, route, name, cum_dist))
+                                ctr, wpType, name, cum_dist))
                         cum_dist = 0.0
                     elif ('poi' in desc):
-                        route = 'route'
+                        wpType = 'route'
                     elif ('diamond' in symbol and name.startswith('WP0')):
-                        route = 'none'
+                        wpType = 'none'
                     elif 'empty' in symbol:
-                        route = 'none'
+                        wpType = 'none'
                     else:
-                        route = 'route'
+                        wpType = 'route'
                 output += "(" + str(ctr)+", '" + name + \
                     "', " + "'" + str(lat) + "', '" + str(lon) + "', '"
-                output += route + "', '', " + notes + "),\n"
+                output += wpType + "', '', " + notes + "),\n"
             # print(f"from: {old_name}  to: {name}")
-            rows.append([ctr, name, lat, lon, route])
-            old_lat = float(lat)
-            old_lon = float(lon)
-            ctr += 1
+            rows.append([ctr, name, lat, lon, wpType])
+        ctr = len(route)
         # print (f"Total trip across {ctr} waypoints: {total:0.2f}nm.")
-        
+
         txt = txt + (f"Total trip across {ctr} waypoints: {total:,.2f}nm.")
         output = output[:-2] + ";"
         outputFile.write(output)
@@ -730,9 +1122,12 @@ class NavTools:
         Return:
             (datetime) time value from the timeStr string
         """
-        t = timeStr.replace("T", " ")
-        t = t[:len(t)-4]
-        dt = datetime.strptime(t, "%Y-%m-%d %H:%M")
+        t = timeStr[:len(timeStr)-4]
+        try:
+            # 'YYYY-mm-ddTHH:MM' is converted by the C parser of datetime
+            dt = datetime.fromisoformat(t)
+        except ValueError:
+            dt = datetime.strptime(t.replace("T", " "), "%Y-%m-%d %H:%M")
         return (dt+timedelta(hours=timezoneDifference))
 
     def strRANDOMreplace(self, gpxSTR):
@@ -750,7 +1145,172 @@ class NavTools:
         return gpx
 
 
-    def parseKMLRouteFile(self, pathKML, pathGPX, filename, boatname, timezoneDifference, raceStart, watchStart, watchRhythm, minCourseChange):
+    def extractKMLTracks(self, source, boatnames=None):
+        """--------------------------------------------------------------------------
+        Method to extract the tracks of one, several, or all boats from a
+        Yellowbrick .kml file in a single streaming pass. Only the <when> and
+        <coord> values of matching boats are kept, every other element is
+        cleared as soon as it has been parsed, and the parsing stops once
+        all requested boats have been found.
+
+        Args:
+            source:            file path, xml code or file object of the kml file
+            boatnames (list):  boat names (or a single name) to extract. A boat
+                               matches if the name is part of its Placemark
+                               name (case insensitive). None extracts the
+                               whole fleet.
+
+        Return:
+            (dict) Placemark boat name -> (times, lats, lons) with the times as
+                   datetime64[s] (UTC) and lats/lons as float arrays
+        """
+        from lxml import etree
+        if isinstance(boatnames, str):
+            boatnames = [boatnames]
+        pending = None
+        if boatnames is not None:
+            pending = [x.lower() for x in boatnames]
+
+        tracks = {}
+        stream, close = self.openXMLSource(source)
+        try:
+            context = etree.iterparse(stream, events=(
+                'start', 'end'), recover=True, huge_tree=True)
+            placemark = None
+            boat = None
+            match = False
+            times = []
+            coords = []
+            for event, el in context:
+                if not isinstance(el.tag, str):
+                    continue
+                local = el.tag.rpartition('}')[2].lower()
+                if event == 'start':
+                    if local == 'placemark':
+                        placemark = el
+                        boat = None
+                        match = False
+                        times = []
+                        coords = []
+                    continue
+
+                if placemark is None:
+                    continue
+                if local == 'placemark':
+                    if match and len(coords) > 0 and boat not in tracks:
+                        tracks[boat] = self.trackArrays(times, coords)
+                        if pending is not None:
+                            pending = [x for x in pending if x not in boat.lower()]
+                    placemark = None
+                    el.clear()
+                    while el.getprevious() is not None:
+                        del el.getparent()[0]
+                    if pending is not None and len(pending) == 0:
+                        break
+                    continue
+
+                if local == 'name' and boat is None:
+                    boat = (el.text or "").strip()
+                    match = (boat not in tracks and
+                             (pending is None or any(x in boat.lower() for x in pending)))
+                elif match and local == 'when':
+                    times.append(el.text or "")
+                elif match and local == 'coord':
+                    coords.append(el.text or "")
+                # don't keep any sub trees of the Placemark
+                el.clear()
+                while el.getprevious() is not None:
+                    del el.getparent()[0]
+        finally:
+            if close:
+                stream.close()
+
+        return tracks
+
+    def trackArrays(self, times, coords):
+        """--------------------------------------------------------------------------
+        Method to convert lists of kml <when> and <coord> strings into arrays
+
+        Args:
+            times (list):  time strings, e.g. '2024-07-20T14:36:00Z'
+            coords (list): 'lon lat alt' or 'lon,lat,alt' strings
+
+        Return:
+            (tuple) times (datetime64[s]), lats (float), lons (float) arrays
+        """
+        if len(coords) == 0:
+            empty = np.zeros(0)
+            return (np.zeros(0, dtype='datetime64[s]'), empty, empty)
+        width = len(coords[0].replace(',', ' ').split())
+        values = np.array(' '.join(coords).replace(',', ' ').split(), dtype=np.float64)
+        values = values.reshape(-1, width)
+        t = Route.parseTimes(times)
+        return (t, values[:, 1].copy(), values[:, 0].copy())
+
+    def kmlTrackToGPX(self, stream, routeName, times, lats, lons, timezoneDifference, raceStart, watchStart, watchRhythm, minCourseChange, mode="course", tolerance=0.05):
+        """--------------------------------------------------------------------------
+        Method to decimate one boat track extracted from a Yellowbrick .kml
+        file (see extractKMLTracks()) and to write the GPX route of it
+
+        Args:
+            stream (file):    text file object the GPX route is written to
+            routeName (string): name of the GPX route
+            times (np.array): UTC fix times (datetime64)
+            lats (np.array):  fix latitudes
+            lons (np.array):  fix longitudes
+            timezoneDifference (float): racecourse timezone difference to UTC
+            raceStart (datetime): start of the race
+            watchStart (datetime): race course time of watch schedule start
+            watchRhythm (int): number of watch hrs on/off
+            minCourseChange (float): minimum course change before a new WP is generated
+            mode (string): track decimation mode, see decimateTrack()
+            tolerance (float): maximum cross-track error in nm, see decimateTrack()
+
+        Return:
+            (Route) the waypoints written to the GPX route
+        """
+        # Yellowbrick times are UTC. Convert them to the race course time
+        # and truncate them to the minute
+        offset = np.timedelta64(int(round(timezoneDifference*3600)), 's')
+        localTimes = times.astype('datetime64[m]') + offset
+
+        (selected, watchChanges) = self.decimateTrack(
+            localTimes, lats, lons, raceStart, watchStart, watchRhythm,
+            minCourseChange, mode, tolerance)
+        localTimes = localTimes.astype('datetime64[s]').tolist()
+        startCtr = selected[0] if len(selected) else -1
+
+        # build the GPX route file
+        gpx = GPXWriter(stream, routeName)
+        wpCTR = 0
+        names = []
+        syms = []
+        descs = []
+        for idx in selected:
+            name = "NM{:05d}".format(wpCTR+1)
+            sym = "empty"
+            desc = None
+            strT = localTimes[idx].strftime("%Y-%m-%d %H:%M")
+            if idx == startCtr:
+                (name, sym, desc) = ("Race Start", "diamond", f"departure {strT}")
+            if idx == len(lats)-1:
+                (sym, desc) = ("diamond", f"arrival {strT}")
+            if watchChanges[idx]:
+                if name.startswith("NM"):
+                    name = strT
+                desc = f"timedleg {strT}"
+            names.append(name)
+            syms.append(sym)
+            descs.append(desc)
+            wpCTR = wpCTR + 1
+        # of of loop over all waypoint in the KML file
+        gpx.waypoints(lats[selected], lons[selected], times[selected], names, syms, descs)
+        gpx.close()
+
+        return Route(lats[selected], lons[selected], times[selected],
+                     names, syms, descs, routeName, self)
+
+    def parseKMLRouteFile(self, pathKML, pathGPX, filename, boatname, timezoneDifference, raceStart, watchStart, watchRhythm, minCourseChange, mode="course", tolerance=0.05):
         """--------------------------------------------------------------------------
         Method to parse the waypoint and route information from a .kml 
         file into a GPS file. Only after a course change of at least
@@ -768,6 +1328,10 @@ class NavTools:
             watchStart (datetime): race course time of watch schedule start
             watchRhythm (int): number of watch hrs on/off
             minCourseChange (float): minimum course change before a new WP is generated
+            mode (string): track decimation mode ('course', 'douglas-peucker',
+                           or 'xte'), see decimateTrack()
+            tolerance (float): maximum cross-track error in nm for the
+                           'douglas-peucker' and 'xte' modes
 
         Return:
             (string) with the log messages
@@ -776,113 +1340,26 @@ class NavTools:
         log_msg = ""
         ctr = 0
 
+        fileKML = os.path.join(pathKML, filename+".kml")
         try:
-            fileKML = os.path.join(pathKML, filename+".kml")
-            inputFile = open(fileKML, "r")
-            xml = inputFile.read()
-            inputFile.close()
+            tracks = self.extractKMLTracks(fileKML, boatname)
         except:
             print(f"Error opening file: {fileKML}")
             return False
         fileGPX = os.path.join(pathGPX, filename+".gpx")
         outputfile = open(fileGPX, "w")
-        kml = BeautifulSoup(xml, features="xml")
-        # different Yellowbrick kml files use different spellings
-        records = kml.find_all("Placemark")
-        if not len(records):
-            records = kml.find_all("placemark")
-        locations = []
         times = []
-        if len(records):
-            print(f"\nfound {len(records)} boat names")
-            ctr = 0
-            wpCTR = 0
-            for record in records:
-                boat = record.find_all("name")
-                if boatname.lower() in boat[0].contents[0].lower():
-                    #print(f"\n\nfound our boat: {boat[0].contents[0]}\n")
-                    siblings = list(record.next_siblings)
-                    #print(len(siblings))
-                    times = record.find_all("ns2:when")
-                    locations = record.find_all("gx:coord")
-                    break
-                ctr += 1
-
-            if len(locations) != 0 and len(locations) == len(times):
-
-                # build the GPX route file
-                gpx = self.strRANDOMreplace(self.gpxHeader)
-                gpx = gpx.replace("nameX", filename)
-                lastHDG = 999
-                watchStartFlag = False
-                raceStartFlag = False
-                elapsed = timedelta(seconds=0)
-                wp = ""
-                startCtr = 0
-                for ctr in range(0, len(locations)):
-                    watchChange = False
-                    # location info is stored as longitute latitude string pairs
-                    # example: ['-87.5822,41.876299999999986,0']
-                    latlon = locations[ctr].contents[0]
-                    latlon = latlon.split(',')
-
-                    currentT = self.getTime(
-                        times[ctr].text, timezoneDifference)
-                    if not raceStartFlag and currentT >= raceStart:
-                        raceStartFlag = True
-                        startCtr = ctr     # initialize startCtr
-                        lastWP = latlon    # initialize lastWP
-                        lastT = currentT   # initialize lastT
-                    if not watchStartFlag and currentT >= watchStart:
-                        watchStartFlag = True
-                    if watchStartFlag:
-                        elapsed = currentT - lastT
-                    if raceStartFlag:
-                        hdg = self.calc_heading(lastWP[1], lastWP[0], latlon[1], latlon[0])
-                        if (elapsed.total_seconds() >= watchRhythm*60*60 
-                            or currentT == watchStart):
-                                watchChange = True
-                                                                   # only add a WP if
-                        if(startCtr == ctr or                      # race start
-                           watchChange or                          # watch change
-                           ctr==len(locations)-1                   # last waypoint
-                           or abs(hdg-lastHDG) > minCourseChange): # a course change larger than minCourseChange
-                            #print(f"ctr: {ctr}  wpCTR: {wpCTR}  hdg: {hdg:.2f}")
-                            #print(f"{lastWP[1]}  {lastWP[0]} - {latlon[1]}  {latlon[0]}")
-                            wp = self.strRANDOMreplace(self.gpxWaypoint)
-                            wp = wp.replace("latX", latlon[1])
-                            wp = wp.replace("lonX", latlon[0])
-                            wp = wp.replace("timeX", times[ctr].contents[0])
-                            wp = wp.replace("wpX", "NM{:05d}".format(wpCTR+1))
-                            strT = currentT.strftime("%Y-%m-%d %H:%M")
-                            #wp = wp.replace("empty", "diamond")
-                            if ctr == startCtr:
-                                wp = wp.replace("empty", "diamond")
-                                wp = wp.replace(
-                                    f"</name>", f"</name>\n   <desc>departure {strT}</desc>")
-                                wp = wp.replace(
-                                    "NM{:05d}".format(wpCTR+1), "Race Start")
-                            if ctr == len(locations)-1:
-                                wp = wp.replace("empty", "diamond")
-                                wp = wp.replace(
-                                    "</name>", f"</name>\n   <desc>arrival {strT}</desc>")
-                                elapsed = timedelta(seconds=0)
-                            if watchChange:
-                                wp = wp.replace(
-                                    "NM{:05d}".format(wpCTR+1), strT)
-                                wp = wp.replace(
-                                    "</name>", f"</name>\n   <desc>timedleg {strT}</desc>")
-                                lastT = currentT
-                            lastHDG = hdg
-                            wpCTR = wpCTR + 1
-                            gpx += wp
-                        # end of conditional clause testing for new waypoint
-                        lastWP = latlon
-                    print(f"processed WP{ctr} out of {len(locations)}")
-                    # end of conditional clause for race start
-                # of of loop over all waypoint in the KML file
-                gpx += self.gpxFooter
-                outputfile.write(gpx)
+        lats = []
+        lons = []
+        if len(tracks):
+            (times, lats, lons) = next(iter(tracks.values()))
+
+            if len(lats) != 0 and len(lats) == len(times):
+                route = self.kmlTrackToGPX(
+                    outputfile, filename, times, lats, lons, timezoneDifference,
+                    raceStart, watchStart, watchRhythm, minCourseChange, mode, tolerance)
+                wpCTR = len(route)
+                ctr = len(lats)-1
 
                 log_msg += (
                     f"Done, parsed a total of {wpCTR} waypoints from {ctr} KML records for boat '{boatname}' ")
@@ -890,22 +1367,121 @@ class NavTools:
                     f"from the KML route file {fileKML} to the GPX route file{fileGPX}\n")
             else:
                 log_msg += (
-                    f"Found inconsistent number of or no location ({len(locations)}) and date ({len(times)}) records. Couldn't parse the KML route info for boat '{boatname}'.\n")
+                    f"Found inconsistent number of or no location ({len(lats)}) and date ({len(times)}) records. Couldn't parse the KML route info for boat '{boatname}'.\n")
         else:
             log_msg += (
-                f"Found no route information in the KML file ('{fileKML}').\n")
+                f"Found no route information for boat '{boatname}' in the KML file ('{fileKML}').\n")
 
         outputfile.close()
 
         return str(log_msg)
 
-    def verifyGPXRouteFile(self, pathGPX, nameGPX):
+    def parseKMLFleet(self, pathKML, pathGPX, filename, timezoneDifference, raceStart, watchStart, watchRhythm, minCourseChange, mode="course", tolerance=0.05, workers=None):
         """--------------------------------------------------------------------------
-            Method to verify / fix duplicate waypoint names in GPX file
+        Method to convert the tracks of all boats in a Yellowbrick .kml file
+        into one GPX route file per boat and to compare the boats. The .kml
+        file is read once, the boats are decimated and written in a process
+        pool. The GPX files are written to the folder 'pathGPX/filename' and
+        named after the boats. The fleet comparison table (distance sailed,
+        average speed and the etmal of each watch, computed with
+        routeMetrics()) is saved there as 'filename_fleet.txt'.
+
+        Args:
+            pathKML (string):  path to the kml file location
+            pathGPX (string):  path to the gpx folder
+            filename (string): name of the file
+            timezoneDifference (float): racecourse timezone difference to UTC
+            raceStart (datetime): start of the race
+            watchStart (datetime): race course time of watch schedule start
+            watchRhythm (int): number of watch hrs on/off
+            minCourseChange (float): minimum course change before a new WP is generated
+            mode (string): track decimation mode, see decimateTrack()
+            tolerance (float): maximum cross-track error in nm, see decimateTrack()
+            workers (int): number of worker processes (None: number of CPUs,
+                           1: convert the boats in this process)
+
+        Return:
+            (string) with the log messages and the fleet comparison table
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        from tabulate import tabulate
+        fileKML = os.path.join(pathKML, filename+".kml")
+        try:
+            tracks = self.extractKMLTracks(fileKML)
+        except Exception as e:
+            return f"Error '{str(e)}' opening file: {fileKML}\n"
+        if len(tracks) == 0:
+            return f"Found no boat tracks in the KML file ('{fileKML}').\n"
+
+        folderGPX = os.path.join(pathGPX, filename)
+        os.makedirs(folderGPX, exist_ok=True)
+
+        args = (timezoneDifference, raceStart, watchStart, watchRhythm,
+                minCourseChange, mode, tolerance)
+        jobs = []
+        fileNames = set()
+        for (boatname, track) in tracks.items():
+            name = re.sub(r'[^\w\-. ]', '_', boatname).strip() or "boat"
+            while name.lower() in fileNames:
+                name += "_"
+            fileNames.add(name.lower())
+            jobs.append((boatname, track, os.path.join(folderGPX, name+".gpx"), args))
+
+        if workers == 1 or len(jobs) == 1:
+            results = [_convertFleetBoat(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_convertFleetBoat, jobs))
+
+        log_msg = ""
+        summary = []
+        watches = []
+        for (boatname, fileGPX, wpCTR, metrics) in results:
+            if metrics is None:
+                log_msg += (
+                    f"Found inconsistent number of or no location records. Couldn't parse the KML route info for boat '{boatname}'.\n")
+                continue
+            etmals = [leg.etmal for leg in metrics.legs if leg.time > 0.0]
+            summary.append([boatname, wpCTR, metrics.totalDistance,
+                            metrics.timedTime, metrics.averageSpeed,
+                            max(etmals) if len(etmals) else None])
+            watches.append([boatname] + etmals)
+
+        # rank the boats by their average speed over the timed legs
+        order = sorted(range(len(summary)),
+                       key=lambda i: -(summary[i][4] or 0.0))
+        summary = [[rank+1] + summary[i] for (rank, i) in enumerate(order)]
+        watches = [watches[i] for i in order]
+        nWatches = max([len(row)-1 for row in watches], default=0)
+
+        table = (tabulate(summary, headers=["Rank", "Boat", "WPs", "Distance",
+                                            "Time", "Speed", "Best Etmal"],
+                          floatfmt=',.2f', numalign="right", missingval="-"))
+        table += "\n\nEtmal per watch:\n"
+        table += (tabulate(watches, headers=["Boat"] + [f"W{i+1}" for i in range(nWatches)],
+                           floatfmt=',.0f', numalign="right", missingval="-"))
+
+        fileTable = os.path.join(folderGPX, filename+"_fleet.txt")
+        with open(fileTable, "w") as outputfile:
+            outputfile.write(table+"\n")
+
+        log_msg += (
+            f"Done, converted {len(summary)} of {len(tracks)} boats from the KML route file {fileKML} ")
+        log_msg += (
+            f"to GPX route files in the folder {folderGPX}\n\n{table}\n")
+
+        return log_msg
+
+    def verifyGPXRouteFile(self, pathGPX, nameGPX, route=None):
+        """--------------------------------------------------------------------------
+            Method to verify / fix duplicate waypoint names in GPX file. The
+            waypoint names come from the Route model of the file, the xml
+            code is only read to rename generic duplicates.
 
         Args:
             pathGPX (string): path to the GPX file
             nameGPX (string): GPX file name
+            route (Route):    the parsed GPX file, None to parse the file
 
         Return:
             msg (string): message with the results
@@ -914,16 +1490,16 @@ class NavTools:
 
         fname = os.path.join(pathGPX, nameGPX)
         try:
-            with open(fname, 'r') as fr:
-                xml = fr.read()
-
-            soup = BeautifulSoup(xml, features="html5lib")
-            wpNames = [x.get_text() for x in soup.find_all('name')]
-            counter = Counter(wpNames)
-            duplicates = [key for key in counter.keys() if counter[key] > 1]
-            ctr = 0
-            for duplicate in duplicates:
-                if self.isGenericWaypoint(duplicate):
+            if route is None:
+                route = Route.fromFile(fname, self)
+            counter = Counter(route.names)
+            duplicates = [key for key in counter.keys()
+                          if counter[key] > 1 and self.isGenericWaypoint(key)]
+            if duplicates:
+                with open(fname, 'r') as fr:
+                    xml = fr.read()
+                ctr = 0
+                for duplicate in duplicates:
                     for i in range(counter[duplicate]):
                         newName = (
                             f"{duplicate}{random.randint(0, 10000):05d}")
@@ -931,9 +1507,7 @@ class NavTools:
                             (f"<name>{duplicate}</name>"),
                             (f"<name>{newName}</name>"),
                             1)
-                        #print(duplicate, counter[duplicate], newName)
                         ctr = ctr + 1
-            if ctr > 0:
                 with open(fname, 'w') as fr:
                     fr.write(xml)
                 msg = (
@@ -944,60 +1518,750 @@ class NavTools:
 
         return msg
 
-    def verifyToerndirectoryDistances(self, sqliteDB, gpxPath):
+    def iterToerndirectoryDistances(self, sqliteDB, gpxPath, workers=None):
         """--------------------------------------------------------------------------
-            Method to verify / fix the trip distances in the sqlite DB vs.
-            the calculated distances calculated from the trip sqlite files
+            Generator to compute the distances of all trips of the toern
+            directory ('ToernDirectoryTable' in the sqlite DB) from their GPX
+            files. The route metrics are cached in the sqlite DB, so only
+            new or changed GPX files are parsed again, in a process pool. The
+            results are yielded in the order of the directory as soon as they
+            are available. Only this process writes to the cache, the workers
+            return the metrics.
 
         Args:
             sqliteDB (string): path to the sqlite DB file
+            gpxPath (string):  path to the GPX route files
+            workers (int):     number of worker processes (None: number of
+                               CPUs, 1: process the files in this process)
 
         Return:
-            msg (string): message with the results
+            (TripCheck) per trip: id, destination, GPX file, miles stored in
+                        the directory, computed distance and error message
+                        (distance None and an error message if it failed)
         """
+        from concurrent.futures import ProcessPoolExecutor
+        from RouteCache import RouteMetricsCache
+        con = sqlite3.connect(sqliteDB)
         try:
-            con = sqlite3.connect(sqliteDB)
-            cursor = con.cursor()
-            cursor.execute(
-                "SELECT id, destination, maptable, miles FROM ToernDirectoryTable")
-            rows = cursor.fetchall()
-            cursor.close()
-        except Exception as e:
-            return f"sqlite DB error '{str(e)}' in method 'verifyToerndirectoryDistances'.\n"
+            rows = con.execute(
+                "SELECT id, destination, maptable, miles FROM ToernDirectoryTable").fetchall()
+        finally:
+            con.close()
+
+        files = [os.path.join(gpxPath, row[2]+".gpx") for row in rows]
+        if workers is None:
+            workers = os.cpu_count() or 1
+        executor = None
+        with RouteMetricsCache(sqliteDB, self) as cache:
+            cached = [cache.lookup(filename) if os.path.isfile(filename) else (None, None)
+                      for filename in files]
+            jobs = [filename for (filename, (metrics, _)) in zip(files, cached) if metrics is None]
+            if workers == 1 or len(jobs) < 2:
+                results = (_tripDistance(filename, self) for filename in jobs)
+            else:
+                chunksize = max(1, min(16, len(jobs) // (4 * workers)))
+                executor = ProcessPoolExecutor(max_workers=workers)
+                results = executor.map(_tripDistance, jobs, chunksize=chunksize)
+            try:
+                for (row, filename, (metrics, entry)) in zip(rows, files, cached):
+                    error = None
+                    if metrics is None:
+                        (metrics, error) = next(results)
+                        if metrics is not None:
+                            cache.store(entry, metrics)
+                    yield TripCheck(row[0], row[1], filename, row[3],
+                                    None if metrics is None else metrics.totalDistance, error)
+            finally:
+                if executor is not None:
+                    executor.shutdown(cancel_futures=True)
+
+    def verifyToerndirectoryDistances(self, sqliteDB, gpxPath, workers=None, errors=None, verbose=False):
+        """--------------------------------------------------------------------------
+            Method to verify / fix the trip distances in the sqlite DB vs.
+            the calculated distances calculated from the trip sqlite files,
+            see iterToerndirectoryDistances()
 
+        Args:
+            sqliteDB (string): path to the sqlite DB file
+            gpxPath (string):  path to the GPX route files
+            workers (int):     number of worker processes (None: number of
+                               CPUs, 1: process the files in this process)
+            errors (list):     the TripCheck of all trips that couldn't be
+                               verified are appended to this list (optional)
+            verbose (bool):    print each trip result as soon as it is available
+
+        Return:
+            msg (string): message with the results
+        """
+        if errors is None:
+            errors = []
         msg = ""
         ctr = 0
         ok = 0
-        for row in rows:
-            match = False
-            try:
-                filename = os.path.join(gpxPath, row[2]+".gpx")
-                inputfile = open(filename, "r")
-                xml = inputfile.read()
-                inputfile.close()
-            except:
-                xml = ""
-                msg += (f"Error opening file: '{filename}'\n")
-
-            dist = self.ComputeRouteDistances(
-                xml, verbose=False, skipWP=True, noSpeed=False)
-            match = re.findall("Total Trip Distance:[ 0-9\.\,]*", dist)
-            if xml != "" and len(match) > 0:
-                x = match[0].split(':')
-                if len(x) > 1:
-                    y = x[1].replace(",", "")
-                    y = float(y)
-                    if round(y, 2) != round(row[3], 2):
-                        msg += (f"{row[1]}: {y:.2f} vs. {row[3]:.2f}\n")
-                    else:
-                        ok += 1
+        try:
+            for trip in self.iterToerndirectoryDistances(sqliteDB, gpxPath, workers):
+                ctr += 1
+                if trip.error is not None:
+                    errors.append(trip)
+                    line = f"{trip.destination}: {trip.error}\n"
+                elif round(trip.distance, 2) != round(trip.miles, 2):
+                    line = f"{trip.destination}: {trip.distance:.2f} vs. {trip.miles:.2f}\n"
+                    msg += line
                 else:
-                    msg += (
-                        f"error finding distance for {row[1]} with {match.string}\n")
-            ctr += 1
+                    ok += 1
+                    line = f"{trip.destination}: OK\n"
+                if verbose:
+                    print(line, end="")
+        except sqlite3.Error as e:
+            return f"sqlite DB error '{str(e)}' in method 'verifyToerndirectoryDistances'.\n"
+
         msg += (f"\n{ok} out of {ctr} trips where OK\n")
+        if len(errors):
+            msg += (f"{len(errors)} {'trips' if len(errors) > 1 else 'trip'} couldn't be verified\n")
+        return msg
+
+class Route:
+    """--------------------------------------------------------------------------
+    Compact, array backed representation of the waypoints of a GPX route.
+    lat/lon/time are stored in contiguous NumPy arrays and the waypoint
+    name/sym/desc in lists of interned strings, so a route file is parsed
+    once and can be handed to ComputeRouteDistances() and parseSQLRouteFile()
+    without re-reading the file.
+
+    The cumulative distance prefix sums make the distance of any leg or
+    sub-route an O(1) lookup.  As in ComputeRouteDistances() a leg starting
+    at a WP with a lat or lon of 0.0 counts as zero distance.
+
+    Args:
+        lat (array):     waypoint latitudes in degrees
+        lon (array):     waypoint longitudes in degrees
+        time (array):    waypoint times (datetime64, NaT when missing)
+        names (list):    waypoint names
+        syms (list):     waypoint symbols ('empty' when missing)
+        descs (list):    waypoint descriptions (None when missing)
+        name (string):   name of the route
+        navtools (NavTools): instance used for the distance calculations
+        coords (list):   lat/lon attribute strings of the GPX file (None
+                         when the route wasn't read from a GPX file)
+    """
+    __slots__ = ('name', 'lat', 'lon', 'time', 'names', 'syms', 'descs',
+                 'coords', 'legDistances', 'cumDistances')
+
+    def __init__(self, lat, lon, time=None, names=None, syms=None, descs=None,
+                 name="", navtools=None, coords=None):
+        if navtools is None:
+            navtools = NavTools()
+        self.name = name
+        self.coords = coords
+        self.lat = np.ascontiguousarray(lat, dtype=np.float64)
+        self.lon = np.ascontiguousarray(lon, dtype=np.float64)
+        n = len(self.lat)
+        if time is None:
+            self.time = np.full(n, np.datetime64('NaT'), dtype='datetime64[s]')
+        else:
+            self.time = np.asarray(time, dtype='datetime64[s]')
+        if names is None:
+            names = [""] * n
+        if syms is None:
+            syms = ["empty"] * n
+        if descs is None:
+            descs = [None] * n
+        self.names = [sys.intern(x) for x in names]
+        self.syms = [sys.intern(x) for x in syms]
+        self.descs = [None if x is None else sys.intern(x) for x in descs]
+
+        self.legDistances = np.zeros(n)
+        if n > 1:
+            legs = navtools.calc_track_distances(self.lat, self.lon)
+            valid = (self.lat[:-1] != 0.0) & (self.lon[:-1] != 0.0)
+            self.legDistances[1:] = np.where(valid, legs, 0.0)
+        self.cumDistances = np.cumsum(self.legDistances)
+
+    def __len__(self):
+        return len(self.lat)
+
+    def __str__(self):
+        return f"Route '{self.name}' with {len(self)} waypoints and {self.distance():,.2f}nm."
+
+    def distance(self, start=0, end=None):
+        """--------------------------------------------------------------------------
+        Method to return the distance along the route from waypoint 'start'
+        to waypoint 'end' (default: last waypoint) in nm
+
+        Args:
+            start (int): index of the first waypoint
+            end (int):   index of the last waypoint
+
+        Return:
+            (float) distance in nm
+        """
+        if len(self) == 0:
+            return 0.0
+        if end is None:
+            end = len(self) - 1
+        return float(self.cumDistances[end] - self.cumDistances[start])
+
+    def timeText(self, index):
+        """--------------------------------------------------------------------------
+        Method to return the GPX formatted time string of a waypoint
+
+        Args:
+            index (int): index of the waypoint
+
+        Return:
+            (string) time as 'YYYY-mm-ddTHH:MM:SSZ' or '' when missing
+        """
+        t = self.time[index]
+        if np.isnat(t):
+            return ""
+        return f"{np.datetime_as_string(t, unit='s')}Z"
+
+    @staticmethod
+    def parseTime(timeStr):
+        """--------------------------------------------------------------------------
+        Method to convert a GPX time string into a datetime64 value
+
+        Args:
+            timeStr (string): GPX time string, e.g. '2019-09-25T19:30:00Z'
+
+        Return:
+            (datetime64) time value, NaT if the string couldn't be parsed
+        """
+        try:
+            return np.datetime64(timeStr.strip().rstrip('Zz'), 's')
+        except (ValueError, AttributeError):
+            return np.datetime64('NaT')
+
+    @staticmethod
+    def parseTimes(timeStrs):
+        """--------------------------------------------------------------------------
+        Method to convert a list of GPX/kml time strings into a datetime64
+        array. 'YYYY-mm-ddTHH:MM:SS[Z]' lists are converted in bulk by
+        DateParser.parseISOArray(), anything else with parseTime().
+
+        Args:
+            timeStrs (list): time strings (None for missing times)
+
+        Return:
+            (np.array) datetime64[s] values, NaT where a string couldn't be parsed
+        """
+        timeStrs = list(timeStrs)
+        if len(timeStrs) and all(isinstance(t, str) for t in timeStrs):
+            values = DateParser.parseISOArray(timeStrs)
+            if values is not None:
+                return values
+        return np.array([Route.parseTime(t) for t in timeStrs], dtype='datetime64[s]')
+
+    @classmethod
+    def fromGPX(cls, source, navtools=None):
+        """--------------------------------------------------------------------------
+        Method to build a Route from a GPX file. The file is streamed with
+        NavTools.iterGPXWaypoints() and all <rtept> of the file are
+        flattened into one route.
+
+        Args:
+            source:  xml code, file path or file object of the GPX file
+            navtools (NavTools): instance used for the distance calculations
+
+        Return:
+            (Route) the parsed route
+        """
+        if navtools is None:
+            navtools = NavTools()
+        info = {'coords': []}
+        lat = []
+        lon = []
+        time = []
+        names = []
+        syms = []
+        descs = []
+        for wp in navtools.iterGPXWaypoints(source, info=info):
+            lat.append(wp[0])
+            lon.append(wp[1])
+            time.append(wp[2])
+            names.append(wp[3] if wp[3] is not None else "")
+            syms.append(wp[4] if wp[4] is not None else "empty")
+            descs.append(wp[5])
+
+        return cls(lat, lon, cls.parseTimes(time), names, syms, descs,
+                   name=info.get('name', ""), navtools=navtools, coords=info['coords'])
+
+    @classmethod
+    def fromFile(cls, path, navtools=None):
+        """--------------------------------------------------------------------------
+        Method to build a Route from a GPX file
+
+        Args:
+            path (string): path (including filename) of the GPX file
+            navtools (NavTools): instance used for the distance calculations
+
+        Return:
+            (Route) the parsed route
+        """
+        with open(path, "rb") as fr:
+            return cls.fromGPX(fr, navtools)
+
+
+class DateParser:
+    """--------------------------------------------------------------------------
+    Date parser for a list of strptime formats. Each format is translated
+    once into a precompiled regex with the field patterns of strptime, so a
+    string is classified by a regex match instead of trying
+    datetime.strptime() with every format and catching the ValueErrors.
+    Like the strptime loop, the first matching format of the list wins.
+    The format that matched last is remembered per source (e.g. per route
+    file or NMEA stream) and tried first the next time, if no earlier
+    format of the list can match the same strings (see skeleton()).
+    Formats with directives the translation doesn't support fall back to
+    strptime().
+
+    Args:
+        formats (list): strptime formats, tried in this order
+    """
+    FIELDS = {
+        'Y': r"(?P<Y>\d\d\d\d)",
+        'y': r"(?P<y>\d\d)",
+        'm': r"(?P<m>1[0-2]|0[1-9]|[1-9])",
+        'd': r"(?P<d>3[01]|[12]\d|0[1-9]|[1-9]| [1-9])",
+        'H': r"(?P<H>2[0-3]|[0-1]\d|\d)",
+        'M': r"(?P<M>[0-5]\d|\d)",
+        'S': r"(?P<S>6[0-1]|[0-5]\d|\d)",
+        'b': r"(?P<b>jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)",
+    }
+    MONTHS = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+              'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12}
+    ISO_FORMATS = ("%Y-%m-%dT%H:%M:%SZ", "%Y-%m-%dT%H:%M:%S")
+
+    def __init__(self, formats):
+        self.formats = list(formats)
+        self.regexes = [self.compile(fmt) for fmt in self.formats]
+        # formats that can be tried first without changing the result
+        skeletons = [self.skeleton(fmt) if regex is not None else None
+                     for (fmt, regex) in zip(self.formats, self.regexes)]
+        self.exclusive = [s is not None and all(t is not None and t != s for t in skeletons[:i])
+                          for (i, s) in enumerate(skeletons)]
+        self.lastFormat = {}
+        # 'YYYY-mm-ddTHH:MM:SS[Z]' arrays can be converted by numpy in bulk
+        self.isoBulk = any(fmt in self.ISO_FORMATS for fmt in self.formats)
+
+    @classmethod
+    def compile(cls, fmt):
+        """--------------------------------------------------------------------------
+        Method to translate a strptime format into a precompiled regex
+
+        Args:
+            fmt (string): strptime format, e.g. '%Y-%m-%d %H:%M'
+
+        Return:
+            (re.Pattern) regex, None if the format uses unsupported directives
+        """
+        pattern = ""
+        fields = set()
+        i = 0
+        while i < len(fmt):
+            c = fmt[i]
+            if c == '%' and i+1 < len(fmt):
+                directive = fmt[i+1]
+                if directive == '%':
+                    pattern += '%'
+                elif directive in cls.FIELDS and directive not in fields:
+                    pattern += cls.FIELDS[directive]
+                    fields.add(directive)
+                else:
+                    return None
+                i += 2
+            elif c.isspace():
+                pattern += r"\s+"
+                i += 1
+            else:
+                pattern += re.escape(c)
+                i += 1
+        return re.compile(pattern, re.IGNORECASE)
+
+    @staticmethod
+    def skeleton(fmt):
+        """--------------------------------------------------------------------------
+        Method to return the separators of a strptime format: the numeric
+        fields, digits and white space are dropped and each run of letters
+        (%b month names, literal letters like 'T') becomes one 'a'. Every
+        string matched by the compiled format has the same separators, so
+        formats with different skeletons never match the same string.
+
+        Args:
+            fmt (string): strptime format, e.g. '%Y-%m-%d %H:%M'
+
+        Return:
+            (string) skeleton, e.g. '--:' for '%Y-%m-%d %H:%M'
+        """
+        skeleton = ""
+        i = 0
+        while i < len(fmt):
+            c = fmt[i]
+            if c == '%' and i+1 < len(fmt):
+                c = fmt[i+1]
+                i += 2
+                if c == 'b':
+                    c = 'a'
+                elif c != '%':
+                    continue
+            else:
+                i += 1
+            if c.isalpha():
+                if not skeleton.endswith('a'):
+                    skeleton += 'a'
+            elif not (c.isdigit() or c.isspace()):
+                skeleton += c
+        return skeleton
+
+    @classmethod
+    def build(cls, match):
+        """--------------------------------------------------------------------------
+        Method to build the datetime from the fields of a regex match
+
+        Args:
+            match (re.Match): match of a regex built by compile()
+
+        Return:
+            (datetime) date, raises ValueError for invalid dates (e.g. Feb 30)
+        """
+        g = match.groupdict()
+        if 'Y' in g:
+            year = int(g['Y'])
+        elif 'y' in g:
+            year = int(g['y'])
+            year += 2000 if year <= 68 else 1900
+        else:
+            year = 1900
+        if 'm' in g:
+            month = int(g['m'])
+        elif 'b' in g:
+            month = cls.MONTHS[g['b'].lower()]
+        else:
+            month = 1
+        return datetime(year, month, int(g.get('d') or 1), int(g.get('H') or 0),
+                        int(g.get('M') or 0), int(g.get('S') or 0))
+
+    def tryFormat(self, index, text):
+        """--------------------------------------------------------------------------
+        Method to parse a string with one of the formats
+
+        Args:
+            index (int):   index of the format
+            text (string): date string
+
+        Return:
+            (datetime) date, None if the string doesn't match the format
+        """
+        regex = self.regexes[index]
+        if regex is None:
+            try:
+                return datetime.strptime(text, self.formats[index])
+            except ValueError:
+                return None
+        match = regex.match(text)
+        # like strptime() the whole string must be consumed by the first match
+        if match is None or match.end() != len(text):
+            return None
+        try:
+            return self.build(match)
+        except ValueError:
+            return None
+
+    def parse(self, text, source=None, default=None):
+        """--------------------------------------------------------------------------
+        Method to convert a string into a datetime with the first format
+        that matches it. The last successful format of the source is tried
+        first when no earlier format can match the string.
+
+        Args:
+            text (string):  date string
+            source:         key of the source of the string (optional)
+            default:        value returned if no format matches
+
+        Return:
+            (datetime) date, default if the conversion failed
+        """
+        if not isinstance(text, str):
+            return default
+        last = self.lastFormat.get(source)
+        if last is not None:
+            value = self.tryFormat(last, text)
+            if value is not None:
+                return value
+        for index in range(len(self.formats)):
+            if index != last:
+                value = self.tryFormat(index, text)
+                if value is not None:
+                    if self.exclusive[index]:
+                        self.lastFormat[source] = index
+                    return value
+        return default
+
+    def parseArray(self, texts, source=None):
+        """--------------------------------------------------------------------------
+        Method to convert a sequence of strings into a datetime64 array.
+        Arrays of 'YYYY-mm-ddTHH:MM:SS[Z]' strings are converted by numpy in
+        bulk when the parser has one of these ISO formats, all other strings
+        are converted one by one with parse().
+
+        Args:
+            texts (list): date strings (None for missing dates)
+            source:       key of the source of the strings (optional)
+
+        Return:
+            (np.array) datetime64[s] values, NaT where the conversion failed
+        """
+        texts = list(texts)
+        if self.isoBulk and len(texts):
+            values = self.parseISOArray(texts)
+            if values is not None:
+                return values
+        nat = np.datetime64('NaT')
+        values = [self.parse(text, source) for text in texts]
+        return np.array([nat if v is None else np.datetime64(v, 's') for v in values],
+                        dtype='datetime64[s]')
+
+    @staticmethod
+    def parseISOArray(texts):
+        """--------------------------------------------------------------------------
+        Method to convert 'YYYY-mm-ddTHH:MM:SS[Z]' strings with numpy
+
+        Args:
+            texts (list): date strings
+
+        Return:
+            (np.array) datetime64[s] values, None if not all strings have
+                       exactly that layout
+        """
+        try:
+            raw = np.array(texts, dtype='S20')
+        except (TypeError, UnicodeEncodeError):
+            return None
+        chars = raw.view(np.uint8).reshape(len(raw), 20)
+        if not (np.all(chars[:, 4] == 45) and np.all(chars[:, 7] == 45) and
+                np.all(chars[:, 10] == 84) and np.all(chars[:, 13] == 58) and
+                np.all(chars[:, 16] == 58) and
+                np.all((chars[:, 19] == 90) | (chars[:, 19] == 0))):
+            return None
+        try:
+            return raw.astype('S19').astype('datetime64[s]')
+        except ValueError:
+            return None
+
+
+RouteSummary = namedtuple('RouteSummary', ['index', 'name', 'points', 'metrics', 'error'])
+RouteSummary.__doc__ = """ result of one route of a multi-route GPX file, see
+    NavTools.iterRouteMetrics() (metrics None and an error message if it failed) """
+
+
+TripCheck = namedtuple('TripCheck', ['id', 'destination', 'file', 'miles', 'distance', 'error'])
+TripCheck.__doc__ = """ result of the verification of one trip of the toern directory,
+    see NavTools.iterToerndirectoryDistances() """
+
+RouteLeg = namedtuple('RouteLeg', ['name', 'lat', 'lon', 'distance', 'time', 'speed', 'etmal'])
+RouteLeg.__doc__ = """ one listed waypoint of a RouteMetrics with the distance (nm), time (hrs),
+    speed (kts) and Etmal (nm/24hrs) of the leg ending at this waypoint """
+
+
+class RouteMetrics:
+    """--------------------------------------------------------------------------
+    Result of NavTools.routeMetrics() and ComputeRouteDistances(): the listed
+    route waypoints as RouteLeg records and the route totals as exact floats.
+    The tabulated report is only rendered (and then kept) when str() is
+    called, so library wide audits don't format tables nobody reads.
+
+    Args:
+        legs (list):           RouteLeg records of the listed waypoints
+        totalDistance (float): total trip distance in nm
+        timedDistance (float): distance of all timed legs in nm
+        timedTime (float):     time of all timed legs in hrs
+        noSpeed (bool):        report without the time, speed and Etmal columns
+    """
+    __slots__ = ('legs', 'totalDistance', 'timedDistance', 'timedTime',
+                 'noSpeed', '_text')
+
+    def __init__(self, legs, totalDistance, timedDistance, timedTime, noSpeed=False):
+        self.legs = legs
+        self.totalDistance = totalDistance
+        self.timedDistance = timedDistance
+        self.timedTime = timedTime
+        self.noSpeed = noSpeed
+        self._text = None
+
+    @property
+    def averageSpeed(self):
+        """ average speed of the timed legs in kts, None if no leg was timed """
+        if self.timedTime > 0.0:
+            return self.timedDistance / self.timedTime
+        return None
+
+    def __len__(self):
+        return len(self.legs)
+
+    def __repr__(self):
+        return (f"RouteMetrics({len(self.legs)} legs, {self.totalDistance:.2f}nm, "
+                f"average speed {self.averageSpeed})")
+
+    def __str__(self):
+        if self._text is None:
+            self._text = self.render()
+        return self._text
+
+    def toJSON(self):
+        """--------------------------------------------------------------------------
+        Method to serialize the route metrics (without the report text)
+
+        Return:
+            (string) JSON code
+        """
+        return json.dumps({'legs': [list(leg) for leg in self.legs],
+                           'totalDistance': self.totalDistance,
+                           'timedDistance': self.timedDistance,
+                           'timedTime': self.timedTime})
+
+    @classmethod
+    def fromJSON(cls, text, noSpeed=False):
+        """--------------------------------------------------------------------------
+        Method to rebuild route metrics serialized with toJSON()
+
+        Args:
+            text (string):  JSON code
+            noSpeed (bool): report without the time, speed and Etmal columns
+
+        Return:
+            (RouteMetrics) the route metrics
+        """
+        data = json.loads(text)
+        return cls([RouteLeg(*leg) for leg in data['legs']], data['totalDistance'],
+                   data['timedDistance'], data['timedTime'], noSpeed)
+
+    def render(self):
+        """--------------------------------------------------------------------------
+        Method to render the tabulated report of the route
+
+        Return:
+            (string) report with one row per listed waypoint and the totals
+        """
+        from tabulate import tabulate
+        noSpeed = self.noSpeed
+        rows = []
+        for (name, lat, lon, distance, elapsed, speed, etmal) in self.legs:
+            if (lat >= 0.0):
+                lat_str = f"{lat:7.3f}N"
+            else:
+                lat_str = f"{math.fabs(lat):7.3f}S"
+
+            if (lon >= 0.0):
+                lon_str = f"{lon:7.3f}E"
+            else:
+                lon_str = f"{math.fabs(lon):7.3f}W"
+
+            if noSpeed:
+                rows.append([name, lat_str, lon_str, distance])
+            else:
+                rows.append([name, lat_str, lon_str, distance,
+                            elapsed, speed, etmal])
+
+        msg = ""
+        if noSpeed:
+            msg += (tabulate(rows, headers=["WP Name", "Lat", "Lon",
+                                            "Distance"], floatfmt=',.2f', numalign="right"))
+        else:
+            msg += (tabulate(rows, headers=["WP Name", "Lat", "Lon", "Distance",
+                                            "Time", "Speed", "Etmal"], floatfmt=',.2f', numalign="right"))
+
+        msg += (f"\n\nTotal Trip Distance: {self.totalDistance:9,.2f}nm")
+        if (not noSpeed):
+            msg += (f"\nTimed Legs Distance: {self.timedDistance:9,.2f}nm")
+            if (self.totalDistance > 0.0):
+                msg += (f"   ({self.timedDistance/self.totalDistance:.2%})")
+        if (self.timedTime > 0.0 and not noSpeed):
+            msg += (f"\nAverage Speed:          {self.averageSpeed:9,.2f}kts")
         return msg
 
+
+def _tripDistance(filename, navtools=None):
+    """--------------------------------------------------------------------------
+    Process pool worker of NavTools.iterToerndirectoryDistances(): computes
+    the route metrics of one trip GPX file. The workers don't open the
+    metrics cache, the calling process stores the returned metrics.
+
+    Args:
+        filename (string): path to the GPX file
+        navtools (NavTools): instance used for the route calculations
+
+    Return:
+        (tuple) RouteMetrics (None on errors) and error message (or None)
+    """
+    if not os.path.isfile(filename):
+        return (None, f"Error opening file: '{filename}'")
+    try:
+        if navtools is None:
+            navtools = NavTools()
+        return (navtools.routeMetrics(filename), None)
+    except Exception as e:
+        return (None, f"error finding distance with '{str(e)}'")
+
+
+def _gpxRouteMetrics(job, navtools=None):
+    """--------------------------------------------------------------------------
+    Process pool worker of NavTools.iterRouteMetrics(): computes the metrics
+    of one route of a multi-route GPX file
+
+    Args:
+        job (tuple): GPXRouteIndex.job() of the route and the noSpeed flag
+        navtools (NavTools): instance used for the route calculations
+
+    Return:
+        (tuple) RouteMetrics (None on errors) and error message (or None)
+    """
+    from RouteCache import GPXRouteIndex
+    (route, noSpeed) = job
+    try:
+        if navtools is None:
+            navtools = NavTools()
+        return (navtools.routeMetrics(GPXRouteIndex.readXML(route), noSpeed), None)
+    except Exception as e:
+        return (None, f"error computing the route metrics with '{str(e)}'")
+
+
+def _convertFleetBoat(job):
+    """--------------------------------------------------------------------------
+    Process pool worker of NavTools.parseKMLFleet(): converts the track of
+    one boat into its GPX route file and computes the route metrics
+
+    Args:
+        job (tuple): boat name, (times, lats, lons) track, GPX file name and
+                     the kmlTrackToGPX() arguments
+
+    Return:
+        (tuple) boat name, GPX file name, number of waypoints and the
+                RouteMetrics (None for an empty track)
+    """
+    (boatname, (times, lats, lons), fileGPX, args) = job
+    if len(lats) == 0 or len(lats) != len(times):
+        return (boatname, fileGPX, 0, None)
+
+    # forked workers inherit the random state of the parent, reseed it
+    # to keep the OpenCPN guids unique across the boats
+    random.seed()
+    navtools = NavTools()
+    with open(fileGPX, "w") as outputfile:
+        route = navtools.kmlTrackToGPX(outputfile, boatname, times, lats, lons, *args)
+    return (boatname, fileGPX, len(route), navtools.routeMetrics(route))
+
+
+class _Utf8Reader:
+    """--------------------------------------------------------------------------
+    Wraps a text file object so that lxml can read it as a binary stream
+    """
+    def __init__(self, stream):
+        self.stream = stream
+
+    def read(self, size=-1):
+        return self.stream.read(size).encode('utf-8')
+
+
 if __name__ == "__main__":
     """-------------------------------------------------------------------------
         Script starting point
@@ -44,12 +44,9 @@ try:
     import wx
     import wx.adv
     import os
-    from bs4 import BeautifulSoup
-    from tabulate import tabulate
     from datetime import datetime
     from uploadSQLquery import uploadSQLiteFile
-    from NavToolsLib import NavTools
-    from WeatherRoutingAnalysis import create_Expedition_Routing_Report
+    from NavToolsLib import NavTools, Route, RouteMetricsCache, GPXWriter
 except ImportError as e:
     print(f"Import error: {str(e)}\nAborting the program {__app__}")
     sys.exit()
@@ -69,6 +66,8 @@ class NavigationTools(wx.Frame):
         self.cwd = settings["cwd"]
         self.fileName = settings["lastFile"]
         self.fileType = settings["fileType"]
+        self.route = None           # parsed Route of the current gpx file
+        self.routeKey = None        # (path, mtime) of the parsed Route
         # to be replace
         # end of ToDo
         self.path = {}
@@ -343,6 +342,8 @@ class NavigationTools(wx.Frame):
         """ Prepare a pdf report from the Expedition Weather Routing Analysis"""
         try:
             fname = self.fileName + self.extension["csv"]
+            # matplotlib and pypdf are only loaded when a report is requested
+            from WeatherRoutingAnalysis import create_Expedition_Routing_Report
             report = create_Expedition_Routing_Report(self.path[".csv"], fname, pages=1)
             if report:
                 msg = f"==> Created weather routing report '{report}'"
@@ -360,23 +361,37 @@ class NavigationTools(wx.Frame):
     def onComputeRouteDistances(self, event):
         """ compute distances, speed, and Etmals between Waypoints """
 
+        file = os.path.join(
+            self.path[".gpx"], self.fileName + self.extension["gpx"])
         try:
-            file = os.path.join(
-                self.path[".gpx"], self.fileName + self.extension["gpx"])
-            inputfile = open(file, "r")
-            xml = inputfile.read()
-            inputfile.close()
+            # persistent route metrics cache in the sqlite DB
+            with RouteMetricsCache(self.settings['sqliteDB'], self.navTools) as cache:
+                msg = self.navTools.ComputeRouteDistances(
+                    file, verbose=False, skipWP=True, noSpeed=False, cache=cache)
         except:
             print(f"Error opening file: '{file}'")
+            return
 
-        msg = self.navTools.ComputeRouteDistances(
-            xml, verbose=False, skipWP=True, noSpeed=False)
         # wx.MessageBox(msg, "Route Analysis Results", wx.OK | wx.ICON_NONE)
-        msg = "==> Evaluated route %s\n\n" % self.fileName + msg
+        msg = "==> Evaluated route %s\n\n" % self.fileName + str(msg)
         self.log = msg + "\n\n" + self.log
         self.rightPanel.SetValue(self.log + "\n\n")
         return
 
+    # --------------------------------------------------------------------------
+    # Return the parsed Route of the current gpx file. The file is only parsed
+    # again when it has been changed since the last call
+    # --------------------------------------------------------------------------
+    def getRoute(self):
+        """ return the parsed Route of the current gpx file """
+        file = os.path.join(
+            self.path[".gpx"], self.fileName + self.extension["gpx"])
+        key = (file, os.path.getmtime(file))
+        if self.route is None or self.routeKey != key:
+            self.route = Route.fromFile(file, self.navTools)
+            self.routeKey = key
+        return self.route
+
     # --------------------------------------------------------------------------
     # Event handler to Select an OpenCPN or MySQL route file to be parsed
     # --------------------------------------------------------------------------
@@ -433,9 +448,13 @@ class NavigationTools(wx.Frame):
     def onParseGPXtoSQLRouteFile(self, event):
         """ parse a GPX route file into a MySQL route file """
 
+        try:
+            route = self.getRoute()
+        except:
+            route = None
         self.log = (
             self.navTools.parseSQLRouteFile(self.path[".gpx"], self.path[".sql"],
-                                            self.fileName) + self.log
+                                            self.fileName, route) + self.log
         )
         self.rightPanel.SetValue(self.log + "\n\n")
 
@@ -446,17 +465,6 @@ class NavigationTools(wx.Frame):
     def onParseSQLtoGPXRouteFile(self, event):
         """ parse a MySQL route file into a GPX route file """
 
-        gpx_header = """<?xml version="1.0" encoding="utf-8" ?>
-		<gpx version="1.1" creator="OpenCPN" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns="http://www.topografix.com/GPX/1/1" xmlns:gpxx="http://www.garmin.com/xmlschemas/GpxExtensions/v3" xsi:schemaLocation="http://www.topografix.com/GPX/1/1 http://www.topografix.com/GPX/1/1/gpx.xsd" xmlns:opencpn="http://www.opencpn.org">
-		<rte>
-		<name>Route Name</name>
-		<extensions>
-			<opencpn:start></opencpn:start>
-			<opencpn:end></opencpn:end>
-			<opencpn:viz>1</opencpn:viz>
-			<opencpn:guid>17ab0000-eb25-48bc-930a-000000000000</opencpn:guid>
-		</extensions>\n"""
-
         today = datetime.now()
         log_msg = ""
 
@@ -498,38 +506,26 @@ class NavigationTools(wx.Frame):
         OutputFile = open(os.path.join(
             self.settings['sqlitePath'], filename), "w")
 
-        output = gpx_header.replace("Route Name", self.fileName)
+        gpx = GPXWriter(OutputFile, self.fileName)
 
         wp_ctr = 1
         for wp in wps:
             wp_data = wp.split(", ")
             # print (len(wp_data), wp)
-            if len(wp_data) > 2:
-                lat = wp_data[2].replace("'", "")
-                lon = wp_data[3].replace("'", "")
+            if len(wp_data) > 3:
+                lat = float(wp_data[2].replace("'", ""))
+                lon = float(wp_data[3].replace("'", ""))
                 name = wp_data[1].replace("'", "")
-                output += '<rtept lat="' + lat + '" lon="' + lon + '">\n'
-                output += "<time></time>\n"
-                output += "<name>" + name + "</name>\n"
                 if wp_data[1].startswith("WP0"):
-                    output += "<sym>empty</sym>\n"
-                elif len(wp_data) > 3:
-                    output += "<sym>" + \
-                        wp_data[4].replace("'", "") + "</sym>\n"
+                    sym = "empty"
+                elif len(wp_data) > 4:
+                    sym = wp_data[4].replace("'", "")
                 else:
-                    output += "<sym>empty</sym>\n"
-
-                output += "<type>WPT</type>\n"
-                output += (
-                    "<extensions><opencpn:guid>717ab0000-eb25-48bc-930a-%012d" % wp_ctr
-                )
-                output += "</opencpn:guid>\n<opencpn:viz>0</opencpn:viz>\n<opencpn:viz_name>0</opencpn:viz_name>\n</extensions>\n</rtept>\n"
+                    sym = "empty"
+                gpx.waypoint(lat, lon, name=name, sym=sym)
                 wp_ctr += 1
 
-        output += "</rte>\n</gpx>\n"
-        # print(output)
-
-        OutputFile.write(output)
+        gpx.close()
         OutputFile.close()
 
         msg = (
@@ -558,7 +554,8 @@ class NavigationTools(wx.Frame):
         today = datetime.now()
 
         boatname = "Andreas"
-        dlg = wx.TextEntryDialog(self, "Please enter boat name", "Boat name")
+        dlg = wx.TextEntryDialog(
+            self, "Please enter boat name ('all' to convert the whole fleet)", "Boat name")
         dlg.SetValue(boatname)
         if dlg.ShowModal() == wx.ID_OK:
             boatname = dlg.GetValue()
@@ -598,16 +595,28 @@ class NavigationTools(wx.Frame):
         dlg = MyWaitDialog(self, "Crunching data, please wait...", self.cwd)
         dlg.Show()
 
-        msg += self.navTools.parseKMLRouteFile(
-            self.path[".kml"],
-            self.path[".gpx"],
-            self.fileName, 
-            boatname,
-            self.settings['TimeZoneDifference'],
-            raceStart,
-            watchStart,
-            watchRhythm,
-            self.settings['minCourseChange'])
+        if boatname.strip().lower() in ("all", "*"):
+            # one GPX file per boat plus the fleet comparison table
+            msg += self.navTools.parseKMLFleet(
+                self.path[".kml"],
+                self.path[".gpx"],
+                self.fileName,
+                self.settings['TimeZoneDifference'],
+                raceStart,
+                watchStart,
+                watchRhythm,
+                self.settings['minCourseChange'])
+        else:
+            msg += self.navTools.parseKMLRouteFile(
+                self.path[".kml"],
+                self.path[".gpx"],
+                self.fileName, 
+                boatname,
+                self.settings['TimeZoneDifference'],
+                raceStart,
+                watchStart,
+                watchRhythm,
+                self.settings['minCourseChange'])
 
         dlg.Destroy()
 
@@ -624,17 +633,6 @@ class NavigationTools(wx.Frame):
     def onParseExpeditionRouteFile(self, event):
         """ parse an Expedition route file into a GPX route file """
 
-        gpx_header = """<?xml version="1.0" encoding="utf-8" ?>
-		<gpx version="1.1" creator="OpenCPN" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns="http://www.topografix.com/GPX/1/1" xmlns:gpxx="http://www.garmin.com/xmlschemas/GpxExtensions/v3" xsi:schemaLocation="http://www.topografix.com/GPX/1/1 http://www.topografix.com/GPX/1/1/gpx.xsd" xmlns:opencpn="http://www.opencpn.org">
-		<rte>
-		<name>Route Name</name>
-		<extensions>
-			<opencpn:start></opencpn:start>
-			<opencpn:end></opencpn:end>
-			<opencpn:viz>1</opencpn:viz>
-			<opencpn:guid>17ab0000-eb25-48bc-930a-000000000000</opencpn:guid>
-		</extensions>\n"""
-
         today = datetime.now()
         log_msg = ""
 
@@ -649,6 +647,7 @@ class NavigationTools(wx.Frame):
                 f"Error opening file: {os.path.join(self.path['.gpx'], filename)}")
             return
 
+        from bs4 import BeautifulSoup
         wps = ""
         soup = BeautifulSoup(xml, "xml")
         #wps = soup.find_all("trkpt")
@@ -677,7 +676,7 @@ class NavigationTools(wx.Frame):
         # print(os.path.join(self.path["gpxPath"], filename))
         OutputFile = open(os.path.join(self.path[".gpx"], filename), "w")
 
-        output = gpx_header.replace("Route Name", fname)
+        gpx = GPXWriter(OutputFile, fname)
 
         wp_ctr = 1
         for wp in wps:
@@ -687,26 +686,15 @@ class NavigationTools(wx.Frame):
             # print ("lon: %s" %wp['lon'])
             # print ("time: %s" %wp_time[0])
 
-            new_wp = f"<rtept lat='{wp['lat']}' lon='{wp['lon']}'>\n"
             if isinstance(wp_time, list) and len(wp_time) > 0:
-                new_wp += f"{wp_time[0]}\n"
+                time = wp_time[0].get_text().strip()
             else:
-                new_wp += f"<time>2022-01-01T00:00:00Z</time>\n"
-            new_wp += f"<name>ExpWP{str(wp_ctr).zfill(4)}</name>\n"
-            new_wp += f"<sym>empty</sym>\n"
-            new_wp += f"<type>WPT</type>\n<extensions>"
-            new_wp += f"<opencpn:guid>717ab0000-eb25-48bc-930a-{wp_ctr:012d}"
-            new_wp += f"</opencpn:guid>\n<opencpn:viz>0</opencpn:viz>\n<opencpn:viz_name>0</opencpn:viz_name>\n</extensions>\n</rtept>\n"
-
-            output += new_wp
-            # print("WP %i\n%s" %(wp_ctr,new_wp))
-
+                time = "2022-01-01T00:00:00Z"
+            gpx.waypoint(float(wp['lat']), float(wp['lon']), time,
+                         f"ExpWP{str(wp_ctr).zfill(4)}")
             wp_ctr += 1
 
-        output += "</rte>\n</gpx>\n"
-        # print(output)
-
-        OutputFile.write(output)
+        gpx.close()
         OutputFile.close()
 
         msg = (
@@ -745,6 +733,8 @@ class NavigationTools(wx.Frame):
             print(
                 f"Error opening file: {os.path.join(self.path['.gpx'], filename)}")
 
+        from bs4 import BeautifulSoup
+        from tabulate import tabulate
         soup = BeautifulSoup(xml, "xml")
         wps = soup.find_all("trkpt")
 
@@ -13,7 +13,11 @@ __doc__ = """
    Program parameters:
      'file=yyyyyy':  name of the gpx file to analyze.  If the path/file name
                      contains a space, substitute a "|", eg: 'D:/My|Documents'.
-     'route=xxxxxx': name of the route within the gpx file
+     'route=xxxxxx': name of the route within the gpx file, 'all' (or '*') to
+                     analyze all routes of the file concurrently and list a
+                     summary per route. Without a route name all waypoints
+                     of the file are analyzed as one route.
+     'workers=n':    number of worker processes for 'route=all'
      'verbose':      run the program in verbose mode (full output)
      'quiet':        run the program in quiet mode
      'noSpeed':      True/False - don't/do compute speed and time between waypoints
@@ -34,27 +38,68 @@ __doc__ = """
 -------------------------------------------------------------------------------
 """
 navtools = None
+cache = None
 
 try:
     import sys
     import os
     import argparse
     from NavToolsLib import NavTools
+    from RouteCache import RouteMetricsCache, GPXRouteIndex
 
 except ImportError as e:
     print(f"Import error: {str(e)}\nAborting the program {__version__}")
     sys.exit()
 
 
-def processRoute(name, route, verbose, skipWPsFlag, noSpeed):
+def printTitle(name):
     tmp = " Route '" + name + "' Summary "
     print(f"\n\t{tmp}")
     print(f"\t" + "=" * len(tmp) + "\n")
-    msg = navtools.ComputeRouteDistances(route.encode("latin-1"),
-                                         verbose, skipWPsFlag, noSpeed)
+
+
+def processRoute(name, gpxFile, verbose, skipWPsFlag, noSpeed, index=None):
+    if index is None:
+        # all waypoints of the file as one route
+        printTitle(name)
+        msg = navtools.ComputeRouteDistances(gpxFile, verbose, skipWPsFlag, noSpeed, cache)
+        print(msg)
+        return
+    try:
+        entry = index.find(name)
+    except KeyError:
+        print(f"\nThe Route '{name}' is not found in '{gpxFile}', the file has the routes:")
+        for routeName in index.names():
+            print(f"\t'{routeName}'")
+        return
+    printTitle(entry.name)
+    msg = navtools.ComputeRouteDistances(index.xml(entry.index), verbose, skipWPsFlag, noSpeed)
     print(msg)
 
 
+def processAllRoutes(gpxFile, verbose, noSpeed, index, workers=None):
+    table = []
+    for result in navtools.iterRouteMetrics(index, noSpeed=noSpeed, workers=workers):
+        if result.error is not None:
+            print(f"\nRoute '{result.name}': {result.error}")
+            continue
+        metrics = result.metrics
+        if verbose:
+            printTitle(result.name)
+            print(metrics)
+        best = max((leg.etmal for leg in metrics.legs), default=0.0)
+        table.append([result.index+1, result.name, result.points, metrics.totalDistance,
+                      metrics.timedDistance, metrics.timedTime, metrics.averageSpeed, best])
+
+    from tabulate import tabulate
+    tmp = f" {len(table)} Routes of '{os.path.basename(gpxFile)}' "
+    print(f"\n\t{tmp}")
+    print("\t" + "=" * len(tmp) + "\n")
+    print(tabulate(table, headers=["#", "Route", "WPs", "Distance\n[nm]", "Timed\n[nm]",
+                                   "Timed\n[h]", "Speed\n[kts]", "Best Etmal\n[nm]"],
+                   floatfmt=",.2f"))
+
+
 """
 |------------------------------------------------------------------------------------------
 | program launch point
@@ -73,6 +118,8 @@ if __name__ == "__main__":
     fileName = ""
     noSpeed = False
     noSpeedTxt = ""
+    gpxPath = ""
+    lastFile = ""
 
     parser = argparse.ArgumentParser()
     parser.add_argument("-v", "--verbose", help="run in verbose mode",
@@ -83,8 +130,10 @@ if __name__ == "__main__":
                         default=False, action="store_true")
     parser.add_argument("-file", help="route file name",
                         type=str, default="")
-    parser.add_argument("-route", help="route name",
+    parser.add_argument("-route", help="route name, 'all' for all routes of the file",
                         type=str, default="")
+    parser.add_argument("-workers", help="number of worker processes for '-route all'",
+                        type=int, default=None)
 
     args = parser.parse_args()
 
@@ -95,7 +144,7 @@ if __name__ == "__main__":
         #    OpenCPN_Route_Analyzer.py
         #    Navigation_Route_Analyzer.pyw
         # returns a dictionary with these keys:
-        # {cwd, gpxPath, sqlPath, lastGPX, lastRoute, skipWP, noSpeed, verbose, error}
+        # {cwd, gpxPath, sqlitePath, sqliteDB, lastFile, skipWP, noSpeed, verbose, error}
         # =======================================================================
         navtools = NavTools()
         settings = navtools.getConfig(verbose=False)
@@ -103,7 +152,8 @@ if __name__ == "__main__":
             cwd = settings['cwd']
             gpxPath = settings['gpxPath']
             sqlPath = settings['sqlitePath']
-            lastRoute = settings['lastRoute']
+            cache = RouteMetricsCache(settings['sqliteDB'], navtools)
+            lastFile = settings['lastFile']
             skipWPTxt = settings['skipWP']
             noSpeedTxt = settings['noSpeed']
             verboseTxt = settings['verbose']
@@ -112,7 +162,6 @@ if __name__ == "__main__":
                 f"Error reading from configuration file ('{settings['error']}')")
 
     except Exception as e:
-        lastRoute = "None"
         verboseTxt = ""
         skipWPTxt = ""
         noSpeedTxt = ""
@@ -134,31 +183,38 @@ if __name__ == "__main__":
         skipWPsFlag = args.skipWP
     else:
         skipWPsFlag = (skipWPTxt == "True")
-    if args.route != "":
-        routeName = args.route
-    else:
-        routeName = lastRoute
+    routeName = args.route
     if args.file != "":
-        openCPNroutes = args.file
+        openCPNroutes = args.file.replace("|", " ")
     else:
-        openCPNroutes = fileName
-
-    print(f"OpenCPN routes.: '{gpxPath}'")
-    print(f"Route..........: '{lastRoute}'")
+        openCPNroutes = lastFile
+    path = openCPNroutes
+    if not os.path.isfile(path):
+        if os.path.splitext(path)[1].lower() != ".gpx":
+            path += ".gpx"
+        path = os.path.join(gpxPath, path)
+
+    print(f"OpenCPN routes.: '{path}'")
+    print(f"Route..........: '{routeName if routeName else 'all waypoints of the file'}'")
     print(f"skip WPs.......: {skipWPsFlag}")
     print(f"compute speed..: {(not noSpeed)}")
     print(f"verbose........: {(verbose)}")
 
-    try:
-        path = os.path.join(gpxPath, lastRoute+".gpx")
-        inputfile = open(path, "r")
-        route = inputfile.read()
-        inputfile.close()
-    except:
+    if os.path.isfile(path):
+        if routeName == "":
+            processRoute(os.path.splitext(os.path.basename(path))[0],
+                         path, verbose, skipWPsFlag, noSpeed)
+        else:
+            # locate the <rte> elements without parsing the waypoints
+            index = GPXRouteIndex(path)
+            if routeName.lower() in ("all", "*"):
+                processAllRoutes(path, verbose, noSpeed, index, args.workers)
+            else:
+                processRoute(routeName, path, verbose, skipWPsFlag, noSpeed, index)
+    else:
         print(
-            f"\nThe Route '{routeName}.gpx' is not found in the archived OpenCPN routes files.")
-
-    processRoute(
-        routeName, route, verbose, skipWPsFlag, noSpeed)
+            f"\nThe file '{path}' is not found in the archived OpenCPN routes files.")
+    if cache is not None:
+        cache.close()
 
     print("\nProgram is done.")
@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+# ---------------------------------------------------------------------------
+__author__ = "Volker Petersen <volker.petersen01@gmail.com>"
+__app__ = "RouteCache.py"
+__version__ = "version 1.0.0, Python >3.7"
+__date__ = "Date: 2024/08/01"
+__copyright__ = "Copyright (c) 2024 Volker Petersen"
+__license__ = "GNU General Public License, published by the Free Software Foundation"
+__doc__ = """
+-----------------------------------------------------------------------------
+ Route file index and metrics cache of the route analyzers:
+ 'GPXRouteIndex' finds the <rte> elements of a multi-route GPX file without
+ parsing their waypoints, 'RouteMetricsCache' keeps the RouteMetrics of GPX
+ files in the sqlite DB. Both are also available from NavToolsLib.
+
+    index = GPXRouteIndex("routes.gpx")
+    with RouteMetricsCache(sqliteDB) as cache:
+        metrics = cache.metrics(path)
+-----------------------------------------------------------------------------
+"""
+
+try:
+    import sys
+    import os
+    import json
+    import hashlib
+    import re
+    import html
+    import mmap
+    import sqlite3
+    from collections import namedtuple
+    from NavToolsLib import NavTools, Route, RouteMetrics
+
+except ImportError as e:
+    print(
+        f"Import error: {str(e)} \nAborting the program {__app__} {__version__}")
+    sys.exit()
+
+
+GPXRouteEntry = namedtuple('GPXRouteEntry', ['index', 'name', 'start', 'end', 'points'])
+GPXRouteEntry.__doc__ = """ one <rte> element of a GPXRouteIndex: position and name of the route,
+    byte offsets of the element in the file and the number of <rtept> """
+
+
+
+class RouteMetricsCache:
+    """--------------------------------------------------------------------------
+    Persistent cache of the RouteMetrics of GPX files, kept in the table
+    'RouteMetricsCache' of a sqlite DB (e.g. the toerns DB 'sqliteDB').
+    Entries are keyed by the absolute file path and validated with the file
+    size and modification time. If those changed, the file content is hashed
+    and only a changed content (sha1) is parsed again. The version of an
+    entry includes a hash of the NavTools settings the metrics depend on
+    (genericWPs, WPtypes, ...), entries of other settings are parsed again.
+    A DB that can't be opened disables the cache, the metrics are then
+    always computed.
+
+    Args:
+        sqliteDB (string):   path to the sqlite DB file
+        navtools (NavTools): instance used for the route calculations
+    """
+    TABLE = "RouteMetricsCache"
+    VERSION = 1     # bump when the RouteMetrics computation changes
+
+    def __init__(self, sqliteDB, navtools=None):
+        self.navtools = NavTools() if navtools is None else navtools
+        self.hits = 0
+        self.misses = 0
+        self.error = None
+        try:
+            self.con = sqlite3.connect(sqliteDB, timeout=30)
+            self.con.execute(f"""CREATE TABLE IF NOT EXISTS "{self.TABLE}" (
+                "path" TEXT,
+                "size" INTEGER,
+                "mtime" INTEGER,
+                "sha1" TEXT,
+                "version" TEXT,
+                "metrics" TEXT,
+                PRIMARY KEY ("path")
+                )""")
+            self.con.commit()
+        except sqlite3.Error as e:
+            self.con = None
+            self.error = str(e)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
+
+    def version(self):
+        """--------------------------------------------------------------------------
+        Method to return the version of the cache entries: VERSION and a hash
+        of the NavTools settings used by routeMetrics()
+
+        Return:
+            (string) version, e.g. '1-3f2a...'
+        """
+        navtools = self.navtools
+        settings = json.dumps([navtools.RADIUS, navtools.genericWPs, navtools.WPtypes,
+                               navtools.descDateFormats])
+        return f"{self.VERSION}-{hashlib.sha1(settings.encode('utf-8')).hexdigest()[:16]}"
+
+    def close(self):
+        """--------------------------------------------------------------------------
+        Method to close the sqlite DB connection
+        """
+        if self.con is not None:
+            self.con.close()
+            self.con = None
+
+    def metrics(self, path, noSpeed=False):
+        """--------------------------------------------------------------------------
+        Method to return the RouteMetrics of a GPX file, from the cache if
+        the file hasn't changed since it was cached
+
+        Args:
+            path (string):  path (including filename) of the GPX file
+            noSpeed (bool): report without the time, speed and Etmal columns
+
+        Return:
+            (RouteMetrics) the route metrics
+        """
+        (metrics, entry) = self.lookup(path, noSpeed)
+        if metrics is None:
+            metrics = self.navtools.routeMetrics(path, noSpeed)
+            self.store(entry, metrics)
+        return metrics
+
+    def lookup(self, path, noSpeed=False):
+        """--------------------------------------------------------------------------
+        Method to return the cached RouteMetrics of a GPX file without
+        computing the metrics of a new or changed file
+
+        Args:
+            path (string):  path (including filename) of the GPX file
+            noSpeed (bool): report without the time, speed and Etmal columns
+
+        Return:
+            (tuple) RouteMetrics (None if the file has to be parsed) and the
+                    cache entry of the file for store() (None on hits)
+        """
+        if self.con is None:
+            self.misses += 1
+            return (None, None)
+
+        path = os.path.abspath(os.fspath(path))
+        stat = os.stat(path)
+        version = self.version()
+        row = self.con.execute(
+            f'SELECT size, mtime, sha1, version, metrics FROM "{self.TABLE}" WHERE path=?',
+            (path,)).fetchone()
+        if row is not None and row[3] != version:
+            row = None
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            self.hits += 1
+            return (RouteMetrics.fromJSON(row[4], noSpeed), None)
+
+        with open(path, "rb") as fr:
+            sha1 = hashlib.sha1(fr.read()).hexdigest()
+        entry = (path, stat.st_size, stat.st_mtime_ns, sha1, version)
+        if row is not None and row[2] == sha1:
+            # same content, e.g. a copied or touched file
+            self.hits += 1
+            metrics = RouteMetrics.fromJSON(row[4], noSpeed)
+            self.store(entry, metrics)
+            return (metrics, None)
+        self.misses += 1
+        return (None, entry)
+
+    def store(self, entry, metrics):
+        """--------------------------------------------------------------------------
+        Method to cache the RouteMetrics of a GPX file
+
+        Args:
+            entry (tuple):          cache entry of the file returned by lookup()
+            metrics (RouteMetrics): the route metrics of the file
+        """
+        if self.con is None or entry is None:
+            return
+        self.con.execute(
+            f'INSERT OR REPLACE INTO "{self.TABLE}" (path, size, mtime, sha1, version, metrics)'
+            ' VALUES (?, ?, ?, ?, ?, ?)',
+            (*entry, metrics.toJSON()))
+        self.con.commit()
+
+
+class GPXRouteIndex:
+    """--------------------------------------------------------------------------
+    Index of the <rte> elements of a GPX file, e.g. an OpenCPN export with
+    dozens of routes. The file is scanned once for the byte offsets and the
+    names of the routes without parsing any waypoint. A single route is
+    then parsed from a small xml document made of the <gpx> start tag, the
+    bytes of its <rte> element and the </gpx> end tag.
+
+    Args:
+        source: file path or xml code (string or bytes) of the GPX file
+    """
+    GPX = re.compile(rb"<((?:[\w.-]+:)?)gpx\b[^>]*>")
+
+    def __init__(self, source):
+        self.path = None
+        self.data = None
+        if NavTools.isFilePath(source):
+            self.path = os.fspath(source)
+            with open(self.path, "rb") as fr:
+                if os.fstat(fr.fileno()).st_size == 0:
+                    self.scan(b"")
+                else:
+                    with mmap.mmap(fr.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        self.scan(data)
+        else:
+            self.data = source.encode("utf-8") if isinstance(source, str) else bytes(source)
+            self.scan(self.data)
+
+    def __len__(self):
+        return len(self.routes)
+
+    def __iter__(self):
+        return iter(self.routes)
+
+    def scan(self, data):
+        """--------------------------------------------------------------------------
+        Method to find the <gpx> start tag and the byte offsets, names and
+        number of waypoints of all <rte> elements
+
+        Args:
+            data (bytes or mmap): content of the GPX file
+        """
+        match = self.GPX.search(data)
+        if match is None:
+            raise ValueError("no <gpx> element found")
+        self.header = bytes(data[:match.end()])
+        # the elements use the namespace prefix of <gpx>, matching it as a
+        # literal lets the regex engine skip quickly through the waypoints
+        prefix = match.group(1)
+        self.footer = b"</" + prefix + b"gpx>"
+        self.rtept = b"<" + prefix + b"rtept"
+        self.name = re.compile(b"<" + re.escape(prefix) + rb"name\b[^>]*>(.*?)</" +
+                               re.escape(prefix) + rb"name\s*>", re.S)
+        rte = re.compile(b"<(/?)" + re.escape(prefix) + rb"rte\b[^>]*?(/?)>")
+        self.routes = []
+        start = None
+        for match in rte.finditer(data, len(self.header)):
+            if match.group(1) == b"" and start is None:
+                start = match.start()
+                if match.group(2) == b"/":      # empty <rte/>
+                    self.addRoute(data, start, match.end())
+                    start = None
+            elif match.group(1) == b"/" and start is not None:
+                self.addRoute(data, start, match.end())
+                start = None
+
+    def addRoute(self, data, start, end):
+        """--------------------------------------------------------------------------
+        Method to add a <rte> element to the index, its name is the first
+        <name> tag in front of its first <rtept>
+
+        Args:
+            data (bytes or mmap): content of the GPX file
+            start (int):          byte offset of the <rte> start tag
+            end (int):            byte offset behind the </rte> end tag
+        """
+        points = data.find(self.rtept, start, end)
+        match = self.name.search(data, start, end if points < 0 else points)
+        name = ""
+        if match is not None:
+            name = match.group(1).decode("utf-8", "replace").strip()
+            if name.startswith("<![CDATA[") and name.endswith("]]>"):
+                name = name[9:-3]
+            else:
+                name = html.unescape(name)
+        count = 0 if points < 0 else data[points:end].count(self.rtept)
+        self.routes.append(GPXRouteEntry(len(self.routes), name, start, end, count))
+
+    def names(self):
+        """--------------------------------------------------------------------------
+        Method to list the route names
+
+        Return:
+            (list) names of all routes in the order of the file
+        """
+        return [entry.name for entry in self.routes]
+
+    def find(self, key):
+        """--------------------------------------------------------------------------
+        Method to look up a route by its position or name, names are
+        compared case sensitive first and then case insensitive
+
+        Args:
+            key (int or string): index or name of the route
+
+        Return:
+            (GPXRouteEntry) the route, raises KeyError if there is no such route
+        """
+        if isinstance(key, int):
+            return self.routes[key]
+        for entry in self.routes:
+            if entry.name == key:
+                return entry
+        for entry in self.routes:
+            if entry.name.casefold() == key.casefold():
+                return entry
+        raise KeyError(f"no route '{key}' in the GPX file")
+
+    def xml(self, key):
+        """--------------------------------------------------------------------------
+        Method to build the xml document of a single route
+
+        Args:
+            key (int or string): index or name of the route
+
+        Return:
+            (bytes) xml code of a GPX file with only this route
+        """
+        entry = self.find(key)
+        if self.path is None:
+            return self.header + self.data[entry.start:entry.end] + self.footer
+        return self.readXML(self.job(entry))
+
+    def job(self, entry):
+        """--------------------------------------------------------------------------
+        Method to describe a route for a worker process, file based indexes
+        pass the byte range instead of the xml code
+
+        Args:
+            entry (GPXRouteEntry): the route
+
+        Return:
+            (tuple) file path, header, footer, start and end offset, or the
+                    xml code of the route
+        """
+        if self.path is None:
+            return self.header + self.data[entry.start:entry.end] + self.footer
+        return (self.path, self.header, self.footer, entry.start, entry.end)
+
+    @staticmethod
+    def readXML(job):
+        """--------------------------------------------------------------------------
+        Method to read the xml document of a route described by job()
+
+        Args:
+            job (tuple or bytes): see job()
+
+        Return:
+            (bytes) xml code of a GPX file with only this route
+        """
+        if isinstance(job, bytes):
+            return job
+        (path, header, footer, start, end) = job
+        with open(path, "rb") as fr:
+            fr.seek(start)
+            return header + fr.read(end - start) + footer
+
+    def route(self, key, navtools=None):
+        """--------------------------------------------------------------------------
+        Method to parse a single route
+
+        Args:
+            key (int or string): index or name of the route
+            navtools (NavTools): instance used for the distance calculations
+
+        Return:
+            (Route) the parsed route
+        """
+        return Route.fromGPX(self.xml(key), navtools)
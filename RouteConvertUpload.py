@@ -34,7 +34,6 @@ try:
     import os
     from datetime import datetime, timedelta
     from shutil import copyfile
-    from bs4 import BeautifulSoup
     from NavToolsLib import NavTools
     from uploadSQLquery import uploadMySQLfile, upload_to_mysql_via_php, upload_to_mysql
 
@@ -83,6 +82,7 @@ def fixRouteDates(fileName, pathSQL, maptable, fixStartDate=True, verbose=False)
         print("Error opening file: %s" % fileName)
         return
 
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(xml)
     wps = soup.find_all('rtept')
     lastHarbor = ""
@@ -0,0 +1,636 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+# ---------------------------------------------------------------------------
+__author__ = "Volker Petersen <volker.petersen01@gmail.com>"
+__app__ = "TripAnalytics.py"
+__version__ = "version 1.0.0, Python >3.7"
+__date__ = "Date: 2024/08/01"
+__copyright__ = "Copyright (c) 2024 Volker Petersen"
+__license__ = "GNU General Public License, published by the Free Software Foundation"
+__doc__ = """
+-----------------------------------------------------------------------------
+ Trip analytics over all GPX route files of the 'gpxPath' directory.
+
+ The GPX files are indexed in a process pool into a columnar store (numpy
+ .npz files) with three tables:
+    trips:     one row per GPX file (boat, route name, start date, totals)
+    waypoints: one row per waypoint (trip, lat, lon, time, leg distance)
+    legs:      one row per leg of the route metrics (trip, lat, lon of the
+               leg end, distance, time, speed, Etmal)
+ The index is updated incrementally, only new or changed files (size,
+ modification time and sha1 of the content) are parsed again.
+
+ Aggregate queries per year, per boat and per region (a grid of lat/lon
+ cells or named lat/lon boxes) and the list of the best Etmals run on the
+ in-memory columns.
+
+    usage: python TripAnalytics.py [-p gpxPath] [-s storePath] [-b year|boat|region]
+                                   [-w workers] [-e best etmals]
+-----------------------------------------------------------------------------
+"""
+
+try:
+    import sys
+    import os
+    import json
+    import hashlib
+    import argparse
+    from datetime import datetime
+    from concurrent.futures import ProcessPoolExecutor
+    import numpy as np
+    from tabulate import tabulate
+    from NavToolsLib import NavTools, Route
+
+except ImportError as e:
+    print(
+        f"Import error: {str(e)} \nAborting the program {__app__} {__version__}")
+    sys.exit()
+
+
+class TripAnalytics:
+    """--------------------------------------------------------------------------
+    Columnar index of the GPX route files of a directory (including its
+    sub directories) and the aggregate queries on it
+
+    Args:
+        gpxPath (string):   path to the GPX route files
+        storePath (string): directory of the index (default: the folder
+                            '.tripanalytics' in gpxPath)
+        boatFrom (string):  'folder' - the boat is the name of the sub folder
+                            of gpxPath holding the file (files directly in
+                            gpxPath use the file name), 'file' - the boat is
+                            the file name (e.g. the fleet GPX files of
+                            NavTools.parseKMLFleet())
+    """
+    VERSION = 1         # bump when the stored columns change
+    MANIFEST = "manifest.json"
+    TABLES = ("trips", "waypoints", "legs")
+
+    def __init__(self, gpxPath, storePath=None, boatFrom="folder"):
+        self.gpxPath = os.path.abspath(gpxPath)
+        if storePath is None:
+            storePath = os.path.join(self.gpxPath, ".tripanalytics")
+        self.storePath = os.path.abspath(storePath)
+        self.boatFrom = boatFrom
+        self.files = {}
+        self.columns = None
+        self.loadManifest()
+
+    def loadManifest(self):
+        """--------------------------------------------------------------------------
+        Method to read the manifest of the indexed files, an index of another
+        version is dropped and rebuilt by the next update()
+        """
+        self.files = {}
+        try:
+            with open(os.path.join(self.storePath, self.MANIFEST), "r", encoding="utf-8") as fr:
+                manifest = json.load(fr)
+            if manifest.get("version") == self.VERSION and manifest.get("boatFrom") == self.boatFrom:
+                self.files = manifest["files"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def saveManifest(self):
+        """--------------------------------------------------------------------------
+        Method to write the manifest of the indexed files
+        """
+        manifest = {"version": self.VERSION, "boatFrom": self.boatFrom,
+                    "gpxPath": self.gpxPath, "files": self.files}
+        self.writeAtomic(self.MANIFEST, lambda fw: fw.write(
+            json.dumps(manifest, indent=1).encode("utf-8")))
+
+    def writeAtomic(self, name, write):
+        """--------------------------------------------------------------------------
+        Method to write a file of the store via a temporary file, so readers
+        never see a partially written file
+
+        Args:
+            name (string):   file name in the store
+            write (function): called with the binary file object to write to
+        """
+        path = os.path.join(self.storePath, name)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as fw:
+            write(fw)
+        os.replace(tmp, path)
+
+    def scan(self):
+        """--------------------------------------------------------------------------
+        Method to list the GPX files of gpxPath, the store directory is skipped
+
+        Return:
+            (dict) relative path -> os.stat_result of all GPX files
+        """
+        found = {}
+        for (root, dirs, files) in os.walk(self.gpxPath):
+            dirs[:] = sorted(d for d in dirs
+                             if os.path.join(root, d) != self.storePath and not d.startswith("."))
+            for name in files:
+                if name.lower().endswith(".gpx"):
+                    path = os.path.join(root, name)
+                    found[os.path.relpath(path, self.gpxPath)] = os.stat(path)
+        return found
+
+    def boatName(self, relPath):
+        """--------------------------------------------------------------------------
+        Method to derive the boat name from the path of a GPX file
+
+        Args:
+            relPath (string): path of the GPX file relative to gpxPath
+
+        Return:
+            (string) boat name
+        """
+        (folder, name) = os.path.split(relPath)
+        if self.boatFrom == "folder" and folder:
+            return folder.split(os.sep)[0]
+        return os.path.splitext(name)[0]
+
+    def update(self, workers=None, verbose=False):
+        """--------------------------------------------------------------------------
+        Method to bring the index up to date with the GPX files of gpxPath.
+        New and changed files are indexed in a process pool, the index of
+        removed files is dropped and the combined tables are rebuilt if
+        anything changed.
+
+        Args:
+            workers (int):  number of worker processes (None: number of
+                            CPUs, 1: index the files in this process)
+            verbose (bool): print each indexed file
+
+        Return:
+            (dict) number of 'added', 'updated', 'removed', 'unchanged' and
+                   'failed' files and the 'errors' (relative path -> message)
+        """
+        os.makedirs(os.path.join(self.storePath, "files"), exist_ok=True)
+        found = self.scan()
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "failed": 0, "errors": {}}
+
+        for relPath in list(self.files):
+            if relPath not in found:
+                self.removeFile(relPath)
+                stats["removed"] += 1
+
+        jobs = []
+        for (relPath, stat) in sorted(found.items()):
+            entry = self.files.get(relPath)
+            if (entry is not None and entry["size"] == stat.st_size and
+                    entry["mtime"] == stat.st_mtime_ns and
+                    os.path.isfile(os.path.join(self.storePath, entry["npz"]))):
+                stats["unchanged"] += 1
+                continue
+            npz = os.path.join("files", hashlib.sha1(relPath.encode("utf-8")).hexdigest() + ".npz")
+            jobs.append((relPath, os.path.join(self.gpxPath, relPath),
+                         os.path.join(self.storePath, npz), npz,
+                         None if entry is None else entry["sha1"]))
+
+        changed = stats["removed"] > 0
+        for (job, result) in zip(jobs, self.runJobs(jobs, workers)):
+            relPath = job[0]
+            if "error" in result:
+                stats["failed"] += 1
+                stats["errors"][relPath] = result["error"]
+                if relPath in self.files:
+                    self.removeFile(relPath)
+                    changed = True
+                continue
+            result["boat"] = self.boatName(relPath)
+            stats["updated" if relPath in self.files else "added"] += 1
+            self.files[relPath] = result
+            changed = True
+            if verbose:
+                print(f"indexed '{relPath}': {result['waypoints']} waypoints, {result['distance']:.2f}nm")
+
+        if changed or not self.hasTables():
+            self.buildTables()
+        self.saveManifest()
+        self.columns = None
+        return stats
+
+    def runJobs(self, jobs, workers):
+        """--------------------------------------------------------------------------
+        Generator to index the files of the jobs, in a process pool if there
+        is more than one job and worker
+
+        Args:
+            jobs (list):   _indexTripFile() jobs
+            workers (int): number of worker processes (None: number of CPUs)
+
+        Return:
+            (dict) the _indexTripFile() result of each job in the job order
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers == 1 or len(jobs) < 2:
+            navtools = NavTools()
+            for job in jobs:
+                yield _indexTripFile(job, navtools)
+        else:
+            chunksize = max(1, min(16, len(jobs) // (4 * workers)))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                yield from executor.map(_indexTripFile, jobs, chunksize=chunksize)
+
+    def removeFile(self, relPath):
+        """--------------------------------------------------------------------------
+        Method to drop a file from the index
+
+        Args:
+            relPath (string): path of the GPX file relative to gpxPath
+        """
+        entry = self.files.pop(relPath)
+        try:
+            os.remove(os.path.join(self.storePath, entry["npz"]))
+        except OSError:
+            pass
+
+    def hasTables(self):
+        """--------------------------------------------------------------------------
+        Method to check if the combined tables exist
+
+        Return:
+            (bool) True if all tables are in the store
+        """
+        return all(os.path.isfile(os.path.join(self.storePath, f"{table}.npz"))
+                   for table in self.TABLES)
+
+    def buildTables(self):
+        """--------------------------------------------------------------------------
+        Method to combine the columns of all indexed files into the trips,
+        waypoints and legs tables of the store
+        """
+        relPaths = sorted(self.files)
+        trips = {"path": relPaths,
+                 "boat": [self.files[p]["boat"] for p in relPaths],
+                 "name": [self.files[p]["name"] for p in relPaths],
+                 "start": [self.files[p]["start"] or "NaT" for p in relPaths]}
+        for key in ("distance", "timedDistance", "timedTime", "waypoints"):
+            trips[key] = [self.files[p][key] for p in relPaths]
+        trips = {"path": np.array(trips["path"], dtype=str),
+                 "boat": np.array(trips["boat"], dtype=str),
+                 "name": np.array(trips["name"], dtype=str),
+                 "start": np.array(trips["start"], dtype="datetime64[s]"),
+                 "distance": np.array(trips["distance"], dtype=np.float64),
+                 "timedDistance": np.array(trips["timedDistance"], dtype=np.float64),
+                 "timedTime": np.array(trips["timedTime"], dtype=np.float64),
+                 "waypoints": np.array(trips["waypoints"], dtype=np.int64)}
+
+        parts = {"waypoints": [], "legs": []}
+        for (tripId, relPath) in enumerate(relPaths):
+            with np.load(os.path.join(self.storePath, self.files[relPath]["npz"])) as data:
+                for table in parts:
+                    prefix = "wp_" if table == "waypoints" else "leg_"
+                    columns = {key[len(prefix):]: data[key] for key in data.files
+                               if key.startswith(prefix)}
+                    n = len(columns["lat"])
+                    columns["trip"] = np.full(n, tripId, dtype=np.int32)
+                    parts[table].append(columns)
+
+        tables = {"trips": trips}
+        for (table, columns) in parts.items():
+            keys = _FILE_COLUMNS[table]
+            if columns:
+                tables[table] = {key: np.concatenate([c[key] for c in columns]) for key in keys}
+            else:
+                tables[table] = {key: np.zeros(0, dtype=dtype) for (key, dtype) in keys.items()}
+        for (table, columns) in tables.items():
+            self.writeAtomic(f"{table}.npz", lambda fw: np.savez(fw, **columns))
+
+    def tables(self):
+        """--------------------------------------------------------------------------
+        Method to load the trips, waypoints and legs tables of the store,
+        they are kept in memory until the next update()
+
+        Return:
+            (dict) table name -> dict of the numpy column arrays
+        """
+        if self.columns is None:
+            if not self.hasTables():
+                self.update()
+            columns = {}
+            for table in self.TABLES:
+                with np.load(os.path.join(self.storePath, f"{table}.npz")) as data:
+                    columns[table] = {key: data[key] for key in data.files}
+            trips = columns["trips"]
+            years = trips["start"].astype("datetime64[Y]").astype(np.int64) + 1970
+            trips["year"] = np.where(np.isnat(trips["start"]), 0, years)
+            self.columns = columns
+        return self.columns
+
+    def groupCodes(self, by, table, regions=None, gridSize=5.0):
+        """--------------------------------------------------------------------------
+        Method to compute the groups of the rows of the waypoints or legs
+        table. The labels are built for the distinct groups only, the rows
+        get the integer index of their label.
+
+        Args:
+            by (string):     'year', 'boat' or 'region'
+            table (dict):    columns of the waypoints or legs table
+            regions (dict):  region name -> (latMin, latMax, lonMin, lonMax),
+                             rows outside of all regions are labeled 'other'.
+                             None: cells of gridSize x gridSize degrees
+            gridSize (float): size in degrees of the region grid cells
+
+        Return:
+            (tuple) labels (np.array of strings) and the label index of each row
+        """
+        trips = self.tables()["trips"]
+        if by in ("year", "boat"):
+            if by == "year":
+                keys = np.where(trips["year"] > 0, trips["year"].astype(str), "n/a")
+            else:
+                keys = trips["boat"]
+            (labels, tripCodes) = np.unique(keys, return_inverse=True)
+            return (labels, tripCodes.reshape(-1)[table["trip"]])
+        if by != "region":
+            raise ValueError(f"unknown grouping '{by}', use 'year', 'boat' or 'region'")
+        lat = table["lat"]
+        lon = table["lon"]
+        if regions:
+            names = list(regions) + ["other"]
+            codes = np.full(len(lat), len(regions), dtype=np.int64)
+            # the first matching region wins, so assign in reverse order
+            for (idx, (latMin, latMax, lonMin, lonMax)) in reversed(list(enumerate(regions.values()))):
+                inside = (lat >= latMin) & (lat <= latMax) & (lon >= lonMin) & (lon <= lonMax)
+                codes[inside] = idx
+            return (np.array(names, dtype=str), codes)
+        cellLat = (np.floor(lat / gridSize) * gridSize).astype(np.int64)
+        cellLon = (np.floor(lon / gridSize) * gridSize).astype(np.int64)
+        (cells, codes) = np.unique(cellLat * 1000 + cellLon, return_inverse=True)
+        (cellLat, cellLon) = np.divmod(cells + 500, 1000)
+        cellLon -= 500
+        labels = [f"{abs(a):02d}{'N' if a >= 0 else 'S'} {abs(o):03d}{'E' if o >= 0 else 'W'}"
+                  for (a, o) in zip(cellLat, cellLon)]
+        return (np.array(labels, dtype=str), codes.reshape(-1))
+
+    def groupIndex(self, by, tables, regions=None, gridSize=5.0):
+        """--------------------------------------------------------------------------
+        Method to compute common groups for several tables
+
+        Args:
+            by (string):     'year', 'boat' or 'region'
+            tables (list):   columns of the waypoints and/or legs tables
+            regions (dict):  region name -> (latMin, latMax, lonMin, lonMax)
+            gridSize (float): size in degrees of the region grid cells
+
+        Return:
+            (tuple) sorted labels and the list of the label index of the rows
+                    of each table
+        """
+        codes = [self.groupCodes(by, table, regions, gridSize) for table in tables]
+        groups = np.unique(np.concatenate([c[0] for c in codes] + [np.zeros(0, dtype=str)]))
+        index = [np.searchsorted(groups, labels)[rows] if len(labels) else rows
+                 for (labels, rows) in codes]
+        return (groups, index)
+
+    def summary(self, by="year", regions=None, gridSize=5.0):
+        """--------------------------------------------------------------------------
+        Method to aggregate the trips per year, boat or region. The distances
+        are the sums of the waypoint legs (a trip can add to several regions),
+        the timed values come from the timed legs of the route metrics.
+
+        Args:
+            by (string):     'year', 'boat' or 'region'
+            regions (dict):  region name -> (latMin, latMax, lonMin, lonMax)
+                             for by='region' (default: grid cells)
+            gridSize (float): size in degrees of the region grid cells
+
+        Return:
+            (list) one dict per group with the keys 'group', 'trips',
+                   'distance', 'timedDistance', 'timedTime', 'speed', 'etmal'
+        """
+        columns = self.tables()
+        waypoints = columns["waypoints"]
+        legs = columns["legs"]
+        timed = legs["time"] > 0.0
+        timedLegs = {key: values[timed] for (key, values) in legs.items()}
+
+        (groups, (wpIndex, legIndex)) = self.groupIndex(by, [waypoints, timedLegs],
+                                                        regions, gridSize)
+        n = len(groups)
+
+        distance = np.bincount(wpIndex, weights=waypoints["distance"], minlength=n)
+        timedDistance = np.bincount(legIndex, weights=timedLegs["distance"], minlength=n)
+        timedTime = np.bincount(legIndex, weights=timedLegs["time"], minlength=n)
+        etmal = np.zeros(n)
+        np.maximum.at(etmal, legIndex, timedLegs["etmal"])
+        # number of distinct trips per group
+        pairs = np.unique(wpIndex * len(columns["trips"]["path"]) + waypoints["trip"])
+        trips = np.bincount(pairs // max(1, len(columns["trips"]["path"])), minlength=n)
+
+        rows = []
+        for idx in range(n):
+            if trips[idx] == 0:
+                continue
+            rows.append({"group": str(groups[idx]), "trips": int(trips[idx]),
+                         "distance": float(distance[idx]),
+                         "timedDistance": float(timedDistance[idx]),
+                         "timedTime": float(timedTime[idx]),
+                         "speed": float(timedDistance[idx] / timedTime[idx]) if timedTime[idx] > 0 else 0.0,
+                         "etmal": float(etmal[idx])})
+        return rows
+
+    def bestEtmals(self, count=10, minHours=0.0, by=None, regions=None, gridSize=5.0):
+        """--------------------------------------------------------------------------
+        Method to list the timed legs with the best Etmal (24h distance)
+
+        Args:
+            count (int):      number of legs to list (per group if by is given)
+            minHours (float): only consider legs of at least this duration
+            by (string):      None, 'year', 'boat' or 'region'
+            regions (dict):   region name -> (latMin, latMax, lonMin, lonMax)
+            gridSize (float): size in degrees of the region grid cells
+
+        Return:
+            (list) one dict per leg with the keys 'group', 'etmal', 'speed',
+                   'distance', 'time', 'leg', 'file', 'boat', 'start'
+        """
+        columns = self.tables()
+        trips = columns["trips"]
+        legs = columns["legs"]
+        select = (legs["time"] > 0.0) & (legs["time"] >= minHours)
+        legs = {key: values[select] for (key, values) in legs.items()}
+        if by is None:
+            (groups, keys) = (np.array([""]), np.zeros(len(legs["lat"]), dtype=np.int64))
+        else:
+            (groups, (keys,)) = self.groupIndex(by, [legs], regions, gridSize)
+        # sort by group and descending Etmal
+        order = np.lexsort((-legs["etmal"], keys))
+        rows = []
+        (lastKey, ctr) = (None, 0)
+        for idx in order:
+            ctr = ctr + 1 if keys[idx] == lastKey else 1
+            lastKey = keys[idx]
+            if ctr > count:
+                continue
+            trip = legs["trip"][idx]
+            start = trips["start"][trip]
+            rows.append({"group": str(groups[keys[idx]]), "etmal": float(legs["etmal"][idx]),
+                         "speed": float(legs["speed"][idx]),
+                         "distance": float(legs["distance"][idx]),
+                         "time": float(legs["time"][idx]), "leg": str(legs["name"][idx]),
+                         "file": str(trips["path"][trip]), "boat": str(trips["boat"][trip]),
+                         "start": None if np.isnat(start) else str(start.astype("datetime64[D]"))})
+        return rows
+
+    def report(self, by="year", etmals=10, regions=None, gridSize=5.0):
+        """--------------------------------------------------------------------------
+        Method to render the summary and the best Etmals as text tables
+
+        Args:
+            by (string):     'year', 'boat' or 'region'
+            etmals (int):    number of best Etmals to list
+            regions (dict):  region name -> (latMin, latMax, lonMin, lonMax)
+            gridSize (float): size in degrees of the region grid cells
+
+        Return:
+            (string) the report
+        """
+        rows = self.summary(by, regions, gridSize)
+        table = [[r["group"], r["trips"], r["distance"], r["timedDistance"],
+                  r["timedTime"], r["speed"], r["etmal"]] for r in rows]
+        table.append(["Total", len(self.tables()["trips"]["path"]),
+                      sum(r["distance"] for r in rows), sum(r["timedDistance"] for r in rows),
+                      sum(r["timedTime"] for r in rows), "", ""])
+        msg = tabulate(table, headers=[by.capitalize(), "Trips", "Distance\n[nm]", "Timed\n[nm]",
+                                       "Timed\n[h]", "Speed\n[kts]", "Best Etmal\n[nm]"],
+                       floatfmt=",.2f")
+        if etmals:
+            best = self.bestEtmals(etmals)
+            table = [[idx+1, r["etmal"], r["speed"], r["distance"], r["time"], r["leg"],
+                      r["boat"], r["start"] or "n/a", r["file"]] for (idx, r) in enumerate(best)]
+            msg += f"\n\nBest {etmals} Etmals\n\n"
+            msg += tabulate(table, headers=["Rank", "Etmal\n[nm]", "Speed\n[kts]", "Distance\n[nm]",
+                                            "Time\n[h]", "Leg", "Boat", "Trip\nstart", "File"],
+                            floatfmt=",.2f")
+        return msg
+
+
+# columns and dtypes of the per file waypoints and legs tables
+_FILE_COLUMNS = {
+    "waypoints": {"trip": np.int32, "lat": np.float64, "lon": np.float64,
+                  "time": "datetime64[s]", "distance": np.float64},
+    "legs": {"trip": np.int32, "lat": np.float64, "lon": np.float64, "distance": np.float64,
+             "time": np.float64, "speed": np.float64, "etmal": np.float64, "name": str},
+}
+
+
+def tripStart(route, navtools):
+    """--------------------------------------------------------------------------
+    Function to find the start date of a trip: the first waypoint time or,
+    for planned OpenCPN routes without times, the earliest date of the
+    departure / arrival / timedleg <desc> tags
+
+    Args:
+        route (Route):       the parsed GPX route
+        navtools (NavTools): instance with the <desc> date formats
+
+    Return:
+        (datetime64) start date, NaT if the route has no dates
+    """
+    times = route.time[~np.isnat(route.time)]
+    if len(times):
+        return times.min()
+    dates = navtools.dateParser(navtools.descDateFormats)
+    start = None
+    for desc in route.descs:
+        if not desc:
+            continue
+        for line in desc.lower().splitlines():
+            for keyword in ("departure", "arrival", "timedleg"):
+                if keyword in line:
+                    value = dates.parse(line.split(keyword, 1)[1].strip())
+                    if value is not None and (start is None or value < start):
+                        start = value
+    return np.datetime64("NaT", "s") if start is None else np.datetime64(start, "s")
+
+
+def _indexTripFile(job, navtools=None):
+    """--------------------------------------------------------------------------
+    Process pool worker of TripAnalytics.update(): parses one GPX file,
+    computes its route metrics and writes the waypoint and leg columns into
+    the .npz file of the store. The file is only parsed again if its
+    content (sha1) changed.
+
+    Args:
+        job (tuple): relative path, GPX file, .npz file, .npz file relative
+                     to the store and the sha1 of the indexed content (or None)
+        navtools (NavTools): instance used for the route calculations
+
+    Return:
+        (dict) the manifest entry of the file or {'error': message}
+    """
+    (relPath, gpxFile, npzFile, npz, oldSha1) = job
+    try:
+        stat = os.stat(gpxFile)
+        with open(gpxFile, "rb") as fr:
+            data = fr.read()
+        sha1 = hashlib.sha1(data).hexdigest()
+        if sha1 == oldSha1 and os.path.isfile(npzFile):
+            with np.load(npzFile) as columns:
+                entry = json.loads(str(columns["entry"]))
+            entry.update({"size": stat.st_size, "mtime": stat.st_mtime_ns})
+            return entry
+
+        if navtools is None:
+            navtools = NavTools()
+        route = Route.fromGPX(data, navtools)
+        metrics = navtools.routeMetrics(route)
+        start = tripStart(route, navtools)
+        legs = metrics.legs
+        entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha1": sha1, "npz": npz,
+                 "name": route.name, "start": None if np.isnat(start) else str(start),
+                 "distance": metrics.totalDistance, "timedDistance": metrics.timedDistance,
+                 "timedTime": metrics.timedTime, "waypoints": len(route)}
+        columns = {
+            "wp_lat": np.asarray(route.lat, dtype=np.float64),
+            "wp_lon": np.asarray(route.lon, dtype=np.float64),
+            "wp_time": np.asarray(route.time, dtype="datetime64[s]"),
+            "wp_distance": np.asarray(route.legDistances, dtype=np.float64),
+            "leg_lat": np.array([leg.lat for leg in legs], dtype=np.float64),
+            "leg_lon": np.array([leg.lon for leg in legs], dtype=np.float64),
+            "leg_distance": np.array([leg.distance for leg in legs], dtype=np.float64),
+            "leg_time": np.array([leg.time for leg in legs], dtype=np.float64),
+            "leg_speed": np.array([leg.speed for leg in legs], dtype=np.float64),
+            "leg_etmal": np.array([leg.etmal for leg in legs], dtype=np.float64),
+            "leg_name": np.array([leg.name for leg in legs], dtype=str),
+            "entry": np.array(json.dumps(entry)),
+        }
+        tmp = npzFile + ".tmp"
+        with open(tmp, "wb") as fw:
+            np.savez(fw, **columns)
+        os.replace(tmp, npzFile)
+        return entry
+    except Exception as e:
+        return {"error": f"error indexing '{gpxFile}': {str(e)}"}
+
+
+if __name__ == "__main__":
+    """-------------------------------------------------------------------------
+        Script starting point
+    """
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-p", "--gpxPath", help="GPX directory (default: 'gpxPath' setting)")
+    parser.add_argument("-s", "--storePath", help="index directory (default: gpxPath/.tripanalytics)")
+    parser.add_argument("-b", "--by", default="year", choices=("year", "boat", "region"))
+    parser.add_argument("-f", "--boatFrom", default="folder", choices=("folder", "file"))
+    parser.add_argument("-g", "--gridSize", type=float, default=5.0,
+                        help="region grid cell size in degrees")
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("-e", "--etmals", type=int, default=10,
+                        help="number of best Etmals to list")
+    args = parser.parse_args()
+
+    gpxPath = args.gpxPath
+    if gpxPath is None:
+        gpxPath = NavTools().getConfig()['gpxPath']
+    analytics = TripAnalytics(gpxPath, args.storePath, args.boatFrom)
+    start = datetime.now()
+    stats = analytics.update(args.workers)
+    print(f"\n{__app__}: indexed '{gpxPath}' in {(datetime.now()-start).total_seconds():.2f}s, "
+          f"{stats['added']} added, {stats['updated']} updated, {stats['removed']} removed, "
+          f"{stats['unchanged']} unchanged, {stats['failed']} failed")
+    for error in stats["errors"].values():
+        print(f"   {error}")
+    print()
+    print(analytics.report(args.by, args.etmals, gridSize=args.gridSize))
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+# ---------------------------------------------------------------------------
+__author__ = "Volker Petersen <volker.petersen01@gmail.com>"
+__app__ = "bench_dates.py"
+__version__ = "version 1.0.0, Python >3.7"
+__date__ = "Date: 2024/08/01"
+__copyright__ = "Copyright (c) 2024 Volker Petersen"
+__license__ = "GNU General Public License, published by the Free Software Foundation"
+__doc__ = """
+-----------------------------------------------------------------------------
+ Benchmark of the date conversions of NavToolsLib:
+    before: StringToDateTime() up to version 2.1, datetime.strptime() with
+            every format until one doesn't raise a ValueError
+    after:  DateParser, formats compiled once into regexes and the last
+            successful format tried first (when no earlier format can
+            match the same strings), and DateParser.parseISOArray()
+            for whole arrays of GPX/kml 'YYYY-mm-ddTHH:MM:SS[Z]' strings
+
+ The <desc> strings use a mix of the route formats, the later formats of the
+ list are the expensive case of the strptime loop.
+
+    usage: python benchmarks/bench_dates.py [-n strings] [-r repeats]
+-----------------------------------------------------------------------------
+"""
+
+try:
+    import sys
+    import os
+    import argparse
+    from time import perf_counter
+    from datetime import datetime, timedelta
+    import numpy as np
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from NavToolsLib import NavTools, DateParser, Route
+
+except ImportError as e:
+    print(
+        f"Import error: {str(e)} \nAborting the program {__app__} {__version__}")
+    sys.exit()
+
+
+def make_strings(n, fmt):
+    """ n date strings with 2 min time steps in format fmt """
+    start = datetime(2024, 7, 20, 16, 0)
+    return [(start + timedelta(minutes=2*idx)).strftime(fmt) for idx in range(n)]
+
+
+def strptime_loop(dateString, dateFormats):
+    """ the StringToDateTime() implementation used up to version 2.1 """
+    for dt_format in dateFormats:
+        try:
+            dateValue = datetime.strptime(dateString, dt_format)
+            return dateValue
+        except ValueError:
+            dateValue = 0
+    return dateValue
+
+
+def best(function, repeats):
+    """ best wall time of 'repeats' calls of function """
+    elapsed = None
+    for _ in range(repeats):
+        start = perf_counter()
+        result = function()
+        t = perf_counter() - start
+        elapsed = t if elapsed is None else min(elapsed, t)
+    return (elapsed, result)
+
+
+if __name__ == "__main__":
+    """-------------------------------------------------------------------------
+        Script starting point
+    """
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--strings", type=int, default=100000)
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    args = parser.parse_args()
+    n = args.strings
+
+    navtools = NavTools()
+    formats = navtools.descDateFormats
+    print(f"\n{__app__}: converting {n:,d} date strings, best of {args.repeats}")
+
+    for fmt in (formats[0], formats[3], formats[4]):
+        strings = make_strings(n, fmt)
+        dates = DateParser(formats)
+        (before, a) = best(lambda: [strptime_loop(s, formats) for s in strings], args.repeats)
+        (after, b) = best(lambda: [dates.parse(s, default=0) for s in strings], args.repeats)
+        assert a == b
+        print(f"\n<desc> format '{fmt}'")
+        print(f"  strptime loop  {before:8.3f}s  {before/n*1e6:6.2f}us/string")
+        print(f"  DateParser     {after:8.3f}s  {after/n*1e6:6.2f}us/string  speedup {before/after:.1f}x")
+
+    strings = make_strings(n, "%Y-%m-%dT%H:%M:%SZ")
+    (before, a) = best(lambda: np.array([Route.parseTime(s) for s in strings],
+                                        dtype='datetime64[s]'), args.repeats)
+    (after, b) = best(lambda: Route.parseTimes(strings), args.repeats)
+    assert np.array_equal(a, b)
+    print("\nGPX times '%Y-%m-%dT%H:%M:%SZ'")
+    print(f"  np.datetime64  {before:8.3f}s  {before/n*1e6:6.2f}us/string")
+    print(f"  parseTimes     {after:8.3f}s  {after/n*1e6:6.2f}us/string  speedup {before/after:.1f}x")
+
+    strings = make_strings(n, "%Y-%m-%dT%H:%M:%SZ")
+    (before, a) = best(lambda: [datetime.strptime(s.replace("T", " ")[:-4], "%Y-%m-%d %H:%M")
+                                for s in strings], args.repeats)
+    (after, b) = best(lambda: [navtools.getTime(s) for s in strings], args.repeats)
+    assert a == b
+    print("\nYellowbrick times getTime()")
+    print(f"  strptime       {before:8.3f}s  {before/n*1e6:6.2f}us/string")
+    print(f"  fromisoformat  {after:8.3f}s  {after/n*1e6:6.2f}us/string  speedup {before/after:.1f}x")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+# ---------------------------------------------------------------------------
+__author__ = "Volker Petersen <volker.petersen01@gmail.com>"
+__app__ = "bench_gpx_writer.py"
+__version__ = "version 1.0.0, Python >3.7"
+__date__ = "Date: 2024/08/01"
+__copyright__ = "Copyright (c) 2024 Volker Petersen"
+__license__ = "GNU General Public License, published by the Free Software Foundation"
+__doc__ = """
+-----------------------------------------------------------------------------
+ Benchmark of the per-waypoint cost of writing GPX route files:
+    before: copy of NavTools.gpxWaypoint, strRANDOMreplace() and a chain of
+            str.replace() calls per waypoint, concatenated into one string
+    after:  GPXWriter streaming each waypoint to the file object, one
+            waypoint() call per waypoint or one waypoints() call for the
+            whole track
+
+    usage: python benchmarks/bench_gpx_writer.py [-n waypoints] [-r repeats]
+-----------------------------------------------------------------------------
+"""
+
+try:
+    import sys
+    import os
+    import io
+    import argparse
+    import random
+    from time import perf_counter
+    import numpy as np
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from NavToolsLib import NavTools
+    from GPX_Writer import GPXWriter
+
+except ImportError as e:
+    print(
+        f"Import error: {str(e)} \nAborting the program {__app__} {__version__}")
+    sys.exit()
+
+
+def make_track(n, seed=42):
+    """ random walk of n fixes with 2 min time steps """
+    rng = np.random.default_rng(seed)
+    lats = 41.0 + np.cumsum(rng.normal(0.0, 0.002, n))
+    lons = -87.0 + np.cumsum(rng.normal(0.0, 0.002, n))
+    times = np.datetime64("2024-07-20T16:00:00") + np.arange(n) * np.timedelta64(120, 's')
+    return (times, lats, lons)
+
+
+def write_replace_chain(navtools, stream, times, lats, lons):
+    """ the template / str.replace() chain used up to version 2.1 """
+    gpx = navtools.strRANDOMreplace(navtools.gpxHeader)
+    gpx = gpx.replace("nameX", "Benchmark")
+    for idx in range(len(lats)):
+        wp = navtools.strRANDOMreplace(navtools.gpxWaypoint)
+        wp = wp.replace("latX", repr(float(lats[idx])))
+        wp = wp.replace("lonX", repr(float(lons[idx])))
+        wp = wp.replace("timeX", f"{np.datetime_as_string(times[idx], unit='s')}Z")
+        wp = wp.replace("wpX", "NM{:05d}".format(idx+1))
+        if idx % 90 == 0:
+            wp = wp.replace("empty", "diamond")
+            wp = wp.replace(
+                "NM{:05d}".format(idx+1), "2024-07-20 18:00")
+            wp = wp.replace(
+                "</name>", "</name>\n   <desc>timedleg 2024-07-20 18:00</desc>")
+        gpx += wp
+    gpx += navtools.gpxFooter
+    stream.write(gpx)
+
+
+def write_gpx_writer(navtools, stream, times, lats, lons):
+    """ the streaming GPXWriter """
+    gpx = GPXWriter(stream, "Benchmark")
+    for idx in range(len(lats)):
+        if idx % 90 == 0:
+            gpx.waypoint(lats[idx], lons[idx], times[idx], "2024-07-20 18:00",
+                         "diamond", "timedleg 2024-07-20 18:00")
+        else:
+            gpx.waypoint(lats[idx], lons[idx], times[idx], "NM{:05d}".format(idx+1))
+    gpx.close()
+
+
+def write_gpx_writer_bulk(navtools, stream, times, lats, lons):
+    """ the streaming GPXWriter with the bulk conversion of the arrays """
+    names = ["NM{:05d}".format(idx+1) for idx in range(len(lats))]
+    syms = ["empty"] * len(lats)
+    descs = [None] * len(lats)
+    for idx in range(0, len(lats), 90):
+        (names[idx], syms[idx], descs[idx]) = (
+            "2024-07-20 18:00", "diamond", "timedleg 2024-07-20 18:00")
+    gpx = GPXWriter(stream, "Benchmark")
+    gpx.waypoints(lats, lons, times, names, syms, descs)
+    gpx.close()
+
+
+def run(function, track, repeats):
+    """ best wall time of 'repeats' runs writing into memory """
+    navtools = NavTools()
+    best = None
+    size = 0
+    for _ in range(repeats):
+        random.seed(0)
+        stream = io.StringIO()
+        start = perf_counter()
+        function(navtools, stream, *track)
+        elapsed = perf_counter() - start
+        size = stream.tell()
+        best = elapsed if best is None else min(best, elapsed)
+    return (best, size)
+
+
+if __name__ == "__main__":
+    """-------------------------------------------------------------------------
+        Script starting point
+    """
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--waypoints", type=int, default=20000)
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    track = make_track(args.waypoints)
+    print(f"\n{__app__}: writing {args.waypoints:,d} route points, best of {args.repeats}\n")
+    results = {}
+    for (label, function) in (("replace chain", write_replace_chain),
+                              ("GPXWriter", write_gpx_writer),
+                              ("GPXWriter bulk", write_gpx_writer_bulk)):
+        (elapsed, size) = run(function, track, args.repeats)
+        results[label] = elapsed
+        print(f"{label:15s} {elapsed:8.3f}s  {elapsed/args.waypoints*1e6:8.2f}us/waypoint  {size/1e6:7.2f}MB")
+    for label in ("GPXWriter", "GPXWriter bulk"):
+        print(f"\nspeedup {label}: {results['replace chain']/results[label]:.1f}x", end="")
+    print()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+# ---------------------------------------------------------------------------
+__author__ = "Volker Petersen <volker.petersen01@gmail.com>"
+__app__ = "bench_nmea.py"
+__version__ = "version 1.0.0, Python >3.7"
+__date__ = "Date: 2024/08/01"
+__copyright__ = "Copyright (c) 2024 Volker Petersen"
+__license__ = "GNU General Public License, published by the Free Software Foundation"
+__doc__ = """
+-----------------------------------------------------------------------------
+ Throughput of the NMEA pipeline with a synthetic NMEA log of a boat under
+ way (10 Hz GPS, wind and speed instruments, AIS targets). Stages:
+    read     fileNMEAread() of NMEA_TCP_Logging (NMEAReader, skips AIS, prints each fix)
+    stream   NMEA_Stream.NMEAStream framing and parsing of all sentences
+    filter   NMEAStream with the RMC/GGA pre-filter and fast decoders
+    logger   NMEA_Logger.NMEALogger with the default rules, GPX and track file
+    gpx      GPXLogWriter with every fix as a track point (fsync on flush)
+
+ Each stage runs in its own interpreter. Reported are sentences (fixes for
+ 'gpx') per second, the latency percentiles per parsed sentence (not for
+ 'read', which is one call) and the stage RSS: the growth of the peak RSS of
+ the interpreter from before the first run of the stage. It includes the
+ modules the stage imports and its data (for 'gpx' the pre-parsed fixes),
+ but not the interpreter and the benchmark script itself.
+
+ Regression check before each season: save a baseline on the boat laptop
+ with '-save', later runs with '-baseline' exit with 1 if a stage is slower
+ or uses more memory than the baseline by more than '-tolerance'.
+
+    usage: python benchmarks/bench_nmea.py [-n sentences] [-mix RMC=10,GGA=10,...]
+                                           [-stages read,stream,filter,logger,gpx]
+                                           [-save baseline.json] [-baseline baseline.json]
+                                           [-tolerance 0.2] [-generate nmea.log]
+-----------------------------------------------------------------------------
+"""
+
+try:
+    import sys
+    import os
+    import json
+    import random
+    import argparse
+    import tempfile
+    import subprocess
+    import contextlib
+    from time import perf_counter, perf_counter_ns
+    from datetime import datetime, timedelta
+    from tabulate import tabulate
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, ROOT)
+    from NMEA_Stream import checksum
+
+except ImportError as e:
+    print(
+        f"Import error: {str(e)} \nAborting the program {__app__} {__version__}")
+    sys.exit()
+
+# sentences per GPS second of a typical instrument network
+MIX = {"RMC": 10, "GGA": 10, "GSA": 5, "MWV": 20, "VHW": 10, "AIS": 5}
+STAGES = ["read", "stream", "filter", "logger", "gpx"]
+PERCENTILES = (50, 90, 99, 99.9)
+AIS_CHARS = "0123456789:;<=>?@ABCDEFGHIJKLMNOPQRSTUVW`abcdefghijklmnopqrstuvw"
+
+
+def sentence(body, start="$"):
+    """ NMEA sentence of 'body' with checksum and line end """
+    return f"{start}{body}*{checksum(body.encode())}\r\n"
+
+
+def dm(value, degreeDigits):
+    """ degrees -> NMEA ddmm.mmmmm / dddmm.mmmmm """
+    value = abs(value)
+    degrees = int(value)
+    return f"{degrees:0{degreeDigits}d}{(value - degrees) * 60.0:08.5f}"
+
+
+def generate(path, sentences, mix=MIX, seed=42):
+    """
+    Write a synthetic NMEA log: a boat at 6 kn with slowly changing course,
+    the sentences of 'mix' per GPS second in random order
+
+    Input:
+        path (string) log file
+        sentences (int) number of sentences
+        mix (dictionary) sentence type -> sentences per second
+        seed (int) of the random generator, the same log for the same arguments
+
+    Return:
+        (dictionary) sentence type -> count
+    """
+    rng = random.Random(seed)
+    utc = datetime(2024, 7, 1, 18, 0)
+    (lat, lon, cog) = (33.7, -118.3, 200.0)
+    counts = dict.fromkeys(mix, 0)
+    types = [kind for (kind, n) in mix.items() for _ in range(n)]
+    rmc = mix.get("RMC", 0) or 1
+    step = timedelta(seconds=1.0 / rmc)
+    written = 0
+    with open(path, "w", newline="") as fp:
+        while written < sentences:
+            rng.shuffle(types)
+            lines = []
+            for kind in types:
+                if kind == "RMC" or kind == "GGA":
+                    if kind == "RMC":
+                        utc += step
+                        cog = (cog + rng.uniform(-0.5, 0.5)) % 360.0
+                        lat += 6.0 / 3600.0 / rmc / 60.0 * (1.0 if 90 < cog < 270 else -1.0)
+                        lon += 0.00002 * rng.uniform(-1.0, 1.0)
+                    (ns, ew) = ("N" if lat >= 0 else "S", "E" if lon >= 0 else "W")
+                    time = f"{utc:%H%M%S}.{utc.microsecond // 10000:02d}"
+                    if kind == "RMC":
+                        body = (f"GPRMC,{time},A,{dm(lat, 2)},{ns},{dm(lon, 3)},{ew},"
+                                f"{6.0 + rng.uniform(-0.5, 0.5):.2f},{cog:.1f},{utc:%d%m%y},,,A")
+                    else:
+                        body = f"GPGGA,{time},{dm(lat, 2)},{ns},{dm(lon, 3)},{ew},1,{rng.randint(6, 12):02d},0.9,3.2,M,-32.1,M,,"
+                    lines.append(sentence(body))
+                elif kind == "GSA":
+                    svs = ",".join(str(rng.randint(1, 32)) for _ in range(8)) + "," * 4
+                    lines.append(sentence(f"GNGSA,A,3,{svs},1.62,0.88,1.36"))
+                elif kind == "MWV":
+                    lines.append(sentence(f"WIMWV,{rng.uniform(0, 360):05.1f},R,{rng.uniform(5, 20):04.1f},N,A"))
+                elif kind == "VHW":
+                    spd = rng.uniform(5.5, 6.5)
+                    lines.append(sentence(f"VWVHW,,T,,M,{spd:.1f},N,{spd * 1.852:.1f},K"))
+                elif kind == "AIS":
+                    payload = "".join(rng.choice(AIS_CHARS) for _ in range(28))
+                    lines.append(sentence(f"AIVDM,1,1,,{rng.choice('AB')},{payload},0", "!"))
+                else:
+                    raise ValueError(f"unknown sentence type '{kind}'")
+                counts[kind] += 1
+                written += 1
+                if written == sentences:
+                    break
+            fp.write("".join(lines))
+    return counts
+
+
+def percentiles(latencies):
+    """ (dictionary) percentile -> latency in us of a list of ns latencies """
+    if not latencies:
+        return {}
+    latencies.sort()
+    n = len(latencies)
+    return {p: latencies[min(n - 1, int(n * p / 100.0))] / 1000.0 for p in PERCENTILES}
+
+
+def peakRSS():
+    """ peak resident set size of this process in MB, None without the resource module """
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024.0 / 1024.0 if sys.platform == "darwin" else rss / 1024.0
+
+
+def stageRead(path, workdir):
+    from NMEA_TCP_Logging import fileNMEAread
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        fileNMEAread(path)
+    return []
+
+
+def stageStream(path, workdir, msgIDs=None):
+    from NMEA_Stream import NMEAStream
+
+    latencies = []
+    with open(path, "rb") as stream:
+        messages = NMEAStream(stream, msgIDs=msgIDs).messages()
+        last = perf_counter_ns()
+        for _ in messages:
+            now = perf_counter_ns()
+            latencies.append(now - last)
+            last = now
+    return latencies
+
+
+def stageLogger(path, workdir):
+    from NMEA_Logger import NMEALogger, fileMessages
+
+    latencies = []
+    with NMEALogger(os.path.join(workdir, "bench.gpx"), verbose=False) as logger:
+        process = logger.process
+        messages = fileMessages(path)
+        last = perf_counter_ns()
+        for (_, nmea) in messages:
+            process(nmea)
+            now = perf_counter_ns()
+            latencies.append(now - last)
+            last = now
+    return latencies
+
+
+def stageGPX(path, workdir):
+    from GPX_Writer import GPXLogWriter
+    from NMEA_Stream import NMEAStream
+
+    # parse first, only the writer is timed
+    with open(path, "rb") as stream:
+        fixes = [(nmea.lat, nmea.lon, datetime.combine(nmea.date, nmea.time.replace(tzinfo=None)))
+                 for (_, nmea) in NMEAStream(stream).messages()
+                 if nmea is not None and nmea.msgID == "RMC"]
+    latencies = []
+    gpx = GPXLogWriter(os.path.join(workdir, "bench_track.gpx"), "Bench", mode="track",
+                       precision=6, flushEvery=100)
+    waypoint = gpx.waypoint
+    last = perf_counter_ns()
+    for (lat, lon, utc) in fixes:
+        waypoint(lat, lon, utc)
+        now = perf_counter_ns()
+        latencies.append(now - last)
+        last = now
+    gpx.close()
+    return latencies
+
+
+def stageFilter(path, workdir):
+    return stageStream(path, workdir, ("RMC", "GGA"))
+
+
+RUNNERS = {"read": stageRead, "stream": stageStream, "filter": stageFilter,
+           "logger": stageLogger, "gpx": stageGPX}
+
+
+def runStage(stage, path, repeats):
+    """
+    Run one stage in this process, best of 'repeats'
+
+    Return:
+        (dictionary) elapsed seconds, items, latency percentiles, stage RSS
+    """
+    best = None
+    before = peakRSS()
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(repeats):
+            start = perf_counter()
+            latencies = RUNNERS[stage](path, workdir)
+            # the timed loop of the stage, e.g. without the parsing of 'gpx'
+            elapsed = sum(latencies) / 1e9 if latencies else perf_counter() - start
+            if best is None or elapsed < best[0]:
+                best = (elapsed, latencies)
+            for name in os.listdir(workdir):
+                os.remove(os.path.join(workdir, name))
+    (elapsed, latencies) = best
+    after = peakRSS()
+    return {"elapsed": elapsed, "items": len(latencies), "percentiles": percentiles(latencies),
+            "stageRSS": None if after is None else after - before}
+
+
+def measure(stage, path, repeats):
+    """ run the stage in a fresh interpreter, returns the runStage() result """
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "-child", stage,
+                           "-file", path, "-r", str(repeats)],
+                          capture_output=True, text=True, cwd=ROOT)
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            result = json.loads(line[7:])
+            result["percentiles"] = {float(p): v for (p, v) in result["percentiles"].items()}
+            return result
+    raise RuntimeError(f"stage '{stage}' failed:\n{proc.stderr[-2000:]}")
+
+
+def compare(results, baseline, tolerance):
+    """
+    (list of string) regressions of the results against the baseline: lower
+    throughput or higher stage RSS by more than 'tolerance' (fraction).
+    Baselines of the peak RSS of the whole interpreter ('rss') are not
+    comparable, only their throughput is checked.
+    """
+    failed = []
+    for (stage, result) in results.items():
+        base = baseline.get(stage)
+        if base is None:
+            continue
+        if result["rate"] < base["rate"] * (1.0 - tolerance):
+            failed.append(f"{stage}: {result['rate']:,.0f} per s, baseline {base['rate']:,.0f}")
+        (rss, baseRSS) = (result["stageRSS"], base.get("stageRSS"))
+        if rss and baseRSS and rss > baseRSS * (1.0 + tolerance):
+            failed.append(f"{stage}: stage RSS {rss:.1f} MB, baseline {baseRSS:.1f} MB")
+    return failed
+
+
+def parseMix(spec):
+    """ 'RMC=10,GGA=10' -> {'RMC': 10, 'GGA': 10} """
+    mix = {}
+    for item in spec.split(","):
+        (kind, _, n) = item.partition("=")
+        kind = kind.strip().upper()
+        if kind not in MIX:
+            raise argparse.ArgumentTypeError(f"unknown sentence type '{kind}', one of {', '.join(MIX)}")
+        mix[kind] = int(n or 1)
+    return mix
+
+
+if __name__ == "__main__":
+    """-------------------------------------------------------------------------
+        Script starting point
+    """
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--sentences", type=int, default=100000)
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    parser.add_argument("-mix", type=parseMix, default=MIX,
+                        help="sentences per second by type, e.g. 'RMC=10,GGA=10,MWV=20,AIS=5'")
+    parser.add_argument("-stages", default=",".join(STAGES), help="comma separated stages")
+    parser.add_argument("-seed", type=int, default=42)
+    parser.add_argument("-file", help="benchmark this NMEA log instead of a synthetic one")
+    parser.add_argument("-generate", help="only write the synthetic log to this file")
+    parser.add_argument("-save", help="save the results as baseline (json)")
+    parser.add_argument("-baseline", help="compare with this baseline (json), exit code 1 on a regression")
+    parser.add_argument("-tolerance", type=float, default=0.2,
+                        help="allowed slowdown / RSS growth against the baseline (fraction)")
+    parser.add_argument("-child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print("RESULT " + json.dumps(runStage(args.child, args.file, args.repeats)))
+        sys.exit()
+    if args.generate:
+        counts = generate(args.generate, args.sentences, args.mix, args.seed)
+        print(f"{sum(counts.values()):,d} sentences written to '{args.generate}': {counts}")
+        sys.exit()
+
+    stages = [stage.strip() for stage in args.stages.split(",")]
+    for stage in stages:
+        if stage not in RUNNERS:
+            parser.error(f"unknown stage '{stage}', one of {', '.join(STAGES)}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.file
+        if path is None:
+            path = os.path.join(tmp, "synthetic.log")
+            counts = generate(path, args.sentences, args.mix, args.seed)
+            mix = ", ".join(f"{kind} {n:,d}" for (kind, n) in counts.items())
+        else:
+            mix = os.path.basename(path)
+        with open(path, "rb") as fp:
+            total = sum(1 for _ in fp)
+        print(f"\n{__app__}: {total:,d} sentences ({mix}), best of {args.repeats}\n")
+
+        results = {}
+        table = []
+        for stage in stages:
+            result = measure(stage, path, args.repeats)
+            result["rate"] = (result["items"] if stage == "gpx" else total) / result["elapsed"]
+            results[stage] = result
+            pct = result["percentiles"]
+            table.append([stage, result["elapsed"], f"{result['items'] or total:,d}", f"{result['rate']:,.0f}"]
+                         + [pct.get(p, "-") for p in PERCENTILES] + [result["stageRSS"]])
+    print(tabulate(table, headers=["Stage", "Time\n[s]", "Parsed", "Sentences\nper s"]
+                   + [f"p{p:g}\n[us]" for p in PERCENTILES] + ["Stage RSS\n[MB]"],
+                   floatfmt=".2f"))
+    print("\nlatencies per parsed sentence; 'gpx': fixes written per s; 'read' prints every fix")
+
+    if args.save:
+        with open(args.save, "w") as fp:
+            json.dump({stage: {"rate": r["rate"], "stageRSS": r["stageRSS"]} for (stage, r) in results.items()},
+                      fp, indent=2)
+        print(f"\nbaseline saved to '{args.save}'")
+    if args.baseline:
+        with open(args.baseline) as fp:
+            failed = compare(results, json.load(fp), args.tolerance)
+        if failed:
+            print(f"\n{len(failed)} regression(s) against '{args.baseline}':\n  " + "\n  ".join(failed))
+            sys.exit(1)
+        print(f"\nno regression against '{args.baseline}' (tolerance {args.tolerance:.0%})")
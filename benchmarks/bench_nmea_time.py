@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+# ---------------------------------------------------------------------------
+__author__ = "Volker Petersen <volker.petersen01@gmail.com>"
+__app__ = "bench_nmea_time.py"
+__version__ = "version 1.0.0, Python >3.7"
+__date__ = "Date: 2024/08/01"
+__copyright__ = "Copyright (c) 2024 Volker Petersen"
+__license__ = "GNU General Public License, published by the Free Software Foundation"
+__doc__ = """
+-----------------------------------------------------------------------------
+ Per sentence cost of the UTC/local time pipeline of the NMEA loggers for
+ a 10 Hz stream of RMC date/time fields (crossing a DST transition):
+    before: merge_date_time() as a strftime/strptime round trip,
+            utc_to_local() with pytz.timezone() and two astimezone() calls,
+            hour/minute by int(local.strftime('%H'/'%M')) and the GPX time
+            string by strftime() + replace()
+    after:  NMEA_Time.LocalTime, UTC datetime built from the fields, UTC
+            offset cached until the next DST transition, hour/minute as
+            attributes and the GPX time string by isoformat()
+
+    usage: python benchmarks/bench_nmea_time.py [-n sentences] [-r repeats] [-tz zone]
+-----------------------------------------------------------------------------
+"""
+
+try:
+    import sys
+    import os
+    import argparse
+    from time import perf_counter
+    from datetime import datetime, timedelta
+    import pytz
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from NMEA_Time import LocalTime
+
+except ImportError as e:
+    print(
+        f"Import error: {str(e)} \nAborting the program {__app__} {__version__}")
+    sys.exit()
+
+DATE_TIME = "%Y-%m-%d %H:%M:%S"
+
+
+def old_merge_date_time(date, time):
+    """ merge_date_time() of the loggers up to version 1.0 """
+    dateStr = date.strftime("%Y-%m-%d")
+    timeStr = time.strftime("%H:%M:%S")
+    return datetime.strptime(f"{dateStr} {timeStr}", DATE_TIME)
+
+
+def old_utc_to_local(utc_dt, tz):
+    """ utc_to_local() of the loggers up to version 1.0 """
+    local_tz = pytz.timezone(tz)
+    local_dt = utc_dt.replace(tzinfo=pytz.utc).astimezone(local_tz)
+    return local_dt.astimezone(local_tz)
+
+
+def before(fields, tz):
+    result = []
+    for (date, time) in fields:
+        utc = old_merge_date_time(date, time)
+        utcStr = utc.strftime(DATE_TIME) + "Z"
+        utcStr = utcStr.replace(" ", "T")
+        local = old_utc_to_local(utc, tz)
+        result.append((int(local.strftime("%H")), int(local.strftime("%M")), utcStr))
+    return result
+
+
+def after(fields, tz):
+    clock = LocalTime(tz)
+    result = []
+    for (date, time) in fields:
+        utc = clock.utc(date, time)
+        utcStr = utc.isoformat() + "Z"
+        local = clock.local(utc)
+        result.append((local.hour, local.minute, utcStr))
+    return result
+
+
+def best(function, repeats):
+    """ best wall time of 'repeats' calls of function """
+    elapsed = None
+    for _ in range(repeats):
+        start = perf_counter()
+        result = function()
+        t = perf_counter() - start
+        elapsed = t if elapsed is None else min(elapsed, t)
+    return (elapsed, result)
+
+
+if __name__ == "__main__":
+    """-------------------------------------------------------------------------
+        Script starting point
+    """
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--sentences", type=int, default=100000)
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    parser.add_argument("-tz", default="US/Pacific")
+    args = parser.parse_args()
+
+    # 10 Hz RMC fields (pynmeagps date and time objects) ending after the
+    # spring DST transition of the zone
+    end = datetime(2024, 3, 10, 10, 30)
+    fields = []
+    for i in range(args.sentences):
+        utc = end - timedelta(seconds=(args.sentences - i) / 10.0)
+        fields.append((utc.date(), utc.time()))
+
+    (t0, r0) = best(lambda: before(fields, args.tz), args.repeats)
+    (t1, r1) = best(lambda: after(fields, args.tz), args.repeats)
+    if r0 != r1:
+        print("ERROR: the results differ")
+        sys.exit(1)
+    n = len(fields)
+    print(f"\n{__app__}: {n:,d} RMC sentences, time zone '{args.tz}', best of {args.repeats}\n")
+    print(f"before: {t0*1e6/n:7.2f} us per sentence")
+    print(f"after:  {t1*1e6/n:7.2f} us per sentence  ({t0/t1:.1f}x)")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+# ---------------------------------------------------------------------------
+__author__ = "Volker Petersen <volker.petersen01@gmail.com>"
+__app__ = "bench_startup.py"
+__version__ = "version 1.0.0, Python >3.7"
+__date__ = "Date: 2024/08/01"
+__copyright__ = "Copyright (c) 2024 Volker Petersen"
+__license__ = "GNU General Public License, published by the Free Software Foundation"
+__doc__ = """
+-----------------------------------------------------------------------------
+ Startup time budget of the entry points. Each script is loaded in a fresh
+ interpreter with 'python -X importtime', its module level code runs (all
+ imports, but not the '__main__' block) and the time is compared with the
+ budget of the script. The heaviest imports are listed from the importtime
+ report. The exit code is 1 if a script is over its budget, so the
+ benchmark can be used as a regression check.
+
+ A script that stops at a missing dependency (e.g. wxPython) is reported
+ with the time up to that point and the error message.
+
+    usage: python benchmarks/bench_startup.py [-r repeats] [-t top] [-s scale]
+-----------------------------------------------------------------------------
+"""
+
+try:
+    import sys
+    import os
+    import re
+    import argparse
+    import subprocess
+    from tabulate import tabulate
+
+except ImportError as e:
+    print(
+        f"Import error: {str(e)} \nAborting the program {__app__} {__version__}")
+    sys.exit()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# startup budget in ms of each entry point (module level code incl. imports)
+BUDGETS = {
+    "OpenCPN_Route_Analyzer.py": 160,
+    "RouteConvertUpload.py": 160,
+    "NavigationTools.pyw": 500,
+}
+
+# runs the module level code of the script without its '__main__' block
+LOADER = """
+import sys, io, contextlib
+from time import perf_counter
+from importlib.machinery import SourceFileLoader
+from importlib.util import spec_from_loader, module_from_spec
+path = sys.argv[1]
+sys.path.insert(0, sys.argv[2])
+error = ""
+out = io.StringIO()
+sys.stderr.write("STARTUP BEGIN\\n")
+sys.stderr.flush()
+start = perf_counter()
+try:
+    with contextlib.redirect_stdout(out):
+        loader = SourceFileLoader("startup_entry", path)
+        module = module_from_spec(spec_from_loader("startup_entry", loader))
+        loader.exec_module(module)
+except SystemExit:
+    error = out.getvalue().strip().splitlines()[0] if out.getvalue().strip() else "SystemExit"
+except Exception as e:
+    error = f"{type(e).__name__}: {e}"
+print(f"STARTUP {(perf_counter() - start) * 1000.0:.1f} {error}")
+"""
+
+IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+
+def measure(script):
+    """ one cold interpreter run: (startup ms, error, importtime rows) """
+    env = dict(os.environ)
+    # write the .pyc files, otherwise every run compiles the sources again
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", LOADER,
+                           os.path.join(ROOT, script), ROOT],
+                          capture_output=True, text=True, env=env, cwd=ROOT)
+    elapsed = None
+    error = ""
+    for line in proc.stdout.splitlines():
+        if line.startswith("STARTUP "):
+            (_, value, *rest) = line.split(" ", 2)
+            elapsed = float(value)
+            error = " ".join(rest)
+    if elapsed is None:
+        raise RuntimeError(f"'{script}' failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    # skip the imports of the interpreter start and of the loader itself
+    report = proc.stderr.partition("STARTUP BEGIN\n")[2]
+    for line in report.splitlines():
+        match = IMPORTTIME.match(line)
+        # direct imports of the script are at the top level of the report
+        if match and len(match.group(3)) == 1:
+            rows.append((int(match.group(2)) / 1000.0, match.group(4)))
+    return (elapsed, error, rows)
+
+
+if __name__ == "__main__":
+    """-------------------------------------------------------------------------
+        Script starting point
+    """
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    parser.add_argument("-t", "--top", type=int, default=5,
+                        help="number of heaviest imports to list")
+    parser.add_argument("-s", "--scale", type=float, default=1.0,
+                        help="scale factor of the budgets for slow machines")
+    args = parser.parse_args()
+
+    print(f"\n{__app__}: startup time of the entry points, best of {args.repeats}\n")
+    table = []
+    failed = []
+    for (script, budget) in BUDGETS.items():
+        measure(script)     # warm up the .pyc files and the file system cache
+        best = min((measure(script) for _ in range(args.repeats)), key=lambda r: r[0])
+        (elapsed, error, rows) = best
+        budget *= args.scale
+        status = "ok" if elapsed <= budget else "OVER BUDGET"
+        if elapsed > budget:
+            failed.append(script)
+        heavy = ", ".join(f"{name} {ms:.0f}" for (ms, name) in sorted(rows, reverse=True)[:args.top])
+        table.append([script, elapsed, budget, status, heavy])
+        if error:
+            table.append(["", "", "", "", f"stopped at: {error[:70]}"])
+    print(tabulate(table, headers=["Entry point", "Startup\n[ms]", "Budget\n[ms]", "Status",
+                                   "Heaviest imports [ms]"], floatfmt=".1f"))
+    if failed:
+        print(f"\n{len(failed)} entry point(s) over the startup budget: {', '.join(failed)}")
+        sys.exit(1)
+    print("\nall entry points within the startup budget")
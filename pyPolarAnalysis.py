@@ -18,7 +18,6 @@ try:
     import matplotlib.pyplot as plt
     import numpy as np
     from tabulate import tabulate
-    from sklearn.metrics import r2_score
 except ImportError as e:
     print("Import error: %s\nAborting the program %s" % (str(e), __version__))
     sys.exit()
@@ -31,6 +30,17 @@ def read_csv(filename):
     return (polar[1:, 1:], TWA[1:], TWS[1:])
 
 
+def r2_score(y, yFit):
+    """ coefficient of determination R^2 of a fit, same result as
+        sklearn.metrics.r2_score without loading scikit-learn """
+    y = np.asarray(y, dtype=np.float64)
+    ssRes = np.sum((y - np.asarray(yFit, dtype=np.float64))**2)
+    ssTot = np.sum((y - y.mean())**2)
+    if ssTot == 0.0:
+        return 1.0 if ssRes == 0.0 else 0.0
+    return 1.0 - ssRes / ssTot
+
+
 def polynomial(bsp, twa, tws):
     z = np.polyfit(twa, bsp, 5)
     np.set_printoptions(precision=4)
@@ -16,8 +16,31 @@ navtools = None
 try:
     import sys
     import os
+    import numpy as np
     from typing import Dict
-    from NavToolsLib import NavTools
+    from datetime import datetime, timedelta
+    import io
+    import sqlite3
+    import NavToolsLib
+    from NavToolsLib import NavTools, Route, DateParser
+    from RouteCache import RouteMetricsCache, GPXRouteIndex
+    from GPX_Writer import GPXWriter, GPXLogWriter
+    from GPX_Repair import repairFile
+    import xml.etree.ElementTree as ET
+    from TripAnalytics import TripAnalytics
+    import json
+    import NavConfig
+    from NMEA_Stream import NMEAFramer, NMEAStream, decodeRMC, decodeGGA, checksum, checksumOK, toDate, toTime
+    import asyncio
+    import pytest
+    import socket
+    from NMEA_Ingest import NMEAIngest, TCPSource, WebSocketSource, UDPSource, SerialSource, FileSource
+    from NMEA_TCP_Server import ReplayServer, NMEAClock
+    from NMEA_Time import LocalTime, localTime
+    from NMEA_TrackRecorder import TrackRecorder, TrackReader, HEADER_SIZE, RECORD, epochSeconds
+    import pytz
+    from types import SimpleNamespace
+    from NMEA_Logger import NMEALogger, RuleScheduler, Fix, PeriodicRule, WatchRule, DailyRule, DistanceRule, CourseChangeRule, defaultRules, fileMessages
 
 except ImportError as e:
     print("Import error: %s \nAborting the program %s" % (e, __version__))
@@ -40,6 +63,62 @@ def fetch_file(file):
     return xml
 
 
+def make_gpx(waypoints, name="Test Route"):
+    """ build the xml code of a GPX route from (lat, lon, name, sym, desc) tuples """
+    xml = ('<?xml version="1.0" encoding="utf-8"?>\n'
+           '<gpx version="1.1" creator="OpenCPN" xmlns="http://www.topografix.com/GPX/1/1"'
+           ' xmlns:opencpn="http://www.opencpn.org">\n'
+           f'<rte>\n<name>{name}</name>\n')
+    for (lat, lon, wpName, sym, desc) in waypoints:
+        xml += f'<rtept lat="{lat}" lon="{lon}">\n<time>2019-12-01T08:00:00Z</time>\n'
+        xml += f'<name>{wpName}</name>\n<sym>{sym}</sym>\n'
+        if desc:
+            xml += f'<desc>{desc}</desc>\n'
+        xml += '<type>WPT</type>\n</rtept>\n'
+    xml += '</rte>\n</gpx>\n'
+    return xml
+
+
+SAMPLE_ROUTE = [
+    (40.70, -74.00, "New York", "harbor", "departure 2019-12-01 08:00"),
+    (40.40, -73.80, "NM0001", "empty", None),
+    (39.90, -73.90, "NM0002", "empty", None),
+    (39.40, -74.20, "Atlantic City", "diamond", "timedleg 2019-12-02 02:00"),
+    (38.70, -74.80, "NM0003", "empty", None),
+    (37.90, -75.30, "Chincoteague", "diamond", "poi"),
+    (36.95, -76.30, "Norfolk", "service-marina", "arrival 2019-12-03 08:30"),
+]
+
+
+def make_kml(boats):
+    """ build the xml code of a Yellowbrick kml file from a dictionary
+        boat name -> list of (time, lat, lon) tuples """
+    xml = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<kml xmlns="http://www.opengis.net/kml/2.2"'
+           ' xmlns:gx="http://www.google.com/kml/ext/2.2"'
+           ' xmlns:ns2="http://www.opengis.net/kml/2.2">\n'
+           '<Document>\n<name>Race</name>\n<Folder>\n<name>Fleet</name>\n')
+    for boat in boats:
+        xml += f'<Placemark>\n<name>{boat}</name>\n<gx:Track>\n'
+        for (time, lat, lon) in boats[boat]:
+            xml += f'<ns2:when>{time}</ns2:when>\n'
+        for (time, lat, lon) in boats[boat]:
+            xml += f'<gx:coord>{lon},{lat},0</gx:coord>\n'
+        xml += '</gx:Track>\n</Placemark>\n'
+    xml += '</Folder>\n</Document>\n</kml>\n'
+    return xml
+
+
+SAMPLE_FLEET = {
+    "Aeolus": [("2024-07-20T18:00:00Z", 45.0, -84.0),
+               ("2024-07-20T18:10:00Z", 45.1, -84.0),
+               ("2024-07-20T18:20:00Z", 45.2, -84.1)],
+    "Andreas": [("2024-07-20T18:00:00Z", 45.0, -84.0),
+                ("2024-07-20T18:10:00Z", 45.0, -84.1)],
+    "Windward": [("2024-07-20T18:05:00Z", 44.9, -84.2)],
+}
+
+
 def test_library_import():
     global navtools
     navtools = NavTools()
@@ -65,6 +144,904 @@ def test_wpDistance():
         0.0, -91.0, 0.0, -92.0), 60.10862))
 
 
+def test_batchDistances():
+    lats = [45.0, 46.0, 46.5, 0.0, -12.25]
+    lons = [-91.0, -91.0, -90.0, 0.0, 178.5]
+    legs = navtools.calc_track_distances(lats, lons)
+    hdgs = navtools.calc_track_headings(lats, lons)
+    assert (len(legs) == len(lats)-1 and len(hdgs) == len(lats)-1)
+    # reference values of the scalar haversine / heading formulas
+    refLegs = [60.108624836240516, 51.29245458268596, 5409.776235261646, 10077.805927465777]
+    refHdgs = [0.0, 53.770695778547235, 90.0, 173.1253887822952]
+    for i in range(len(legs)):
+        assert float_equality(legs[i], refLegs[i]) and float_equality(hdgs[i], refHdgs[i])
+        assert navtools.calc_distance(lats[i], lons[i], lats[i+1], lons[i+1]) == refLegs[i]
+        assert navtools.calc_heading(lats[i], lons[i], lats[i+1], lons[i+1]) == refHdgs[i]
+    # one starting point against an array of end points
+    dist = navtools.calc_distances(45.0, -91.0, lats, lons)
+    assert (dist[0] == 0.0 and float_equality(dist[1], 60.10862))
+
+
+def test_routeModel():
+    route = Route.fromGPX(make_gpx(SAMPLE_ROUTE), navtools)
+    assert (len(route) == len(SAMPLE_ROUTE) and route.name == "Test Route")
+    assert (route.names[3] == "Atlantic City" and route.descs[1] is None)
+    legs = [navtools.calc_distance(SAMPLE_ROUTE[i][0], SAMPLE_ROUTE[i][1],
+                                   SAMPLE_ROUTE[i+1][0], SAMPLE_ROUTE[i+1][1])
+            for i in range(len(SAMPLE_ROUTE)-1)]
+    assert (float_equality(route.distance(), sum(legs)))
+    assert (float_equality(route.distance(2, 5), sum(legs[2:5])))
+    assert (route.timeText(0) == "2019-12-01T08:00:00Z")
+
+    # the parsed route gives the same results as the xml code
+    msg1 = navtools.ComputeRouteDistances(
+        make_gpx(SAMPLE_ROUTE), verbose=False, skipWP=True, noSpeed=False)
+    msg2 = navtools.ComputeRouteDistances(
+        route, verbose=False, skipWP=True, noSpeed=False)
+    assert (str(msg1) == str(msg2))
+
+
+def test_verifyGPXRouteFile(tmp_path):
+    # generic duplicates are renamed, named waypoints are left alone
+    waypoints = SAMPLE_ROUTE + [(36.90, -76.20, "NM0001", "empty", None),
+                                (36.85, -76.10, "Norfolk", "service-marina", None)]
+    (tmp_path / "dup.gpx").write_text(make_gpx(waypoints))
+    msg = navtools.verifyGPXRouteFile(str(tmp_path), "dup.gpx")
+    assert msg == "Fixed 2 duplicate waypoint names\n"
+    names = Route.fromFile(tmp_path / "dup.gpx", navtools).names
+    assert names.count("Norfolk") == 2 and "NM0001" not in names and len(names) == len(waypoints)
+
+    # with the already parsed route, a file without duplicates is left unchanged
+    (tmp_path / "ok.gpx").write_text(make_gpx(SAMPLE_ROUTE))
+    route = Route.fromFile(tmp_path / "ok.gpx", navtools)
+    msg = navtools.verifyGPXRouteFile(str(tmp_path), "ok.gpx", route)
+    assert msg == "No duplicate waypoint names found in the file\n"
+    assert (tmp_path / "ok.gpx").read_text() == make_gpx(SAMPLE_ROUTE)
+
+
+def test_parseSQLRouteFile(tmp_path):
+    # the SQL file gets the coordinates as written in the GPX file
+    waypoints = [("40.700000", "-74.000000", "New York", "harbor", None),
+                 ("40.123456789", "-73.80", "NM0001", "empty", None),
+                 ("40.700000", "-74.000000", "New York", "harbor", None)]
+    (tmp_path / "trip.gpx").write_text(make_gpx(waypoints))
+    route = Route.fromFile(tmp_path / "trip.gpx", navtools)
+    assert (route.coords[1] == ("40.123456789", "-73.80"))
+    for arg in (None, route):
+        log = navtools.parseSQLRouteFile(str(tmp_path), str(tmp_path), "trip", arg)
+        sql = (tmp_path / "trip.sql").read_text()
+        assert ("(0, 'New York', '40.700000', '-74.000000', 'harbor', '', '')" in sql)
+        assert ("(1, 'WP0001', '40.123456789', '-73.80', 'none'" in sql)
+        assert ("arrived after final leg at 'harbor' New York" in log)
+
+
+def test_routeMetrics():
+    metrics = navtools.ComputeRouteDistances(
+        make_gpx(SAMPLE_ROUTE), verbose=False, skipWP=True, noSpeed=False)
+    # generic and poi waypoints are not listed
+    assert ([leg.name for leg in metrics.legs] == ["New York", "Atlantic City", "Norfolk"])
+    route = Route.fromGPX(make_gpx(SAMPLE_ROUTE), navtools)
+    assert (float_equality(metrics.totalDistance, route.distance()))
+    assert (float_equality(sum(leg.distance for leg in metrics.legs), route.distance()))
+    assert (metrics.legs[1].time == 18.0 and metrics.timedTime == 48.5)
+    assert (float_equality(metrics.averageSpeed, metrics.timedDistance / 48.5))
+    assert (f"{metrics.averageSpeed:9,.2f}kts" in str(metrics))
+    assert ("Speed" not in str(navtools.routeMetrics(route, noSpeed=True)))
+
+def test_metricsCache(tmp_path):
+    file = tmp_path / "sample.gpx"
+    file.write_text(make_gpx(SAMPLE_ROUTE))
+    db = tmp_path / "toerns.sqlite3"
+    expected = navtools.routeMetrics(make_gpx(SAMPLE_ROUTE))
+
+    with RouteMetricsCache(db, navtools) as cache:
+        metrics = navtools.routeMetrics(file, cache=cache)
+        assert (cache.misses == 1 and metrics.totalDistance == expected.totalDistance)
+    with RouteMetricsCache(db, navtools) as cache:
+        metrics = navtools.ComputeRouteDistances(
+            str(file), verbose=False, skipWP=True, noSpeed=False, cache=cache)
+        assert (cache.hits == 1 and cache.misses == 0)
+        assert (metrics.legs == expected.legs and str(metrics) == str(expected))
+
+        # touched but unchanged files are validated with the content hash
+        os.utime(file, ns=(0, 10**18))
+        navtools.routeMetrics(file, cache=cache)
+        assert (cache.hits == 2 and cache.misses == 0)
+
+        # changed files are parsed again
+        file.write_text(make_gpx(SAMPLE_ROUTE[:-1]))
+        os.utime(file, ns=(0, 2 * 10**18))
+        metrics = navtools.routeMetrics(file, cache=cache)
+        assert (cache.misses == 1 and metrics.totalDistance < expected.totalDistance)
+
+    # entries of other waypoint settings are parsed again
+    other = NavTools()
+    other.WPtypes = other.WPtypes + ['marina']
+    with RouteMetricsCache(db, other) as cache:
+        other.routeMetrics(file, cache=cache)
+        assert (cache.hits == 0 and cache.misses == 1)
+        other.routeMetrics(file, cache=cache)
+        assert (cache.hits == 1)
+
+def test_verifyToernDirectory(tmp_path):
+    (tmp_path / "trip1.gpx").write_text(make_gpx(SAMPLE_ROUTE))
+    (tmp_path / "trip2.gpx").write_text(make_gpx(SAMPLE_ROUTE[:4]))
+    miles = navtools.routeMetrics(make_gpx(SAMPLE_ROUTE)).totalDistance
+    db = str(tmp_path / "toerns.sqlite3")
+    con = sqlite3.connect(db)
+    con.execute("CREATE TABLE ToernDirectoryTable (id INTEGER, destination TEXT, maptable TEXT, miles REAL)")
+    con.executemany("INSERT INTO ToernDirectoryTable VALUES (?, ?, ?, ?)",
+                    [(1, "Norfolk", "trip1", miles), (2, "Atlantic City", "trip2", 1.0),
+                     (3, "Nowhere", "missing", 5.0)])
+    con.commit()
+    con.close()
+
+    # the workers return the metrics, this process writes them to the cache
+    for workers in (2, 1):
+        trips = list(navtools.iterToerndirectoryDistances(db, str(tmp_path), workers))
+        assert ([trip.id for trip in trips] == [1, 2, 3])
+        assert (trips[0].distance == miles and trips[0].error is None)
+        assert (trips[2].distance is None and "missing.gpx" in trips[2].error)
+        with RouteMetricsCache(db, navtools) as cache:
+            assert (all(cache.lookup(tmp_path / f"trip{i}.gpx")[0] is not None for i in (1, 2)))
+
+    errors = []
+    msg = navtools.verifyToerndirectoryDistances(db, str(tmp_path), workers=2, errors=errors)
+    assert ("Atlantic City:" in msg and "1 out of 3 trips" in msg)
+    assert ([trip.destination for trip in errors] == ["Nowhere"])
+
+def test_streamingReader(tmp_path):
+    xml = make_gpx(SAMPLE_ROUTE)
+    wps = list(navtools.iterGPXWaypoints(xml))
+    assert (len(wps) == len(SAMPLE_ROUTE))
+    assert (wps[0][:4] == (40.7, -74.0, "2019-12-01T08:00:00Z", "New York"))
+    assert (wps[1][5] is None and wps[6][4] == "service-marina")
+
+    # file path, binary stream and text stream give the same results
+    file = tmp_path / "sample.gpx"
+    file.write_text(xml)
+    msg = str(navtools.ComputeRouteDistances(
+        xml, verbose=False, skipWP=True, noSpeed=False))
+    assert (str(navtools.ComputeRouteDistances(
+        str(file), verbose=False, skipWP=True, noSpeed=False)) == msg)
+    with open(file, "rb") as fr:
+        assert (str(navtools.ComputeRouteDistances(
+            fr, verbose=False, skipWP=True, noSpeed=False)) == msg)
+    with open(file, "r") as fr:
+        assert (str(navtools.ComputeRouteDistances(
+            fr, verbose=False, skipWP=True, noSpeed=False)) == msg)
+
+
+def test_kmlExtractor():
+    xml = make_kml(SAMPLE_FLEET)
+    tracks = navtools.extractKMLTracks(xml)
+    assert (list(tracks) == ["Aeolus", "Andreas", "Windward"])
+    (times, lats, lons) = tracks["Aeolus"]
+    assert (list(lats) == [45.0, 45.1, 45.2] and list(lons) == [-84.0, -84.0, -84.1])
+    assert (str(times[2]) == "2024-07-20T18:20:00")
+
+    # case insensitive partial names, several boats in one pass
+    tracks = navtools.extractKMLTracks(xml, ["andr", "WINDWARD"])
+    assert (list(tracks) == ["Andreas", "Windward"])
+    assert (navtools.extractKMLTracks(xml, "Unknown Boat") == {})
+
+
+def test_trackDecimation():
+    # 3 hrs on a straight course north, then 3 hrs east with 2 min fixes
+    times = np.datetime64("2024-07-20T12:00") + np.arange(181).astype("timedelta64[2m]")
+    lats = np.concatenate([45.0 + np.arange(91) * 0.005, np.full(90, 45.45)])
+    lons = np.concatenate([np.full(91, -84.0), -84.0 + np.arange(1, 91) * 0.007])
+    raceStart = datetime(2024, 7, 20, 12, 10)
+    watchStart = datetime(2024, 7, 20, 13, 0)
+
+    selected, watch = navtools.decimateTrack(
+        times, lats, lons, raceStart, watchStart, 3, 7.5)
+    # race start, watch changes at 13:00 and 16:00, the first fix after the
+    # course change, and the finish
+    assert (list(selected) == [5, 30, 91, 120, 180])
+    assert (list(np.flatnonzero(watch)) == [30, 120])
+
+    for mode in ["douglas-peucker", "xte"]:
+        selected, watch = navtools.decimateTrack(
+            times, lats, lons, raceStart, watchStart, 3, 7.5, mode, 0.05)
+        assert (list(selected) == [5, 30, 90, 120, 180])
+
+
+def test_kmlFleet(tmp_path):
+    (tmp_path / "race.kml").write_text(make_kml(SAMPLE_FLEET))
+    start = datetime(2024, 7, 20, 18, 0)
+
+    msg = navtools.parseKMLFleet(tmp_path, tmp_path, "race", 0, start, start,
+                                 4, 7.5, workers=2)
+    assert ("converted 3 of 3 boats" in msg)
+    for boat in SAMPLE_FLEET:
+        route = Route.fromFile(tmp_path / "race" / f"{boat}.gpx")
+        assert (route.name == boat and route.names[0] == "Race Start")
+        assert (route.descs[-1] == "arrival " + SAMPLE_FLEET[boat][-1][0][:16].replace("T", " "))
+    table = (tmp_path / "race" / "race_fleet.txt").read_text()
+    assert ("Aeolus" in table and "Etmal per watch" in table)
+
+
+def test_gpxWriter():
+    stream = io.StringIO()
+    with GPXWriter(stream, "Bays & Capes") as gpx:
+        for (lat, lon, name, sym, desc) in SAMPLE_ROUTE:
+            gpx.waypoint(lat, lon, "2019-12-01T08:00:00Z", name, sym, desc)
+    route = Route.fromGPX(stream.getvalue(), navtools)
+    expected = Route.fromGPX(make_gpx(SAMPLE_ROUTE), navtools)
+    assert (route.name == "Bays & Capes" and len(route) == len(SAMPLE_ROUTE))
+    assert (route.names == expected.names and route.syms == expected.syms)
+    assert (route.descs == expected.descs and list(route.lat) == list(expected.lat))
+    assert (list(route.time) == list(expected.time))
+
+    # bulk writing of a track with fixed precision, datetime64 times and NaT
+    stream = io.StringIO()
+    gpx = GPXWriter(stream, "Track", mode="track", precision=3)
+    times = np.array(["2024-07-20T18:00:00", "NaT"], dtype="datetime64[s]")
+    gpx.waypoints([45.12345, 45.2], [-84.0, -84.1], times)
+    gpx.close()
+    wps = list(navtools.iterGPXWaypoints(stream.getvalue(), tag="trkpt"))
+    assert (wps[0][:3] == (45.123, -84.0, "2024-07-20T18:00:00Z") and wps[1][2] is None)
+    assert ('lat="45.123"' in stream.getvalue())
+
+def test_dateParser():
+    formats = navtools.descDateFormats
+    samples = ['2019_09_25_1930', 'Sep-26-2019 09:37', '20190926_0937', '2019-9-6 9:37',
+               '2019-09-26 | 09:37', '2019-02-30 10:00', '2019-09-26 09:37 ', 'departure', '']
+    for text in samples:
+        expected = 0
+        for fmt in formats:
+            try:
+                expected = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                pass
+        assert (navtools.StringToDateTime(text, formats) == expected)
+
+    # the last successful format of a source is tried first ...
+    dates = DateParser(formats)
+    assert (dates.parse('2019-09-26 | 09:37', source='a') == datetime(2019, 9, 26, 9, 37))
+    assert (dates.lastFormat['a'] == 4 and dates.parse(None, default=0) == 0)
+    dates.tryFormat = (lambda tryFormat: lambda i, text: tried.append(i) or tryFormat(i, text))(dates.tryFormat)
+    tried = []
+    assert (dates.parse('2019-09-27 | 10:00', source='a') == datetime(2019, 9, 27, 10, 0) and tried == [4])
+    tried = []
+    assert (dates.parse('2019-09-27 10:00', source='a') == datetime(2019, 9, 27, 10, 0) and tried == [4, 0, 1, 2, 3])
+
+    # ... unless an earlier format can match the same strings: the first
+    # matching format of the list wins, whatever matched before
+    dates = DateParser(["%d/%m/%Y", "%m/%d/%Y"])
+    assert (dates.exclusive == [True, False])
+    assert (dates.parse("01/13/2024", source='a') == datetime(2024, 1, 13))
+    assert (dates.parse("01/02/2024", source='a') == datetime(2024, 2, 1))
+
+    times = ["2024-07-20T18:00:00Z", "2024-07-20T18:02:00Z"]
+    assert (list(Route.parseTimes(times)) == [np.datetime64(t[:-1]) for t in times])
+    mixed = Route.parseTimes(["2024-07-20T18:00:00.5Z", None])
+    assert (mixed[0] == np.datetime64("2024-07-20T18:00:00") and np.isnat(mixed[1]))
+    assert (navtools.getTime("2024-07-20T18:36:00Z", -4) == datetime(2024, 7, 20, 14, 36))
+
+def test_tripAnalytics(tmp_path):
+    gpxPath = tmp_path / "gpx"
+    for (boat, route) in (("Ambika", SAMPLE_ROUTE), ("Ambika", SAMPLE_ROUTE[:4]), ("Rasmus", SAMPLE_ROUTE)):
+        (gpxPath / boat).mkdir(parents=True, exist_ok=True)
+        (gpxPath / boat / f"trip{len(route)}.gpx").write_text(make_gpx(route))
+    expected = navtools.routeMetrics(make_gpx(SAMPLE_ROUTE))
+
+    analytics = TripAnalytics(gpxPath)
+    stats = analytics.update(workers=2)
+    assert (stats["added"] == 3 and stats["failed"] == 0)
+    rows = {row["group"]: row for row in analytics.summary("boat")}
+    assert (rows["Rasmus"]["trips"] == 1 and rows["Ambika"]["trips"] == 2)
+    assert (float_equality(rows["Rasmus"]["distance"], expected.totalDistance))
+    assert (float_equality(rows["Rasmus"]["timedDistance"], expected.timedDistance))
+    assert ([row["group"] for row in analytics.summary("year")] == ["2019"])
+    regions = {"New Jersey": (38.9, 41.0, -75.0, -73.0)}
+    assert (analytics.summary("region", regions)[0]["trips"] == 3)
+    best = analytics.bestEtmals(1)[0]
+    assert (float_equality(best["etmal"], max(leg.etmal for leg in expected.legs)))
+
+    # only new or changed files are indexed again
+    (gpxPath / "Rasmus" / "trip4.gpx").write_text(make_gpx(SAMPLE_ROUTE[:4]))
+    (gpxPath / "Ambika" / "trip7.gpx").unlink()
+    stats = TripAnalytics(gpxPath).update(workers=1)
+    assert ((stats["added"], stats["removed"], stats["unchanged"]) == (1, 1, 2))
+    assert ("Total" in TripAnalytics(gpxPath).report("boat"))
+
+def test_routeIndex(tmp_path):
+    # the index and the cache moved to RouteCache, NavToolsLib still exports them
+    assert NavToolsLib.GPXRouteIndex is GPXRouteIndex and NavToolsLib.RouteMetricsCache is RouteMetricsCache
+    first = make_gpx(SAMPLE_ROUTE, "Bays & Capes")
+    second = make_gpx(SAMPLE_ROUTE[:4], "Atlantic City")
+    # a GPX file with two <rte> elements
+    xml = first[:first.index("</gpx>")] + second[second.index("<rte>"):]
+    file = tmp_path / "routes.gpx"
+    file.write_text(xml)
+
+    index = GPXRouteIndex(file)
+    assert (index.names() == ["Bays & Capes", "Atlantic City"])
+    assert ([entry.points for entry in index] == [len(SAMPLE_ROUTE), 4])
+    route = index.route("atlantic city", navtools)
+    assert (len(route) == 4 and route.name == "Atlantic City")
+    assert (GPXRouteIndex(xml).xml(1) == index.xml("Atlantic City"))
+
+    expected = [navtools.routeMetrics(first), navtools.routeMetrics(second)]
+    for workers in (1, 2):
+        results = list(navtools.iterRouteMetrics(str(file), workers=workers))
+        assert ([r.name for r in results] == index.names())
+        assert ([r.metrics.legs for r in results] == [m.legs for m in expected])
+    results = list(navtools.iterRouteMetrics(xml, names=[1], workers=1))
+    assert (len(results) == 1 and results[0].metrics.totalDistance == expected[1].totalDistance)
+
+def test_configService(tmp_path):
+    root = tmp_path / "drive"
+    root.mkdir()
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "NavConfig.ini")) as fr:
+        raw = json.load(fr)
+    raw["devices"]["Test"] = str(root)
+    for key in NavConfig.DEVICE_PATHS:
+        raw[key]["Test"] = str(root / key)
+    path = tmp_path / "NavConfig.ini"
+    path.write_text(json.dumps(raw))
+
+    probes = []
+    service = NavConfig.ConfigService(exists=lambda p: probes.append(p) or p == os.path.normpath(str(root)))
+    settings = service.get(str(path))
+    assert settings.device == "Test"
+    assert settings.gpxPath == str(root / "gpxPath")
+    assert settings.skipWP is True and settings.noSpeed is False and settings.verbose is False
+    assert float_equality(settings.minCourseChange, 7.5)
+    # cached: no second parse and no device probes
+    count = len(probes)
+    assert service.get(str(path)) is settings
+    assert (service.loads, len(probes)) == (1, count)
+    # immutable and the legacy dictionary of getConfig()
+    try:
+        settings.gpxPath = ""
+        assert False
+    except AttributeError:
+        pass
+    legacy = settings.asDict()
+    assert legacy["skipWP"] == "True" and legacy["TimeZoneDifference"] == -5 and legacy["error"] is True
+
+    # a changed file is reloaded
+    raw["lastFile"] = "2024_Bermuda"
+    path.write_text(json.dumps(raw, indent=2))
+    assert service.get(str(path)).lastFile == "2024_Bermuda"
+    assert service.loads == 2
+
+    # unknown device: error, not cached
+    raw["devices"] = {"Other": str(tmp_path / "missing")}
+    path.write_text(json.dumps(raw))
+    try:
+        service.get(str(path))
+        assert False
+    except NavConfig.ConfigError:
+        pass
+    assert str(path) not in service.entries
+
+
+def test_nmeaFramer():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "nmea_sample.log"), "rb") as fr:
+        data = fr.read()
+    expected = NMEAFramer().feed(data)
+    assert len(expected) == data.count(b"\n")
+    assert all(s.startswith(b"$") and s.endswith(b"\r\n") for s in expected)
+    # sentences split across and batched in packets
+    for size in (1, 7, 100, 1500):
+        framer = NMEAFramer()
+        sentences = []
+        for i in range(0, len(data), size):
+            sentences += framer.feed(data[i:i+size])
+        assert sentences == expected
+
+    # garbage, an interrupted sentence, a missing checksum and a bad checksum
+    framer = NMEAFramer(validate=True)
+    good = b"$GNVTG,,T,,M,0.046,N,0.085,K,A*32\r\n"
+    assert framer.feed(b"\x00xx$GPRMC,0105" + good + b"$GPTXT,no checksum\r\n" + good.replace(b"*32", b"*33")) == [good]
+    assert framer.invalid == 2
+    # overlong lines without a line end are not kept
+    framer.feed(b"x" * 5000)
+    assert len(framer.buffer) == 0
+
+    stream = NMEAStream(io.BytesIO(data), bufsize=64)
+    ids = [nmea.msgID for (_, nmea) in stream.messages()]
+    assert ids.count("RMC") == 34 and stream.stats()["sentences"] == len(expected)
+
+
+def test_nmeaPreFilter():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "nmea_sample.log"), "rb") as fr:
+        data = fr.read()
+    gga = b"$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,*47\r\n"
+    rmc = b"$GPRMC,235959.5,A,4807.038,S,01131.000,W,022.4,084.4,230394,003.1,W*6A\r\n"
+    empty = b"$GPRMC,,V,,,,,,,,,,N*53\r\n"
+    garmin = b"$PGRMC,1,2,3*00\r\n"    # proprietary, 'RMC' at the position of the type
+    data += b"\n" + gga + rmc + empty + garmin
+
+    # the fast decoders give the same values as pynmeagps
+    from pynmeagps import NMEAReader
+    sentences = NMEAFramer().feed(data)
+    for raw in sentences:
+        decode = {b"RMC": decodeRMC, b"GGA": decodeGGA}.get(raw[3:6])
+        if decode is not None and raw != garmin:
+            (fast, nmea) = (decode(raw), NMEAReader.parse(raw, validate=0))
+            assert all(getattr(fast, f) == getattr(nmea, f, "") for f in fast._fields if f != "talker"), raw
+    assert decodeRMC(rmc)[2:5] == (datetime(2024, 1, 1, 23, 59, 59, 500000).time(), "A", -48.1173)
+    assert decodeRMC(b"$GPRMC,123519,A,48x7.038,N,01131.000,E,,,230394,,*00\r\n") is None
+
+    # only the wanted types are parsed, the checksums are checked on the raw bytes
+    assert checksumOK(gga) and not checksumOK(rmc.replace(b"022.4", b"022.5"))
+    assert checksum(b"GPRMC,,V,,,,,,,,,,N") == "53"
+    stream = NMEAStream(io.BytesIO(data), msgIDs=("RMC", "GGA"))
+    messages = [nmea for (_, nmea) in stream.messages()]
+    assert [m.msgID for m in messages].count("RMC") == 37 and messages[-3].alt == 545.4
+    assert stream.skipped == len(sentences) - 39 and all(m.talker != "" for m in messages)
+    full = [nmea for (_, nmea) in NMEAStream(io.BytesIO(data)).messages() if nmea.msgID in ("RMC", "GGA")]
+    assert [(m.msgID, m.lat, m.lon, m.time) for m in messages] == [(m.msgID, m.lat, m.lon, m.time) for m in full]
+    # the sample's RMC and GGA checksums are wrong, only the 3 sentences added above are valid
+    stream = NMEAStream(io.BytesIO(data), validate=True, msgIDs=("RMC", "GGA"))
+    assert len(list(stream.messages())) == 3 and stream.framer.invalid == 36
+    # types without a fast decoder are parsed by pynmeagps
+    stream = NMEAStream(io.BytesIO(data), msgIDs=("VTG",))
+    assert {nmea.msgID for (_, nmea) in stream.messages()} == {"VTG"}
+
+
+def test_nmeaIngest():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nmea_sample.log")
+    with open(path, "rb") as fr:
+        data = fr.read()
+    total = data.count(b"\n")
+
+    async def serveTCP(reader, writer):
+        for i in range(0, len(data), 50):
+            writer.write(data[i:i+50])
+            await writer.drain()
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_server(serveTCP, "127.0.0.1", 0)
+        tcp = TCPSource("gps", "127.0.0.1", server.sockets[0].getsockname()[1], reconnect=None)
+        udp = UDPSource("ais", 0, "127.0.0.1")
+        sources = [tcp, udp, FileSource("log", path)]
+        if hasattr(os, "openpty"):
+            (master, slave) = os.openpty()
+            sources.append(SerialSource("nmea", os.ttyname(slave), reconnect=None))
+        ingest = NMEAIngest(sources)
+        received = []
+
+        async def feed():
+            while udp.transport is None:
+                await asyncio.sleep(0.01)
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                # every other datagram without line end
+                for (i, line) in enumerate(data.splitlines(keepends=True)):
+                    sock.sendto(line if i % 2 else line.rstrip(b"\r\n"), ("127.0.0.1", udp.port))
+            if len(sources) == 4:
+                os.write(master, data)
+            while len(received) < total * len(sources) - total:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.1)
+            await ingest.stop()
+
+        task = asyncio.create_task(feed())
+        async for sentence in ingest.sentences():
+            received.append(sentence)
+        await task
+        server.close()
+        if len(sources) == 4:
+            os.close(master)
+            os.close(slave)
+        return (ingest, received)
+
+    (ingest, received) = asyncio.run(asyncio.wait_for(run(), 10))
+    stats = ingest.stats()
+    for (name, s) in stats.items():
+        # the file replay and the datagrams also frame the last line without a line end
+        expected = NMEAFramer().feed(data + b"\n" if name in ("log", "ais") else data)
+        assert s.sentences == len(expected) and s.errors == 0, (name, s.lastError)
+        assert [x.raw for x in received if x.source == name] == expected
+    assert all(a.received <= b.received for (a, b) in zip(received, received[1:]))
+    assert "Sentences" in ingest.report()
+
+
+def test_fileSource(tmp_path):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nmea_sample.log")
+    with open(path, "rb") as fr:
+        data = fr.read().rstrip(b"\r\n")
+    expected = NMEAFramer().feed(data + b"\n")
+
+    async def run(source, passes):
+        ingest = NMEAIngest([source])
+        received = []
+        async for sentence in ingest.sentences():
+            received.append(sentence.raw)
+            if len(received) == len(expected) * passes:
+                break
+        await ingest.stop()
+        return received
+
+    # the last line is framed with and without a line end, also when repeated
+    for end in (b"", b"\n", b"\r\n"):
+        log = tmp_path / "end.log"
+        log.write_bytes(data + end)
+        source = FileSource("log", str(log), repeat=True)
+        received = asyncio.run(asyncio.wait_for(run(source, 3), 10))
+        assert received == expected * 3
+        assert source.framer.invalid == 0 and source.stats.connects >= 3
+
+    # an empty file gives no sentences and no invalid lines
+    (tmp_path / "empty.log").write_bytes(b"")
+    source = FileSource("log", str(tmp_path / "empty.log"))
+    assert asyncio.run(asyncio.wait_for(run(source, 1), 10)) == []
+    assert source.framer.invalid == 0
+
+
+def test_webSocketSource(tmp_path):
+    pytest.importorskip("websockets")
+    from websockets.asyncio.server import serve
+    from NMEA_Websocket_Logging import wsLogging
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nmea_sample.log")
+    with open(path, "rb") as fr:
+        data = fr.read()
+    expected = NMEAFramer().feed(data + b"\n")
+    half = len(expected) // 2
+    connections = []
+
+    async def handler(ws):
+        # 1st connection: one sentence per text message without line end, then
+        # the server drops the connection; 2nd: the rest in binary messages
+        if ws.request.path == "/all":
+            await ws.send(data)
+            return
+        connections.append(ws)
+        if len(connections) == 1:
+            for raw in expected[:half]:
+                await ws.send(raw.decode().rstrip())
+        else:
+            rest = b"".join(expected[half:])
+            for i in range(0, len(rest), 100):
+                await ws.send(rest[i:i+100])
+            await ws.wait_closed()        # kept alive by the pings until the client stops
+
+    async def run():
+        async with serve(handler, "127.0.0.1", 0) as server:
+            url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+            source = WebSocketSource("ws", url, reconnect=0.05, pingInterval=0.05, maxQueue=2)
+            # a small queue and a slow consumer: the source waits, nothing is dropped
+            ingest = NMEAIngest([source], queueSize=4)
+            received = []
+            async for sentence in ingest.sentences():
+                received.append(sentence.raw)
+                if len(received) % 10 == 0:
+                    await asyncio.sleep(0.01)
+                if len(received) == len(expected):
+                    await asyncio.sleep(0.3)
+                    latency = source.connection.latency     # of the last keepalive ping
+                    await ingest.stop()
+            logger = await wsLogging(str(tmp_path / "ws.gpx"), url + "/all", reconnect=None)
+        return (source, received, logger, latency)
+
+    (source, received, logger, latency) = asyncio.run(asyncio.wait_for(run(), 20))
+    assert received == expected and latency > 0.0
+    assert source.stats.connects == 2 and source.stats.dropped == 0 and source.stats.errors == 0
+    assert logger.fixes > 0 and logger.logCTR > 0
+    ET.parse(str(tmp_path / "ws.gpx"))
+
+
+def test_replayServer(tmp_path):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nmea_sample.log")
+    with open(path, "rb") as fr:
+        data = fr.read()
+    expected = NMEAFramer().feed(data + b"\n")
+
+    # the clock follows the RMC times, out of order GGA times are ignored
+    clock = NMEAClock()
+    steps = [clock.advance(raw) for raw in expected]
+    assert sum(steps) == 23*3600 - 5*60 + 1 and min(steps) == 0.0
+
+    async def read(port):
+        (reader, writer) = await asyncio.open_connection("127.0.0.1", port)
+        received = await reader.read()
+        writer.close()
+        return received
+
+    async def run(server, clients):
+        await server.start()
+        task = asyncio.create_task(server.run())
+        results = await asyncio.gather(*[read(server.port) for _ in range(clients)])
+        await task
+        return results
+
+    # fan out to several clients as fast as possible, two files
+    server = ReplayServer([path, path], "127.0.0.1", 0, speed=None, clients=3)
+    results = asyncio.run(asyncio.wait_for(run(server, 3), 10))
+    assert all(NMEAFramer().feed(r) == expected * 2 for r in results)
+
+    # time scaled replay: 3 RMC sentences 1 second apart at 20x speed
+    log = tmp_path / "short.log"
+    rmc = [b"$GPRMC,12000%d.00,A,5227.03942,N,9714.42462,W,0.046,,160321,,,A,V*0E\r\n" % i for i in range(3)]
+    log.write_bytes(b"$GPVTG,,T,,M,0.046,N,0.085,K,A*32\r\n".join(rmc))
+    server = ReplayServer([str(log)], "127.0.0.1", 0, speed=20.0, only=["RMC"])
+    start = datetime.now()
+    results = asyncio.run(asyncio.wait_for(run(server, 1), 10))
+    elapsed = (datetime.now() - start).total_seconds()
+    assert NMEAFramer().feed(results[0]) == rmc
+    assert 0.09 < elapsed < 1.0
+
+    # a client that stops reading is dropped, the other one gets everything
+    big = tmp_path / "big.log"
+    big.write_bytes((data + b"\n") * 3000)
+    server = ReplayServer([str(big)], "127.0.0.1", 0, speed=None, clients=2, drainTimeout=0.2)
+
+    async def stall(port, replay):
+        (reader, writer) = await asyncio.open_connection("127.0.0.1", port)
+        await replay
+        writer.close()
+
+    async def runStalled():
+        await server.start()
+        replay = asyncio.create_task(server.run())
+        (received, _) = await asyncio.gather(read(server.port), stall(server.port, replay))
+        return received
+
+    received = asyncio.run(asyncio.wait_for(runStalled(), 20))
+    assert server.dropped == 1
+    assert NMEAFramer().feed(received) == expected * 3000
+
+
+def test_gpxLogWriter(tmp_path):
+    # the writers moved to GPX_Writer, NavToolsLib still exports them
+    assert NavToolsLib.GPXWriter is GPXWriter and NavToolsLib.GPXLogWriter is GPXLogWriter
+    path = str(tmp_path / "log.gpx")
+    gpx = GPXLogWriter(path, "Live", precision=6)
+    ET.parse(path)
+    for i in range(5):
+        gpx.waypoint(40.0 + i/10, -70.0, "2024-07-01T00:00:00Z", f"NM{i:04d}")
+        # valid after every flush, i.e. after every waypoint by default
+        assert len(ET.parse(path).getroot()[0].findall("{http://www.topografix.com/GPX/1/1}rtept")) == i + 1
+    gpx.close()
+    with open(path, "rb") as fr:
+        data = fr.read()
+
+    # batched flushes: the file only grows every 3rd waypoint
+    batched = GPXLogWriter(str(tmp_path / "batched.gpx"), "Track", mode="track", flushEvery=3, fsync=False)
+    sizes = []
+    for i in range(6):
+        batched.waypoint(40.0, -70.0 - i)
+        sizes.append(os.path.getsize(batched.path))
+    assert sizes[0] == sizes[1] < sizes[2] == sizes[3] == sizes[4] < sizes[5]
+    batched.close()
+    assert len(ET.parse(batched.path).getroot()[0][2].findall("{http://www.topografix.com/GPX/1/1}trkpt")) == 6
+
+    # a log truncated anywhere is repaired to its complete points
+    for cut in range(len(data) - 800, len(data), 23):
+        (repaired, changed, lost) = GPXLogWriter.repair(data[:cut])
+        assert changed
+        points = ET.fromstring(repaired)[0].findall("{http://www.topografix.com/GPX/1/1}rtept")
+        assert len(points) == data[:cut].count(b"</rtept>")
+        body = data[:cut].rstrip(b"\x00 \t\r\n")
+        assert repaired.startswith(body[:len(body) - lost])
+    assert GPXLogWriter.repair(data) == (data, False, 0)
+
+    # cut inside the last point: its partial element is dropped and reported
+    end = data.rfind(b"</rtept>")
+    truncated = str(tmp_path / "truncated.gpx")
+    with open(truncated, "wb") as fw:
+        fw.write(data[:end])
+    lost = len(data[:end].rstrip()) - (data.rfind(b"</rtept>", 0, end) + len(b"</rtept>"))
+    assert GPXLogWriter.repair(data[:end])[2] == lost > 0
+    assert repairFile(truncated, backup=False) == f"truncated, 4 points kept, repaired ({lost} bytes dropped)"
+    assert repairFile(truncated) == "ok"
+
+    # resume a truncated log after a power loss
+    with open(path, "wb") as fw:
+        fw.write(data[:-70] + b"\x00" * 64)
+    gpx = GPXLogWriter(path, "Live", precision=6, resume=True)
+    assert gpx.count == 4
+    gpx.waypoint(41.0, -71.0, None, "NM0005")
+    gpx.close()
+    names = [p.find("{http://www.topografix.com/GPX/1/1}name").text for p in ET.parse(path).getroot()[0].findall("{http://www.topografix.com/GPX/1/1}rtept")]
+    assert names == ["NM0000", "NM0001", "NM0002", "NM0003", "NM0005"]
+
+    # resume a track log cut inside a point, and one cut at a point boundary
+    track = str(tmp_path / "track.gpx")
+    with GPXLogWriter(track, "Track", mode="track", fsync=False) as gpx:
+        for i in range(5):
+            gpx.waypoint(40.0, -70.0 - i, "2024-07-01T00:00:00Z")
+    with open(track, "rb") as fp:
+        data = fp.read()
+    boundary = data.rfind(b"</trkpt>") + len(b"</trkpt>")
+    for (cut, points) in ((data[:-70], 4), (data[:boundary] + b"\x00" * 64, 5), (data[:boundary], 5)):
+        with open(track, "wb") as fp:
+            fp.write(cut)
+        gpx = GPXLogWriter(track, "Track", mode="track", fsync=False, resume=True)
+        assert gpx.count == points
+        gpx.waypoint(41.0, -71.0)
+        gpx.close()
+        with open(track, "rb") as fp:
+            resumed = fp.read()
+        assert b"\x00" not in resumed and resumed.endswith(b"</trkpt>\n  </trkseg>\n</trk>\n</gpx>\n")
+        trkpts = ET.fromstring(resumed)[0][2].findall("{http://www.topografix.com/GPX/1/1}trkpt")
+        assert len(trkpts) == points + 1 and trkpts[-1].get("lat") == "41.0"
+
+
+def test_localTime():
+    # same local times as pytz for a year of 17 minute steps, incl. both DST transitions
+    for tz in ("US/Pacific", "Europe/Berlin", "Asia/Kolkata", "UTC"):
+        clock = LocalTime(tz)
+        zone = pytz.timezone(tz)
+        utc = datetime(2024, 1, 1)
+        while utc < datetime(2025, 1, 1):
+            expected = utc.replace(tzinfo=pytz.utc).astimezone(zone)
+            assert clock.local(utc) == expected.replace(tzinfo=None)
+            assert clock.hourMinute(utc) == (expected.hour, expected.minute)
+            utc += timedelta(minutes=17)
+        # the offset is only looked up again at a transition
+        assert clock.lookups <= 3
+
+    clock = LocalTime("US/Pacific")
+    utc = LocalTime.utc(datetime(2024, 7, 1).date(), datetime(2024, 7, 1, 18, 5, 7, 500000).time())
+    assert utc == datetime(2024, 7, 1, 18, 5, 7)
+    # the raw RMC fields via the fast decoders, the year pivots at 69 like strptime
+    assert LocalTime.utc(toDate(b"010724"), toTime(b"180507.50")) == utc
+    assert LocalTime.utc(toDate(b"010799"), toTime(b"180507.50")).year == 1999
+    assert clock.aware(utc).isoformat() == "2024-07-01T11:05:07-07:00"
+    assert clock.toUTC(datetime(2024, 7, 1, 11, 5, 7)).replace(tzinfo=None) == utc
+
+
+def test_trackRecorder(tmp_path):
+    # aware datetimes are converted to UTC
+    start = datetime(2024, 7, 20, 16, 0)
+    assert epochSeconds(start) == epochSeconds(pytz.timezone("US/Pacific").localize(datetime(2024, 7, 20, 9, 0)))
+    assert epochSeconds(start) == epochSeconds(np.datetime64("2024-07-20T16:00:00")) == 1721491200.0
+
+    path = str(tmp_path / "race.trk")
+    with TrackRecorder(path, "Race", indexEvery=50) as track:
+        for i in range(1000):
+            track.record(start + timedelta(seconds=i/10), 45.0 + i*1e-5, -84.0, 6.5, 350.0, 1)
+        # not later than the previous fix
+        assert not track.record(start, 45.0, -84.0)
+
+    reader = TrackReader(path)
+    assert (len(reader), reader.name) == (1000, "Race")
+    assert float_equality(reader.lat[999], 45.0 + 999e-5) and reader.quality[0] == 1
+    assert reader.datetimes([10])[0] == np.datetime64("2024-07-20T16:00:01")
+    rows = reader.between(start + timedelta(seconds=10), start + timedelta(seconds=20))
+    assert (rows.start, rows.stop) == (100, 200)
+    assert list(reader.decimate(rows, 2.0)) == [100, 120, 140, 160, 180]
+    assert reader.find(start - timedelta(days=1)) == 0 and reader.find(start + timedelta(days=1)) == 1000
+
+    stream = io.StringIO()
+    assert reader.toGPX(stream, interval=30.0) == 4
+    assert stream.getvalue().count("<trkpt ") == 4 and "<time>2024-07-20T16:01:30Z</time>" in stream.getvalue()
+    del reader, rows
+
+    # a crash during a write: the partial record is dropped, the track continues
+    with open(path, "ab") as fp:
+        fp.write(b"\x01" * 10)
+    assert len(TrackReader(path)) == 1000
+    os.remove(path + ".idx")
+    with TrackRecorder(path, indexEvery=50) as track:
+        track.record(start + timedelta(seconds=200), 46.0, -84.0)
+    assert os.path.getsize(path) == HEADER_SIZE + 1001 * RECORD.size
+    reader = TrackReader(path)
+    assert len(reader.index) == 21 and reader.between(start + timedelta(seconds=150)).start == 1000
+
+
+def test_nmeaLogger(tmp_path):
+    # a day of fixes every 10 seconds from 18:00 PDT: waypoints at 5, 15, ... past
+    # the hour, at the watch changes 19:00, 22:00, 1:00, ... and the 8:00 report
+    def rmc(utc, lat=33.0, lon=-118.0, spd=6.0, cog=180.0):
+        return SimpleNamespace(msgID="RMC", date=utc.date(), time=utc.time(), lat=lat, lon=lon, spd=spd, cog=cog)
+
+    path = str(tmp_path / "day.gpx")
+    start = datetime(2024, 7, 2, 1, 0)
+    with NMEALogger(path, verbose=False) as logger:
+        events = [logger.process(rmc(start + timedelta(seconds=10*i))) for i in range(8640)]
+    times = [(start + timedelta(seconds=10*i) - timedelta(hours=7)).strftime("%H:%M")
+             for (i, event) in enumerate(events) if event is not None]
+    names = [event.name for event in events if event is not None]
+    assert logger.logCTR == len(times) == 144 + 8 + 1
+    assert times[:3] == ["18:05", "18:15", "18:25"] and times[-1] == "17:55"
+    assert [t for (t, name) in zip(times, names) if name] == ["19:00", "22:00", "01:00", "04:00", "07:00", "08:00",
+                                                              "10:00", "13:00", "16:00"]
+    assert [name for name in names if name][3:7] == ["_Port", "_Stbd", "_8:00_Position", "_Port"]
+    points = ET.parse(path).getroot()[0].findall("{http://www.topografix.com/GPX/1/1}rtept")
+    assert len(points) == logger.logCTR and len(TrackReader(str(tmp_path / "day.trk"))) == 8640
+
+    # the rules are only evaluated when they are due, a watch change at the
+    # daily report hour gives one waypoint, named by the daily report
+    scheduler = RuleScheduler(defaultRules(watchStart=20), localTime("US/Pacific"))
+    fired = []
+    for rule in scheduler.rules:
+        rule.fire = (lambda fire: lambda fix: fired.append(fix.local) or fire(fix))(rule.fire)
+    utc = datetime(2024, 7, 1, 14, 59, 58)
+    due = [scheduler.due(Fix(utc + timedelta(seconds=i), utc + timedelta(seconds=i) - timedelta(hours=7),
+                             33.0, -118.0, 6.0, 180.0)) for i in range(600)]
+    assert [event.name for event in due[2]] == ["_Stbd", "_8:00_Position"]
+    assert sum(1 for events in due if events) == 2 and len(fired) == 3
+
+    # distance and course changes: north at 6 kn for 2 hours, then east
+    distance = DistanceRule(5.0)
+    course = CourseChangeRule(45.0, interval=10.0)
+    scheduler = RuleScheduler([distance, course])
+    utc = datetime(2024, 7, 1, 12, 0)
+    events = []
+    for i in range(3 * 3600):
+        (lat, cog) = (33.0 + min(i, 7200) / 36000.0, 0.0 if i < 7200 else 90.0)
+        fix = Fix(utc + timedelta(seconds=i), utc + timedelta(seconds=i), lat, -118.0, 6.0, cog)
+        events.extend((i, e.name) for e in scheduler.due(fix))
+    assert [name for (_, name) in events] == ["", "", "_Course"]
+    assert 2985 <= events[0][0] <= 3015 and 5985 <= events[1][0] <= 6015 and 7200 <= events[2][0] < 7210
+    assert distance.fired == 2 and course.fired == 1
+
+    # end of DST on 2024-11-03: the repeated hour 1:00-2:00 is logged twice
+    start = datetime(2024, 11, 3, 7, 0)
+    with NMEALogger(str(tmp_path / "dst.gpx"), verbose=False, track=False) as logger:
+        events = [logger.process(rmc(start + timedelta(seconds=10*i))) for i in range(5 * 360)]
+    times = [(start + timedelta(seconds=10*i)) for (i, event) in enumerate(events) if event is not None]
+    local = [logger.clock.local(utc).strftime("%H:%M") for utc in times]
+    assert len(times) == 30 + 2 and local[5:8] == ["00:55", "01:00", "01:05"]
+    assert local[12:21] == ["01:55", "01:00", "01:05", "01:15", "01:25", "01:35", "01:45", "01:55", "02:05"]
+    assert [t.strftime("%H:%M") for t in times[12:15]] == ["08:55", "09:00", "09:05"]
+
+    # the GPS time jumps back an hour: the rules are scheduled again
+    with NMEALogger(str(tmp_path / "jump.gpx"), verbose=False, track=False) as logger:
+        utcs = [start + timedelta(seconds=10*i) for i in list(range(180)) + list(range(-360, -180))]
+        events = [logger.process(rmc(utc)) for utc in utcs]
+    assert [utc.strftime("%H:%M") for (utc, event) in zip(utcs, events) if event is not None] == \
+        ["07:05", "07:15", "07:25", "06:05", "06:15", "06:25"]
+
+    # end to end with the NMEA sample log
+    sample = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nmea_sample.log")
+    with NMEALogger(str(tmp_path / "sample.gpx"), verbose=False, track=False) as logger:
+        logger.run(fileMessages(sample))
+    assert logger.fixes > 0 and logger.logCTR > 0
+    ET.parse(str(tmp_path / "sample.gpx"))
+
+
+def test_timeRules():
+    clock = localTime("US/Pacific")
+
+    def run(rules, utc, minutes):
+        scheduler = RuleScheduler(rules, clock)
+        events = []
+        for i in range(minutes):
+            fix = Fix(utc + timedelta(minutes=i), clock.local(utc + timedelta(minutes=i)), 33.0, -118.0, 6.0, 180.0)
+            events.extend((fix.utc.strftime("%H:%M"), fix.local.strftime("%H:%M"), e.name) for e in scheduler.due(fix))
+        return (scheduler, events)
+
+    # start of DST on 2024-03-10: 2:00 PST does not exist, the daily report
+    # fires at 3:00 PDT, the periodic waypoints keep their 30 minute spacing
+    (_, events) = run([PeriodicRule(30, 0), DailyRule(2)], datetime(2024, 3, 10, 8, 0), 180)
+    assert [utc for (utc, _, _) in events] == ["08:00", "08:30", "09:00", "09:30", "10:00", "10:00", "10:30"]
+    assert [local for (_, local, _) in events] == ["00:00", "00:30", "01:00", "01:30", "03:00", "03:00", "03:30"]
+    assert [name for (_, _, name) in events if name] == ["_2:00_Position"]
+
+    # end of DST on 2024-11-03: the watch change at 1:00 fires in both 1:00
+    # hours, the watches alternate
+    watches = {0: ["A", "sa"], 1: ["B", "sb"], 2: ["C", "sc"]}
+    (_, events) = run([WatchRule(3, 1, watches)], datetime(2024, 11, 3, 6, 30), 9 * 60)
+    assert events == [("08:00", "01:00", "_A"), ("09:00", "01:00", "_B"), ("12:00", "04:00", "_C"),
+                      ("15:00", "07:00", "_A")]
+
+    # the daily report of the next day, also when the fixes start after the report hour
+    (_, events) = run([DailyRule(8)], datetime(2024, 7, 1, 16, 0), 24 * 60)
+    assert events == [("15:00", "08:00", "_8:00_Position")]
+
+    # a jump back in time is only followed after a reset of the scheduler
+    rule = PeriodicRule(10, 5)
+    (scheduler, events) = run([rule], datetime(2024, 7, 1, 12, 0), 30)
+    assert [utc for (utc, _, _) in events] == ["12:05", "12:15", "12:25"]
+    back = datetime(2024, 7, 1, 11, 0)
+    assert scheduler.due(Fix(back + timedelta(minutes=5), clock.local(back), 33.0, -118.0, 6.0, 180.0)) == ()
+    scheduler.reset()
+    due = [scheduler.due(Fix(back + timedelta(minutes=i), clock.local(back + timedelta(minutes=i)),
+                             33.0, -118.0, 6.0, 180.0)) for i in range(20)]
+    assert [i for (i, events) in enumerate(due) if events] == [5, 15] and rule.fired == 5
+
+
 def test_routeDistances(file=DEFAULT):
     settings = navtools.getConfig(verbose=False)
     file = os.path.join(settings["gpxPath"], file)
@@ -72,7 +1049,8 @@ def test_routeDistances(file=DEFAULT):
 
     msg = navtools.ComputeRouteDistances(
         xml, verbose=False, skipWP=True, noSpeed=False)
-    assert (("6.12kts" in msg) and ("301.28nm" in msg))
+    assert (("6.12kts" in str(msg)) and ("301.28nm" in str(msg)))
+    assert (float_equality(round(msg.totalDistance, 2), 301.28))
 
 
 if __name__ == "__main__":
@@ -18,28 +18,37 @@ __app__ = "uploadMySQL.py"
 
 try:
     # import python system modules
+    # pymysql, urllib, sqlite3 and ftplib are imported by the functions
+    # using them, so importing this module stays cheap for the GUI
     import os
     import ast
     import sys
-    import pymysql.cursors
-    import urllib.request
-    import urllib.error
-    import urllib.parse
     import warnings
-    import sqlite3
-    import ftplib
     from NavToolsLib import NavTools
 
     warnings.filterwarnings("ignore")
-    navtools = NavTools()
 
 except ImportError as e:
     msg = "Import error: " + str(e) + "\nAborting the program " + __version__
     raise Exception(msg)
 
+navtools = None     # NavTools instance, created by getNavTools() on first use
+
 # %%
 
 
+def getNavTools():
+    """
+    |------------------------------------------------------------------------------------------
+    | function to return the NavTools instance of this module
+    |------------------------------------------------------------------------------------------
+    """
+    global navtools
+    if navtools is None:
+        navtools = NavTools()
+    return navtools
+
+
 def upload_to_sqlite(DBfile, query):
     """
     |------------------------------------------------------------------------------------------
@@ -51,6 +60,7 @@ def upload_to_sqlite(DBfile, query):
     |------------------------------------------------------------------------------------------
     """
 
+    import sqlite3
     try:
         db = sqlite3.connect(DBfile)
         cursor = db.cursor()
@@ -98,6 +108,7 @@ def upload_to_mysql(host, query):
         ret = {"msg": msg, "status": "failure"}
         return ret
     try:
+        import pymysql.cursors
         connection = pymysql.connect(
             host=db_host,
             user=db_user,
@@ -158,6 +169,9 @@ def upload_to_mysql_via_php(host, query):
         ret = {"msg": msg, "status": "failure"}
         return ret
 
+    import urllib.request
+    import urllib.error
+    import urllib.parse
     values = {"pw": db_pass, "query": query}
     try:
         data = urllib.parse.urlencode(values).encode("utf-8")
@@ -185,7 +199,7 @@ def upload_to_mysql_via_php(host, query):
 
 
 def uploadSQLiteFile(sql_file, verbose=True):
-    settings = navtools.getConfig()
+    settings = getNavTools().getConfig()
 
     if("sqlite_files\\ToernDirectoryTable.sql" in sql_file):
         sqliteFile = os.path.normpath(settings['toernDirectory'])
@@ -258,8 +272,9 @@ def FTPupload():
     FTP_HOST = "kaiserware.bplaced.net"
     FTP_USER = "kaiserware"
     FTP_PW = "vesret2204"
-    settings = navtools.getConfig()
+    settings = getNavTools().getConfig()
 
+    import ftplib
     ftp_server = ftplib.FTP(FTP_HOST, FTP_USER, FTP_PW)
     ftp_server.cwd("www")
     fh_sqlite = open(settings["sqliteDB"], 'rb')
@@ -281,7 +296,7 @@ if __name__ == "__main__":
     print(__doc__)
 
     # load configuration data
-    settings = navtools.getConfig(False)
+    settings = getNavTools().getConfig(False)
 
     path = settings['toernDirectory']
 